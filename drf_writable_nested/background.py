@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+import threading
+import uuid
+
+from django.core.cache import caches
+from django.db import close_old_connections, transaction
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import ValidationError
+
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:  # Python 2 without `futures`
+    ThreadPoolExecutor = None
+
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+_lock = threading.Lock()
+_executor = None
+_status_store = None
+
+
+class ImmediateExecutor(object):
+    """
+    Runs tasks in the calling thread, e.g. in tests.
+    """
+    def submit(self, fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+
+class ThreadExecutor(object):
+    """
+    Runs tasks in a thread pool of the process. Database connections of
+    the pool threads are closed after every task.
+    """
+    def __init__(self, max_workers=2):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+
+    def submit(self, fn, *args, **kwargs):
+        return self.pool.submit(self._run, fn, *args, **kwargs)
+
+    def _run(self, fn, *args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+
+class CacheStatusStore(object):
+    """
+    Keeps statuses of tasks in a Django cache, so they can be read by
+    other processes when the cache is shared.
+    """
+    key_prefix = 'drf-writable-nested:task:'
+
+    def __init__(self, alias='default', timeout=24 * 60 * 60):
+        self.alias = alias
+        self.timeout = timeout
+
+    def get(self, task_id):
+        return caches[self.alias].get(self.key_prefix + task_id)
+
+    def set(self, task_id, status):
+        caches[self.alias].set(self.key_prefix + task_id, status, self.timeout)
+
+
+def set_executor(executor):
+    """
+    Sets the executor of background tasks: an object with
+    `submit(fn, *args)`. A queue-backed executor gets only serializable
+    arguments and should call `fn(*args)` in a worker.
+    """
+    global _executor
+    _executor = executor
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadExecutor() if ThreadPoolExecutor is not None \
+                else ImmediateExecutor()
+
+    return _executor
+
+
+def set_status_store(store):
+    """
+    Sets the store of task statuses: an object with `get(task_id)` and
+    `set(task_id, status)`.
+    """
+    global _status_store
+    _status_store = store
+
+
+def get_status_store():
+    global _status_store
+    with _lock:
+        if _status_store is None:
+            _status_store = CacheStatusStore()
+
+    return _status_store
+
+
+def get_status(task_id):
+    """
+    Returns the status of a task: a dict with `status`, `total`,
+    `processed` and `errors` keyed by item index, or `None` if the task is
+    unknown.
+    """
+    return get_status_store().get(task_id)
+
+
+def get_tasks(instance):
+    """
+    Returns ids of background tasks of the created instance keyed by field
+    name.
+    """
+    return dict(getattr(instance, '_nested_background_tasks', {}))
+
+
+def _get_path(serializer_class):
+    return '{}.{}'.format(
+        serializer_class.__module__, serializer_class.__name__)
+
+
+def schedule(serializer, instance, field_name, items, batch_size, using):
+    """
+    Schedules saving of `items` of a reverse relation of the created instance
+    when the current transaction is committed. Returns the task id.
+    """
+    task_id = uuid.uuid4().hex
+    get_status_store().set(task_id, {
+        'status': PENDING,
+        'total': len(items),
+        'processed': 0,
+        'errors': {},
+    })
+
+    args = (task_id, _get_path(serializer.__class__), instance.pk,
+            field_name, items, batch_size,
+            serializer.get_background_context())
+    transaction.on_commit(
+        lambda: get_executor().submit(run_task, *args), using=using)
+
+    return task_id
+
+
+def _get_item_error(exc, field_name):
+    detail = exc.detail.get(field_name, exc.detail) \
+        if isinstance(exc.detail, dict) else exc.detail
+    if isinstance(detail, list) and len(detail) == 1:
+        return detail[0]
+
+    return detail
+
+
+def _save_batch(serializer_class, parent, field_name, batch, context, start):
+    """
+    Saves a batch of items starting at `start` in the list and returns
+    errors keyed by index in the batch. If the batch is rolled back, its
+    items are saved one by one, so valid items aren't lost with invalid
+    ones.
+    """
+    try:
+        serializer_class(instance=parent, context=context).save_batch(
+            field_name, batch, start)
+        return {}
+    except ValidationError as exc:
+        if len(batch) == 1:
+            return {0: _get_item_error(exc, field_name)}
+
+    errors = {}
+    for index, item in enumerate(batch):
+        try:
+            serializer_class(instance=parent, context=context).save_batch(
+                field_name, [item], start + index)
+        except ValidationError as exc:
+            errors[index] = _get_item_error(exc, field_name)
+
+    return errors
+
+
+def run_task(task_id, serializer_path, parent_pk, field_name, items,
+             batch_size, context=None):
+    """
+    Saves items of a reverse relation in batches, each batch in its own
+    transaction, and reports progress to the status store.
+    """
+    store = get_status_store()
+    status = {
+        'status': RUNNING,
+        'total': len(items),
+        'processed': 0,
+        'errors': {},
+    }
+    store.set(task_id, status)
+
+    try:
+        serializer_class = import_string(serializer_path)
+        parent = serializer_class.Meta.model._default_manager.get(pk=parent_pk)
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            errors = _save_batch(
+                serializer_class, parent, field_name, batch, context, start)
+            for index, error in errors.items():
+                status['errors'][start + index] = error
+            status['processed'] += len(batch)
+            store.set(task_id, status)
+    except Exception as exc:
+        status['status'] = FAILED
+        status['errors']['task'] = str(exc)
+        store.set(task_id, status)
+        raise
+
+    status['status'] = FAILED if status['errors'] else DONE
+    store.set(task_id, status)
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+from collections import OrderedDict
+
+from django.db.models import FieldDoesNotExist, Model
+from rest_framework.utils import model_meta
+
+from . import compat
+
+
+class ChangeSet(object):
+    """
+    Changes a save of a nested tree would write, collected by
+    `BaseNestedModelSerializer.dry_run`.
+
+    Rows are grouped by model label. New objects don't have primary keys,
+    so they are referenced by temporary keys like `'new:1'`, also in
+    foreign keys of other new rows and in links.
+    """
+
+    def __init__(self):
+        self.models = OrderedDict()
+        # Links of many-to-many relations by `<model label>.<field name>`
+        self.links = OrderedDict()
+        self._new_count = 0
+
+    def _get_changes(self, model_class):
+        return self.models.setdefault(model_class._meta.label, {
+            'insert': [],
+            'update': OrderedDict(),
+            'delete': [],
+        })
+
+    def get_key(self, obj):
+        """
+        Returns the primary key of the object or its temporary key if it
+        isn't saved.
+        """
+        if obj.pk is not None:
+            return obj.pk
+
+        if getattr(obj, '_change_set_key', None) is None:
+            self._new_count += 1
+            obj._change_set_key = 'new:{}'.format(self._new_count)
+
+        return obj._change_set_key
+
+    def _get_value(self, value):
+        if isinstance(value, Model):
+            return self.get_key(value)
+
+        return value
+
+    def add_insert(self, obj):
+        row = OrderedDict([('pk', self.get_key(obj))])
+        for field in obj._meta.concrete_fields:
+            if field.primary_key:
+                continue
+            if field.is_relation and compat.is_cached(field, obj):
+                row[field.attname] = self._get_value(
+                    compat.get_cached_value(field, obj))
+            else:
+                row[field.attname] = field.value_from_object(obj)
+        self._get_changes(obj.__class__)['insert'].append(row)
+
+    def add_update(self, model_class, pk, values):
+        fields = self._get_changes(model_class)['update'].setdefault(
+            pk, OrderedDict())
+        for name, value in values.items():
+            try:
+                # Foreign keys are recorded by column
+                name = model_class._meta.get_field(name).attname
+            except FieldDoesNotExist:
+                pass
+            fields[name] = self._get_value(value)
+
+    def add_delete(self, model_class, pks):
+        self._get_changes(model_class)['delete'].extend(pks)
+
+    def _get_links(self, instance, field_name):
+        return self.links.setdefault(
+            '{}.{}'.format(instance._meta.label, field_name),
+            {'add': [], 'remove': []})
+
+    def add_links(self, instance, field_name, related_instances):
+        self._get_links(instance, field_name)['add'].extend(
+            (self.get_key(instance), self.get_key(obj))
+            for obj in related_instances)
+
+    def remove_links(self, instance, field_name, pks):
+        self._get_links(instance, field_name)['remove'].extend(
+            (self.get_key(instance), pk) for pk in pks)
+
+    def save(self, model_class, instance, validated_data):
+        """
+        Records the create or the update `ModelSerializer` would do with
+        validated data and returns the new or the existing instance.
+        """
+        info = model_meta.get_field_info(model_class)
+        validated_data = dict(validated_data)
+        many_to_many = OrderedDict(
+            (name, validated_data.pop(name))
+            for name, relation in info.relations.items()
+            if relation.to_many and name in validated_data)
+
+        if instance is None:
+            instance = model_class(**validated_data)
+            self.add_insert(instance)
+            for name, value in many_to_many.items():
+                self.add_links(instance, name, value)
+            return instance
+
+        changed = OrderedDict()
+        for name, value in validated_data.items():
+            try:
+                field = model_class._meta.get_field(name)
+            except FieldDoesNotExist:
+                field = None
+            if field is not None and field.is_relation and field.concrete:
+                new_id = value.pk if isinstance(value, Model) else value
+                # New related objects have no primary key yet
+                if new_id != getattr(instance, field.attname) or \
+                        value is not None and new_id is None:
+                    changed[name] = value
+            elif getattr(instance, name, None) != value:
+                changed[name] = value
+        if changed:
+            self.add_update(model_class, instance.pk, changed)
+
+        for name, value in many_to_many.items():
+            current = set(getattr(instance, name).values_list('pk', flat=True))
+            new = OrderedDict((obj.pk, obj) for obj in value)
+            self.add_links(instance, name, [
+                obj for pk, obj in new.items() if pk not in current])
+            self.remove_links(instance, name, [
+                pk for pk in current if pk not in new])
+
+        return instance
+
+    def count(self):
+        """
+        Returns the number of rows and links which would be written.
+        """
+        return sum(
+            len(changes['insert']) + len(changes['update']) +
+            len(changes['delete'])
+            for changes in self.models.values()
+        ) + sum(
+            len(links['add']) + len(links['remove'])
+            for links in self.links.values()
+        )
+
+    def as_dict(self):
+        return {
+            'models': OrderedDict(
+                (label, {
+                    'insert': changes['insert'],
+                    'update': [
+                        {'pk': pk, 'fields': fields}
+                        for pk, fields in changes['update'].items()
+                    ],
+                    'delete': changes['delete'],
+                })
+                for label, changes in self.models.items()
+            ),
+            'links': OrderedDict(
+                (name, {
+                    'add': [list(link) for link in links['add']],
+                    'remove': [list(link) for link in links['remove']],
+                })
+                for name, links in self.links.items()
+            ),
+        }
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+try:
+    from django.db.models.fields.mixins import FieldCacheMixin
+except ImportError:  # Django < 2.0
+    FieldCacheMixin = None
+
+
+# Related objects are cached in `_state.fields_cache` by Django >= 2.0 and
+# in attributes named by `get_cache_name()` before
+
+
+def is_cached(field, instance):
+    if FieldCacheMixin is not None:
+        return field.is_cached(instance)
+
+    return hasattr(instance, field.get_cache_name())
+
+
+def get_cached_value(field, instance):
+    if FieldCacheMixin is not None:
+        return field.get_cached_value(instance)
+
+    return getattr(instance, field.get_cache_name())
+
+
+def set_cached_value(field, instance, value):
+    if FieldCacheMixin is not None:
+        field.set_cached_value(instance, value)
+    else:
+        setattr(instance, field.get_cache_name(), value)
+
+
+def clear_cached_values(instance):
+    """
+    Forgets all related objects cached on the instance.
+    """
+    if FieldCacheMixin is not None:
+        instance._state.fields_cache.clear()
+        return
+
+    for field in instance._meta.get_fields():
+        if field.is_relation and hasattr(field, 'get_cache_name'):
+            instance.__dict__.pop(field.get_cache_name(), None)
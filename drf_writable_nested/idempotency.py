@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import threading
+
+from django.core.cache import caches
+from django.db import router, transaction
+from django.utils.translation import ugettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+# Header of requests with an idempotency key, as in `request.META`
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+
+IN_PROGRESS = 'in-progress'
+
+_lock = threading.Lock()
+_store = None
+
+
+class SaveInProgress(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = _('A save with this idempotency key is in progress.')
+    default_code = 'idempotency_key_in_progress'
+
+
+class KeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = _('This idempotency key was used with different data.')
+    default_code = 'idempotency_key_reused'
+
+
+class CacheIdempotencyStore(object):
+    """
+    Keeps results of saves in a Django cache. The cache should be shared
+    by all processes which handle requests, e.g. Redis or Memcached.
+    """
+    key_prefix = 'drf-writable-nested:idempotency:'
+
+    def __init__(self, alias='default', timeout=24 * 60 * 60,
+                 in_progress_timeout=60):
+        self.alias = alias
+        self.timeout = timeout
+        # Markers of saves rolled back by an outer transaction expire
+        self.in_progress_timeout = in_progress_timeout
+
+    def add(self, key, value):
+        return caches[self.alias].add(
+            self.key_prefix + key, value, self.in_progress_timeout)
+
+    def get(self, key):
+        return caches[self.alias].get(self.key_prefix + key)
+
+    def set(self, key, value):
+        caches[self.alias].set(self.key_prefix + key, value, self.timeout)
+
+    def delete(self, key):
+        caches[self.alias].delete(self.key_prefix + key)
+
+
+def set_store(store):
+    """
+    Sets the store of save results: an object with `add(key, value)`
+    which sets the value only if the key is missing and returns whether
+    it was set, `get(key)`, `set(key, value)` and `delete(key)`.
+    """
+    global _store
+    _store = store
+
+
+def get_store():
+    global _store
+    with _lock:
+        if _store is None:
+            _store = CacheIdempotencyStore()
+
+    return _store
+
+
+def _get_scope(serializer, kwargs):
+    scope = kwargs.pop('idempotency_scope', None)
+    if scope is not None:
+        return scope
+
+    user = getattr(serializer.context.get('request'), 'user', None)
+    if user is not None and user.is_authenticated:
+        return 'user-{}'.format(user.pk)
+
+    return 'anonymous'
+
+
+def get_key(serializer, kwargs):
+    """
+    Pops the `idempotency_key` argument of `save` or takes the key from
+    the `Idempotency-Key` header of the request in the serializer context
+    if `idempotency_header` is set in `Meta`. Keys are scoped by model and
+    by the `idempotency_scope` argument of `save` or the authenticated
+    user of the request, so clients can't get saves of each other.
+    """
+    key = kwargs.pop('idempotency_key', None)
+    request = serializer.context.get('request')
+    if key is None and request is not None and \
+            getattr(serializer.Meta, 'idempotency_header', False):
+        key = request.META.get(HEADER)
+    scope = _get_scope(serializer, kwargs)
+    if not key:
+        return None
+
+    return '{}:{}:{}'.format(
+        serializer.Meta.model._meta.label_lower, scope, key)
+
+
+def get_fingerprint(serializer):
+    """
+    Returns a hash of the data of the serializer, so a key reused with
+    other data is told apart from a repeated save.
+    """
+    data = serializer.initial_data
+    if hasattr(data, 'lists'):
+        # `QueryDict` of form data
+        data = dict(data.lists())
+
+    return hashlib.sha256(json.dumps(
+        data, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def _replay(serializer, result):
+    try:
+        instance = serializer.Meta.model._default_manager.get(
+            pk=result['pk'])
+    except serializer.Meta.model.DoesNotExist:
+        return None
+
+    instance._nested_write_result = result['write_result']
+    instance._nested_replayed = True
+    serializer.instance = instance
+
+    return instance
+
+
+def _save(serializer, store, key, fingerprint, save):
+    try:
+        instance = save()
+    except Exception:
+        store.delete(key)
+        raise
+
+    result = {
+        'pk': instance.pk,
+        'write_result': getattr(instance, '_nested_write_result', None),
+        'fingerprint': fingerprint,
+    }
+    # The result of a save in an outer transaction is stored only if
+    # the transaction is committed
+    transaction.on_commit(
+        lambda: store.set(key, result),
+        using=router.db_for_write(serializer.Meta.model))
+
+    return instance
+
+
+def run(serializer, key, save):
+    """
+    Runs `save` once per key. Repeated saves with the key return the
+    instance saved by the first one without writing; saves started while
+    the first one is running fail with `SaveInProgress` and saves with
+    other data fail with `KeyReused`.
+    """
+    store = get_store()
+    fingerprint = get_fingerprint(serializer)
+    result = store.get(key)
+    if result is None:
+        if store.add(key, IN_PROGRESS):
+            return _save(serializer, store, key, fingerprint, save)
+        result = store.get(key)
+
+    if result is None or result == IN_PROGRESS:
+        raise SaveInProgress()
+    if result.get('fingerprint') != fingerprint:
+        raise KeyReused()
+
+    instance = _replay(serializer, result)
+    if instance is None:
+        # The saved instance is deleted, so the key is used again. The
+        # marker expires as the one of a first save
+        store.delete(key)
+        if not store.add(key, IN_PROGRESS):
+            raise SaveInProgress()
+        return _save(serializer, store, key, fingerprint, save)
+
+    return instance
+
+
+def is_replayed(instance):
+    """
+    Returns whether the instance was returned for a repeated save.
+    """
+    return getattr(instance, '_nested_replayed', False)
@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+from collections import namedtuple
+
+from django.db import connections, router
+from django.db.models import FieldDoesNotExist
+from django.db.models.signals import m2m_changed
+from rest_framework import serializers
+
+from .mixins import (
+    BaseNestedModelSerializer, get_related_field, is_bulk_creatable,
+    is_bulk_writable, is_generic_relation, returns_bulk_pks,
+)
+from .plans import iter_nested_fields
+
+
+QueryStep = namedtuple('QueryStep', ['description', 'queries', 'per_item'])
+
+
+class RelationNode(namedtuple('RelationNode', [
+    'path', 'field_name', 'relation', 'direct', 'model', 'many',
+    'serializer', 'create', 'update', 'multipliers', 'notes',
+])):
+    """
+    A nested field of a serializer tree.
+
+    `create` and `update` are lists of `QueryStep` which the field issues
+    once per save of its parent serializer. Steps with `per_item` are
+    repeated for every item of the field. `multipliers` are paths of the
+    nested lists the parent serializer is saved for once per item.
+    """
+    __slots__ = ()
+
+    @property
+    def kind(self):
+        if self.relation == 'generic':
+            return 'generic relation'
+
+        return '{} {}'.format(
+            'direct' if self.direct else 'reverse', self.relation)
+
+    @property
+    def has_per_item_queries(self):
+        steps = self.create + self.update
+        return any(step.per_item for step in steps) or \
+            bool(self.multipliers and steps)
+
+
+def _get_link_queries(model_class, source):
+    descriptor = getattr(model_class, source)
+    through = descriptor.through
+    connection = connections[router.db_for_write(through)]
+    if hasattr(descriptor.related_manager_cls, '_get_add_plan') and \
+            connection.features.supports_ignore_conflicts and \
+            not m2m_changed.has_listeners(through):
+        # Django >= 3.0 inserts links ignoring existing ones
+        return 1
+
+    return 2
+
+
+def _get_writable_sources(serializer):
+    return [field.source for field in serializer.fields.values()
+            if not field.read_only]
+
+
+def _get_option(serializer, name):
+    if not isinstance(serializer, BaseNestedModelSerializer):
+        return {}
+
+    return getattr(serializer.Meta, name, {})
+
+
+def _get_steps(serializer, field_name, field, nested, related_field, direct):
+    """
+    Returns `(relation, create_steps, update_steps, notes)` of the nested
+    field as the mixins write it. Create steps assume that items are new,
+    update steps that the same items are passed with primary keys. Queries
+    which other payloads can add are listed in notes.
+    """
+    model_class = nested.Meta.model
+    sources = _get_writable_sources(nested)
+    read_back = [] if returns_bulk_pks(model_class) else [
+        QueryStep('read back inserted primary keys', 1, False)]
+    references = []
+    if getattr(serializer.Meta, 'reference_fast_path', False) and \
+            (direct or related_field.many_to_one or
+             related_field.many_to_many):
+        references = [QueryStep('check references', 1, False)]
+
+    notes = []
+    save_item = QueryStep('save item', 1, True)
+    load_existing = QueryStep('load existing items', 1, False)
+
+    if is_generic_relation(related_field):
+        relation = 'generic'
+        if field_name in _get_option(serializer, 'bulk_create_fields') and \
+                is_bulk_creatable(nested, sources):
+            notes.append('lists of one item are saved without bulk insert')
+            # Without returned primary keys inserted rows are told apart
+            # from the current ones
+            create = [QueryStep('read current items', 1, False)] \
+                if read_back else []
+            create += [QueryStep('insert new items', 1, False)] + read_back
+            if read_back:
+                notes.append('items are saved one by one outside of '
+                             'a transaction')
+        else:
+            create = [save_item]
+        update = [
+            load_existing,
+            QueryStep('read current items', 1, False),
+            QueryStep('save existing item', 1, True),
+        ]
+        notes.append('missing items are deleted with 1 query')
+    elif related_field.many_to_many:
+        relation = 'many-to-many'
+        key_fields = _get_option(serializer, 'get_or_create_fields').get(
+            field_name)
+        if key_fields:
+            notes.append('items are looked up by {}'.format(
+                ', '.join(key_fields)))
+            save = [
+                QueryStep('find items by key', 1, False),
+                QueryStep('insert missing items', 1, False)
+                if is_bulk_creatable(nested, sources)
+                else QueryStep('save missing item', 1, True),
+            ] + (read_back if is_bulk_creatable(nested, sources) else [])
+        else:
+            save = [save_item]
+        link = QueryStep('link items', _get_link_queries(
+            serializer.Meta.model, field.source), False)
+        create = references + save + [link]
+        update = references + [load_existing] + save + [
+            link, QueryStep('find removed items', 1, False)]
+        notes.append('removed items are unlinked with 1 query')
+    elif direct:
+        relation = 'one-to-one' if related_field.one_to_one \
+            else 'foreign key'
+        create = references + [save_item._replace(per_item=False)]
+        update = references + [
+            load_existing._replace(description='load existing item'),
+            save_item._replace(per_item=False),
+        ]
+    elif related_field.one_to_one:
+        relation = 'one-to-one'
+        create = [
+            QueryStep('load existing item', 1, False),
+            save_item._replace(per_item=False),
+        ]
+        update = create + [QueryStep('find orphan', 1, False)]
+        notes.append('a replaced item is deleted with 1 query')
+    else:
+        relation = 'foreign key'
+        through_field = _get_option(serializer, 'through_fields').get(
+            field_name)
+        if through_field and is_bulk_writable(nested, sources):
+            notes.append('rows are synced by {}'.format(through_field))
+            create = [QueryStep('insert rows', 1, False)] + read_back
+            update = [QueryStep('read current rows', 1, False)]
+            notes.append('changed rows are updated, new rows inserted and '
+                         'missing rows deleted with 1 query each')
+        else:
+            if references:
+                notes.append('references of other parents are moved with '
+                             '1 query')
+            create = references + [save_item]
+            update = references + [
+                load_existing, save_item,
+                QueryStep('find orphans', 1, False),
+            ]
+            if field_name in _get_option(serializer, 'order_fields') and \
+                    is_bulk_writable(nested, sources):
+                # Unchanged items are only repositioned
+                update.remove(save_item)
+                notes.append('changed items are saved with 1 query each')
+            policy = _get_option(serializer, 'deferred_orphan_fields').get(
+                field_name)
+            notes.append('orphans are {} with 1 query'.format(
+                'deleted' if policy is None else 'detached and marked'))
+        if field_name in _get_option(serializer, 'order_fields'):
+            notes.append('positions are saved with the items')
+            notes.append('moved items which aren\'t saved are repositioned '
+                         'with 1 query')
+
+    threshold = _get_option(serializer, 'background_fields').get(field_name)
+    if threshold is not None:
+        notes.append(
+            'more than {} items are saved in background'.format(threshold))
+
+    return relation, create, update, notes
+
+
+def _describe(serializer, prefix, multipliers):
+    nodes = []
+    for field_name, field, nested in iter_nested_fields(serializer):
+        if field.read_only:
+            continue
+        try:
+            related_field, direct = get_related_field(
+                serializer.Meta.model, field.source)
+        except FieldDoesNotExist:
+            continue
+
+        path = prefix + field_name
+        many = isinstance(field, serializers.ListSerializer)
+        relation, create, update, notes = _get_steps(
+            serializer, field_name, field, nested, related_field, direct)
+        nodes.append(RelationNode(
+            path=path,
+            field_name=field_name,
+            relation=relation,
+            direct=direct,
+            model=nested.Meta.model,
+            many=many,
+            serializer=nested.__class__,
+            create=create,
+            update=update,
+            multipliers=tuple(multipliers),
+            notes=notes,
+        ))
+        nodes.extend(_describe(
+            nested, path + '.',
+            list(multipliers) + [path] if many else multipliers))
+
+    return nodes
+
+
+def describe(serializer_class):
+    """
+    Returns a `RelationNode` for every writable nested field in the tree of
+    the serializer class, parents first.
+    """
+    return _describe(serializer_class(), '', [])
+
+
+def get_per_item_relations(serializer_class):
+    """
+    Returns nodes of nested fields which issue queries per item of
+    a nested list.
+    """
+    return [node for node in describe(serializer_class)
+            if node.has_per_item_queries]
+
+
+def get_query_count(serializer_class, operation, items):
+    """
+    Returns the number of queries nested fields of the serializer class
+    issue on `'create'` or `'update'`, not counting the save of the root
+    object and validation. `items` maps paths of nested lists to their
+    number of items per parent item.
+    """
+    count = 0
+    for node in describe(serializer_class):
+        steps = getattr(node, operation)
+        queries = sum(
+            step.queries * (items.get(node.path, 0) if step.per_item else 1)
+            for step in steps)
+        for path in node.multipliers:
+            queries *= items.get(path, 0)
+        count += queries
+
+    return count
+
+
+def _format_cost(node, steps):
+    constant = sum(step.queries for step in steps if not step.per_item)
+    per_item = sum(step.queries for step in steps if step.per_item)
+
+    terms = []
+    if constant or not per_item:
+        terms.append(str(constant))
+    if per_item:
+        terms.append('{}n({})'.format(
+            '' if per_item == 1 else '{} * '.format(per_item), node.path))
+    cost = ' + '.join(terms)
+
+    for path in reversed(node.multipliers):
+        if cost == '0':
+            break
+        cost = 'n({}) * {}'.format(
+            path, '({})'.format(cost) if ' ' in cost else cost)
+
+    return cost
+
+
+def _format_steps(steps):
+    return ', '.join(
+        '{} {}{}'.format(step.description, step.queries,
+                         ' per item' if step.per_item else '')
+        for step in steps
+    )
+
+
+def format_description(serializer_class):
+    """
+    Returns the relation tree of the serializer class with queries of
+    create and update as text.
+    """
+    lines = ['{}.{} ({})'.format(
+        serializer_class.__module__, serializer_class.__name__,
+        serializer_class.Meta.model._meta.label)]
+    for node in describe(serializer_class):
+        indent = '  ' * node.path.count('.')
+        lines.append('{}  {}: {} -> {}{}{}'.format(
+            indent, node.field_name, node.kind, node.model._meta.label,
+            ' [list]' if node.many else '',
+            '  PER-ITEM QUERIES' if node.has_per_item_queries else ''))
+        for operation in ('create', 'update'):
+            steps = getattr(node, operation)
+            lines.append('{}    {}: {} ({})'.format(
+                indent, operation, _format_cost(node, steps),
+                _format_steps(steps)))
+        for note in node.notes:
+            lines.append('{}    note: {}'.format(indent, note))
+
+    return '\n'.join(lines)
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+from drf_writable_nested import introspection
+
+
+class Command(BaseCommand):
+    help = (
+        'Prints the relation tree of nested serializers with queries '
+        'issued by create and update as a function of list sizes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'serializers', nargs='+', metavar='serializer',
+            help='Dotted paths of serializer classes.')
+        parser.add_argument(
+            '--fail-on-per-item', action='store_true',
+            help='Exit with an error if a nested field issues queries per '
+                 'item of a nested list.')
+
+    def handle(self, *args, **options):
+        per_item = []
+        for path in options['serializers']:
+            serializer_class = import_string(path)
+            self.stdout.write(
+                introspection.format_description(serializer_class))
+            per_item.extend(
+                '{}.{}'.format(path, node.path) for node in
+                introspection.get_per_item_relations(serializer_class))
+
+        if options['fail_on_per_item'] and per_item:
+            raise CommandError(
+                'Nested fields with per-item queries: {}'.format(
+                    ', '.join(per_item)))
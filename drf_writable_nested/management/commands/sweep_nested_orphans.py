@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+from drf_writable_nested import orphans
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes orphans left by `deferred_orphan_fields` of nested '
+        'serializers in bounded chunks.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'serializers', nargs='*', metavar='serializer',
+            help='Dotted paths of serializer classes. Registered classes '
+                 'are used by default.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Number of orphans deleted in one transaction.')
+        parser.add_argument(
+            '--max-chunks', type=int, default=None,
+            help='Maximum number of chunks per model in one run.')
+
+    def handle(self, *args, **options):
+        serializer_classes = [
+            import_string(path) for path in options['serializers']
+        ] or None
+        result = orphans.sweep(
+            serializer_classes,
+            chunk_size=options['chunk_size'],
+            max_chunks=options['max_chunks'],
+        )
+        for label, deleted in result.items():
+            self.stdout.write('{}: {} deleted'.format(label, deleted))
@@ -1,17 +1,649 @@
 # -*- coding: utf-8 -*-
-from collections import OrderedDict, defaultdict
-
-from django.contrib.contenttypes.fields import GenericRelation
-from django.contrib.contenttypes.models import ContentType
-from django.db.models import ProtectedError, FieldDoesNotExist
+import copy
+import time
+from collections import OrderedDict, defaultdict, namedtuple
+
+try:
+    from collections.abc import Mapping
+except ImportError:  # Python 2
+    from collections import Mapping
+
+from django.core.exceptions import (
+    ImproperlyConfigured, ValidationError as DjangoValidationError,
+)
+from django.db import (
+    DatabaseError, connections, models, router, transaction,
+)
+from django.db.models import (
+    Case, FieldDoesNotExist, Model, ProtectedError, Q, Value, When,
+)
 from django.db.models.fields.related import ForeignObjectRel
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+from rest_framework.utils import html, model_meta
 from rest_framework.validators import UniqueValidator
 
+from . import background, changes, compat, idempotency, retry, signals
+
+
+def is_generic_relation(field):
+    # Content types aren't imported at module level, so the package can be
+    # added to `INSTALLED_APPS` for its management commands
+    from django.contrib.contenttypes.fields import GenericRelation
+
+    return isinstance(field, GenericRelation)
+
+
+def get_content_type_model():
+    from django.contrib.contenttypes.models import ContentType
+
+    return ContentType
+
+
+# Cache of resolved model fields for nested serializer fields, keyed by
+# `(model_class, source)`. `None` marks sources that are not model fields.
+_related_fields_cache = {}
+
+
+def _lookup_model_field(model_class, source):
+    try:
+        return model_class._meta.get_field(source)
+    except FieldDoesNotExist:
+        # If `related_name` is not set, field name does not include
+        # `_set` -> remove it and check again
+        default_postfix = '_set'
+        if source.endswith(default_postfix):
+            return model_class._meta.get_field(
+                source[:-len(default_postfix)])
+        raise
+
+
+def get_related_field(model_class, source):
+    """
+    Returns the model field of the relation behind `source` and whether the
+    relation is direct. Raises `FieldDoesNotExist` for other sources.
+    """
+    cache_key = (model_class, source)
+
+    try:
+        related_field = _related_fields_cache[cache_key]
+    except KeyError:
+        try:
+            related_field = _lookup_model_field(model_class, source)
+        except FieldDoesNotExist:
+            related_field = None
+        _related_fields_cache[cache_key] = related_field
+
+    if related_field is None:
+        raise FieldDoesNotExist(
+            "%s has no field named '%s'" % (
+                model_class._meta.object_name, source))
+
+    if isinstance(related_field, ForeignObjectRel):
+        return related_field.field, False
+    return related_field, True
+
+
+class IdentityMap(object):
+    """
+    Keeps one instance per `(model, pk)` during a nested save, so every
+    object is loaded and written at most once.
+    """
+    def __init__(self):
+        self._instances = {}
+        # Validated data of saved objects by key
+        self._saved = {}
+
+    def _get_key(self, model_class, pk):
+        return model_class._meta.concrete_model, str(pk)
+
+    def get(self, model_class, pk):
+        return self._instances.get(self._get_key(model_class, pk))
+
+    def add(self, instance, saved=False, data=None):
+        key = self._get_key(instance.__class__, instance.pk)
+        self._instances[key] = instance
+        if saved:
+            self._saved[key] = data or {}
+
+    def is_saved(self, instance):
+        return self._get_key(instance.__class__, instance.pk) in self._saved
+
+    def get_conflicts(self, instance, data):
+        """
+        Returns names of fields of `data` which differ from the data the
+        object was saved with.
+        """
+        saved = self._saved.get(
+            self._get_key(instance.__class__, instance.pk), {})
+        return [
+            name for name, value in data.items()
+            if name in saved and saved[name] != value
+        ]
+
+
+# A nested item which only links an existing object
+Reference = namedtuple('Reference', ['instance'])
+
+
+def _add_write(write_result, field_name, operation, pks):
+    if field_name not in write_result:
+        write_result[field_name] = OrderedDict(
+            (key, []) for key in ('created', 'updated', 'deleted'))
+
+    write_result[field_name][operation].extend(pks)
+
+
+_BOOLEAN_FIELDS = tuple(
+    getattr(models, name) for name in ('BooleanField', 'NullBooleanField')
+    # `NullBooleanField` is removed in Django 4.0
+    if hasattr(models, name)
+)
+
+
+def parse_orphan_policy(policy):
+    """
+    Returns the name of the mark field of a `('detach', <mark field name>)`
+    policy of `deferred_orphan_fields`. Orphans are always detached, so
+    they don't show up in the relation, and marked, so the sweeper can tell
+    them apart from objects without a parent created elsewhere.
+    """
+    if (
+        not isinstance(policy, (list, tuple)) or len(policy) != 2 or
+        policy[0] != 'detach'
+    ):
+        raise ImproperlyConfigured(
+            'Orphans are detached and marked with '
+            '`(\'detach\', <field name>)`, got {!r}.'.format(policy))
+
+    return policy[1]
+
+
+def get_orphan_field(related_field, model_class):
+    """
+    Returns the model field set to NULL to detach orphans.
+    """
+    if is_generic_relation(related_field):
+        return model_class._meta.get_field(related_field.object_id_field_name)
+
+    return related_field
+
+
+def get_orphan_mark_field(model_class, policy):
+    """
+    Returns the model field marking orphans by the `policy` of
+    `deferred_orphan_fields`.
+    """
+    field = model_class._meta.get_field(parse_orphan_policy(policy))
+    if not isinstance(field, _BOOLEAN_FIELDS + (models.DateField,)):
+        raise ImproperlyConfigured(
+            'Orphans can be marked with boolean, date or datetime fields, '
+            '`{}` is {}.'.format(field.name, field.__class__.__name__))
+
+    return field
+
+
+def get_orphan_values(related_field, model_class, policy):
+    values = {get_orphan_field(related_field, model_class).attname: None}
+
+    field = get_orphan_mark_field(model_class, policy)
+    if isinstance(field, _BOOLEAN_FIELDS):
+        values[field.attname] = True
+    elif isinstance(field, models.DateTimeField):
+        values[field.attname] = timezone.now()
+    else:
+        values[field.attname] = timezone.now().date()
+
+    return values
+
+
+def get_orphan_clear_values(model_class, policy):
+    """
+    Returns values clearing the mark of the `policy` of
+    `deferred_orphan_fields`, set on every child a save writes so objects
+    which stopped being orphans aren't swept.
+    """
+    field = get_orphan_mark_field(model_class, policy)
+
+    return {field.name: False if isinstance(field, _BOOLEAN_FIELDS) else None}
+
+
+def get_orphan_lookup(related_field, model_class, policy):
+    """
+    Returns a lookup of orphans left by the `policy` of
+    `deferred_orphan_fields`.
+    """
+    field = get_orphan_mark_field(model_class, policy)
+    if isinstance(field, _BOOLEAN_FIELDS):
+        lookup = {field.name: True}
+    else:
+        lookup = {'{}__isnull'.format(field.name): False}
+    lookup['{}__isnull'.format(
+        get_orphan_field(related_field, model_class).name)] = True
+
+    return lookup
+
+
+def _get_class_method_owner(cls, name):
+    for klass in cls.__mro__:
+        if name in vars(klass):
+            return klass
+
+
+def _get_method_owner(obj, name):
+    return _get_class_method_owner(obj.__class__, name)
+
+
+def returns_bulk_pks(model_class):
+    """
+    Returns whether the database of the model sets primary keys of objects
+    inserted with `bulk_create`.
+    """
+    connection = connections[router.db_for_write(model_class)]
+    return getattr(
+        connection.features, 'can_return_rows_from_bulk_insert',
+        # Django < 3.0
+        getattr(connection.features, 'can_return_ids_from_bulk_insert',
+                False))
+
+
+def is_bulk_creatable(serializer, sources):
+    """
+    Returns whether objects of the serializer can be inserted with
+    `bulk_create` from validated data with `sources`: the serializer
+    creates them as is and doesn't write nested or to-many relations, and
+    the model doesn't customize `save` or have `pre_save`/`post_save`
+    receivers, which `bulk_create` would skip.
+    """
+    if isinstance(serializer, BaseNestedModelSerializer) or \
+            _get_method_owner(serializer, 'save') is not \
+            serializers.BaseSerializer or \
+            _get_method_owner(serializer, 'create') is not \
+            serializers.ModelSerializer:
+        return False
+
+    model_class = serializer.Meta.model
+    if _get_class_method_owner(model_class, 'save') is not models.Model or \
+            models.signals.pre_save.has_listeners(model_class) or \
+            models.signals.post_save.has_listeners(model_class):
+        return False
+
+    relations = model_meta.get_field_info(model_class).relations
+    return not any(
+        relations[source].to_many
+        for source in sources if source in relations
+    )
+
+
+def is_bulk_writable(serializer, sources):
+    """
+    Returns whether objects of the serializer can also be updated with
+    `bulk_update`.
+    """
+    return is_bulk_creatable(serializer, sources) and \
+        _get_method_owner(serializer, 'update') is serializers.ModelSerializer
+
+
+# Keys of operation-based payloads of nested lists
+LIST_OPERATIONS = ('add', 'update', 'remove')
+
+
+def format_item_errors(errors, sparse=False):
+    """
+    Returns errors of list items as a list with an empty dict for every
+    valid item or, if `sparse`, as a dict of errors keyed by item index.
+    """
+    if sparse:
+        return OrderedDict(
+            (index, error) for index, error in enumerate(errors) if error)
+
+    return errors
+
+
+def is_sparse_errors(errors):
+    return isinstance(errors, Mapping) and bool(errors) and \
+        all(isinstance(key, int) for key in errors)
+
+
+class NestedListSerializer(serializers.ListSerializer):
+    """
+    List serializer which reports errors of items keyed by index if
+    `sparse_errors` is set and stops validating items after `max_errors`
+    errors.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.sparse_errors = kwargs.pop('sparse_errors', False)
+        self.max_errors = kwargs.pop('max_errors', None)
+        super(NestedListSerializer, self).__init__(*args, **kwargs)
+
+    def to_internal_value(self, data):
+        if html.is_html_input(data):
+            data = html.parse_html_list(data, default=[])
+        if not isinstance(data, list) or not data:
+            # Lists which aren't valid as a whole are reported as usual
+            return super(NestedListSerializer, self).to_internal_value(data)
+
+        ret = []
+        errors = OrderedDict()
+        for index, item in enumerate(data):
+            try:
+                ret.append(self.child.run_validation(item))
+            except ValidationError as exc:
+                errors[index] = exc.detail
+                if self.max_errors and len(errors) >= self.max_errors:
+                    break
+
+        if errors:
+            if self.sparse_errors:
+                raise ValidationError(errors)
+            raise ValidationError(
+                [errors.get(index, {}) for index in range(len(data))])
+
+        return ret
+
 
 class BaseNestedModelSerializer(serializers.ModelSerializer):
+    default_error_messages = {
+        'invalid_list_operations': _(
+            "Expected a list of items or a dict with "
+            "{operations} keys."),
+        'list_operation_pk_required': _(
+            "Items to update or remove must contain a primary key."),
+        'reference_does_not_exist': _(
+            'Invalid pk "{pk_value}" - object does not exist.'),
+        'conflicting_data': _(
+            'The object is passed with other data elsewhere in the payload.'),
+        'duplicate_through_key': _(
+            'Only one item can be passed for this value.'),
+    }
+
+    _prepared_serializers = None
+    # The top-level serializer which saves the whole tree
+    _nested_root = None
+    # Primary keys of nested objects written by the current save
+    _write_result = None
+    # Nested objects saved by the current save, by field name
+    _related_instances = None
+    _identity_map = None
+    # Sources of direct relations passed as references during validation
+    _reference_sources = None
+    # Instances of references of nested lists found during validation,
+    # reused once by the save, by field name
+    _referenced_instances = None
+    _existing_related_pks = None
+    _synced_fields = None
+    _deferred_deletes = None
+    _claimed_pks = None
+    _signal_batch = None
+    # Position of the first item of ordered lists saved by `save_batch`
+    _position_offset = 0
+    # Changes collected instead of writes by `dry_run`
+    _change_set = None
+
+    def get_fields(self):
+        fields = super(BaseNestedModelSerializer, self).get_fields()
+        sparse_errors = self._is_sparse_errors()
+        max_errors = self._get_max_errors()
+        if not sparse_errors and max_errors is None:
+            return fields
+
+        for field_name, field in fields.items():
+            # Custom list serializers are kept as is
+            if type(field) is serializers.ListSerializer and \
+                    isinstance(field.child, serializers.ModelSerializer):
+                fields[field_name] = NestedListSerializer(
+                    *field._args, **dict(
+                        field._kwargs,
+                        child=copy.deepcopy(field.child),
+                        sparse_errors=sparse_errors,
+                        max_errors=max_errors,
+                    ))
+
+        return fields
+
+    def _is_sparse_errors(self):
+        return getattr(self.Meta, 'sparse_errors', False)
+
+    def _get_max_errors(self):
+        return getattr(self.Meta, 'max_errors', None)
+
+    def _is_max_errors_reached(self, error_count):
+        max_errors = self._get_max_errors()
+        return bool(max_errors) and error_count >= max_errors
+
+    def _get_list_operation_fields(self):
+        return getattr(self.Meta, 'list_operation_fields', ())
+
+    def _get_list_operations(self, field_name, data=None):
+        """
+        Returns operations of an operation-based payload of the nested
+        list field or `None` if the whole list is passed.
+        """
+        if field_name not in self._get_list_operation_fields():
+            return None
+
+        if data is None:
+            data = self.get_initial()
+        value = data.get(field_name) if isinstance(data, Mapping) else None
+        if not isinstance(value, Mapping):
+            return None
+
+        operations = {
+            operation: value.get(operation) or []
+            for operation in LIST_OPERATIONS
+        }
+        # Items to remove can be passed as primary keys
+        operations['remove'] = [
+            item if isinstance(item, Mapping) else {'pk': item}
+            for item in operations['remove']
+        ]
+
+        return operations
+
+    def _validate_list_operations(self, field_name, data, model_class):
+        value = data[field_name]
+        if set(value) - set(LIST_OPERATIONS) or not all(
+                isinstance(value.get(operation, []), list)
+                for operation in LIST_OPERATIONS):
+            raise ValidationError({field_name: [
+                self.error_messages['invalid_list_operations'].format(
+                    operations=', '.join(LIST_OPERATIONS))
+            ]})
+
+        operations = self._get_list_operations(field_name, data)
+        items = operations['update'] + operations['remove']
+        if not all(isinstance(item, Mapping) and
+                   self._get_related_pk(item, model_class)
+                   for item in items):
+            raise ValidationError({field_name: [
+                self.error_messages['list_operation_pk_required']
+            ]})
+
+    def _get_reference_fields(self):
+        """
+        Returns nested fields of direct relations, many-to-many relations and
+        reverse foreign keys in which items carrying just a primary key are
+        treated as references to existing objects.
+        """
+        if not getattr(self.Meta, 'reference_fast_path', False):
+            return OrderedDict()
+
+        reference_fields = OrderedDict()
+        for field_name, field in self.fields.items():
+            if field.read_only:
+                continue
+            try:
+                related_field, direct = self._get_related_field(field)
+            except FieldDoesNotExist:
+                continue
+
+            if isinstance(field, serializers.ListSerializer) and \
+                    isinstance(field.child, serializers.ModelSerializer) and \
+                    (related_field.many_to_many or
+                     not direct and related_field.many_to_one):
+                reference_fields[field_name] = field.child.Meta.model
+            elif isinstance(field, serializers.ModelSerializer) and direct:
+                reference_fields[field_name] = field.Meta.model
+
+        return reference_fields
+
+    def _is_reference(self, data, model_class):
+        return isinstance(data, Mapping) and len(data) == 1 and \
+            list(data)[0] in ('pk', model_class._meta.pk.attname) and \
+            bool(self._get_related_pk(data, model_class))
+
+    def _get_referenced_instances(self, model_class, references):
+        """
+        Returns referenced instances found with one query and
+        a list of errors for references.
+        """
+        pk_field = model_class._meta.pk
+        pk_list = []
+        for data in references:
+            try:
+                pk_list.append(pk_field.to_python(
+                    self._get_related_pk(data, model_class)))
+            except DjangoValidationError:
+                pass
+
+        instances = {
+            str(instance.pk): instance
+            for instance in model_class.objects.filter(pk__in=pk_list)
+        }
+        errors = []
+        for data in references:
+            pk = self._get_related_pk(data, model_class)
+            if pk in instances:
+                errors.append({})
+            else:
+                errors.append({api_settings.NON_FIELD_ERRORS_KEY: [
+                    self.error_messages['reference_does_not_exist'].format(
+                        pk_value=pk)
+                ]})
+
+        return instances, errors
+
+    @property
+    def _writable_fields(self):
+        # Fields with references are validated by `to_internal_value`
+        skipped = self._reference_sources or ()
+        for field in super(BaseNestedModelSerializer, self)._writable_fields:
+            if field.source not in skipped:
+                yield field
+
+    def to_internal_value(self, data):
+        operation_fields = self._get_list_operation_fields()
+        reference_fields = self._get_reference_fields()
+        if isinstance(data, Mapping) and (operation_fields or
+                                          reference_fields):
+            # Payloads of these fields are changed for validation
+            data = data.copy()
+
+        # Operation-based payloads of nested lists are validated as a list
+        # of items to add and update
+        expanded = OrderedDict()
+        for field_name in operation_fields:
+            if not isinstance(data, Mapping) or \
+                    not isinstance(data.get(field_name), Mapping):
+                continue
+
+            field = self.fields[field_name]
+            self._validate_list_operations(
+                field_name, data, field.child.Meta.model)
+            operations = self._get_list_operations(field_name, data)
+            expanded[field_name] = (
+                len(operations['add']),
+                len(operations['add']) + len(operations['update']),
+            )
+            data[field_name] = operations['add'] + operations['update']
+
+        # References are checked with one query per field and aren't
+        # validated by nested serializers
+        references = OrderedDict()
+        kept = OrderedDict()
+        self._referenced_instances = {}
+        for field_name, model_class in reference_fields.items():
+            value = data.get(field_name) \
+                if isinstance(data, Mapping) else None
+            field = self.fields[field_name]
+            if isinstance(value, list):
+                items = [
+                    item for item in value
+                    if self._is_reference(item, model_class)
+                ]
+                if not items:
+                    continue
+
+                instances, errors = self._get_referenced_instances(
+                    model_class, items)
+                if any(errors):
+                    errors = iter(errors)
+                    raise ValidationError({field_name: format_item_errors([
+                        next(errors)
+                        if self._is_reference(item, model_class) else {}
+                        for item in value
+                    ], self._is_sparse_errors())})
+
+                self._referenced_instances[field_name] = instances
+                kept[field_name] = (len(value), [
+                    index for index, item in enumerate(value)
+                    if not self._is_reference(item, model_class)
+                ])
+                data[field_name] = [value[index] for index in
+                                    kept[field_name][1]]
+            elif self._is_reference(value, model_class):
+                instances, errors = self._get_referenced_instances(
+                    model_class, [value])
+                if errors[0]:
+                    raise ValidationError({field_name: errors[0]})
+                references[field.source] = list(instances.values())[0]
+
+        self._reference_sources = references
+        try:
+            ret = super(BaseNestedModelSerializer, self).to_internal_value(
+                data)
+        except ValidationError as exc:
+            detail = exc.detail
+            for field_name, (length, indexes) in kept.items():
+                errors = detail.get(field_name)
+                if is_sparse_errors(errors):
+                    detail[field_name] = OrderedDict(
+                        (indexes[index], error)
+                        for index, error in errors.items())
+                elif isinstance(errors, list) and \
+                        len(errors) == len(indexes):
+                    detail[field_name] = [{} for _ in range(length)]
+                    for error, index in zip(errors, indexes):
+                        detail[field_name][index] = error
+            for field_name, (add_count, length) in expanded.items():
+                errors = detail.get(field_name)
+                if is_sparse_errors(errors):
+                    detail[field_name] = {
+                        'add': OrderedDict(
+                            (index, error)
+                            for index, error in errors.items()
+                            if index < add_count),
+                        'update': OrderedDict(
+                            (index - add_count, error)
+                            for index, error in errors.items()
+                            if index >= add_count),
+                    }
+                elif isinstance(errors, list) and len(errors) == length:
+                    detail[field_name] = {
+                        'add': errors[:add_count],
+                        'update': errors[add_count:],
+                    }
+            raise ValidationError(detail)
+        finally:
+            self._reference_sources = None
+
+        ret.update(references)
+        return ret
+
     def _extract_relations(self, validated_data):
         reverse_relations = OrderedDict()
         relations = OrderedDict()
@@ -41,9 +673,11 @@ class BaseNestedModelSerializer(serializers.ModelSerializer):
                     # Skip field if field is not required
                     continue
 
-                if validated_data.get(field.source) is None:
+                if validated_data.get(field.source) is None or \
+                        isinstance(validated_data[field.source], Model):
                     if direct:
-                        # Don't process null value for direct relations
+                        # Don't process null value and references for
+                        # direct relations
                         # Native create/update processes these values
                         continue
 
@@ -59,23 +693,7 @@ class BaseNestedModelSerializer(serializers.ModelSerializer):
         return relations, reverse_relations
 
     def _get_related_field(self, field):
-        model_class = self.Meta.model
-
-        try:
-            related_field = model_class._meta.get_field(field.source)
-        except FieldDoesNotExist:
-            # If `related_name` is not set, field name does not include
-            # `_set` -> remove it and check again
-            default_postfix = '_set'
-            if field.source.endswith(default_postfix):
-                related_field = model_class._meta.get_field(
-                    field.source[:-len(default_postfix)])
-            else:
-                raise
-
-        if isinstance(related_field, ForeignObjectRel):
-            return related_field.field, False
-        return related_field, True
+        return get_related_field(self.Meta.model, field.source)
 
     def _get_serializer_for_field(self, field, **kwargs):
         kwargs.update({
@@ -90,14 +708,23 @@ class BaseNestedModelSerializer(serializers.ModelSerializer):
                 kwargs.get('data').get(field.resource_type_field_name)
             )
 
-            return serializer.__class__(**kwargs)
+            serializer = serializer.__class__(**kwargs)
         else:
-            return field.__class__(**kwargs)
+            serializer = field.__class__(**kwargs)
+
+        serializer._nested_root = self._nested_root or self
+
+        return serializer
 
     def _get_generic_lookup(self, instance, related_field):
+        # Content types are cached by the manager, so they're resolved once
+        # per model
         return {
             related_field.content_type_field_name:
-                ContentType.objects.get_for_model(instance),
+                get_content_type_model().objects.get_for_model(
+                    instance,
+                    for_concrete_model=related_field.for_concrete_model,
+                ),
             related_field.object_id_field_name: instance.pk,
         }
 
@@ -119,115 +746,1487 @@ class BaseNestedModelSerializer(serializers.ModelSerializer):
 
         return pk_list
 
-    def _prefetch_related_instances(self, field, related_data):
+    def _prefetch_related_instances(self, field, related_data,
+                                    instances=None):
         model_class = field.Meta.model
         pk_list = self._extract_related_pks(field, related_data)
 
-        instances = {
-            str(related_instance.pk): related_instance
-            for related_instance in model_class.objects.filter(
-                pk__in=pk_list
-            )
-        }
+        identity_map = self._get_identity_map()
+        instances = dict(instances or {})
+        pk_list = [pk for pk in pk_list if pk not in instances]
+        if identity_map is not None:
+            for pk in pk_list:
+                related_instance = identity_map.get(model_class, pk)
+                if related_instance is not None:
+                    instances[pk] = related_instance
+            pk_list = [pk for pk in pk_list if pk not in instances]
+
+        queryset = model_class.objects.filter(pk__in=pk_list)
+        if self._is_row_locking():
+            # Rows are locked in the order of primary keys, so concurrent
+            # saves of overlapping data wait for each other instead of
+            # deadlocking
+            queryset = queryset.select_for_update().order_by('pk')
+        for related_instance in queryset:
+            instances[str(related_instance.pk)] = related_instance
+            if identity_map is not None:
+                identity_map.add(related_instance)
 
         return instances
 
+    def _get_reverse_one_to_one_fields(self):
+        """
+        Returns names of nested reverse one-to-one fields which have data
+        without a primary key, so their existing objects have to be looked up.
+        """
+        field_names = []
+        initial = self.get_initial()
+        for field_name, field in self.fields.items():
+            if field.read_only or \
+                    not isinstance(field, serializers.ModelSerializer):
+                continue
+            try:
+                related_field, direct = self._get_related_field(field)
+            except FieldDoesNotExist:
+                continue
+
+            data = initial.get(field_name)
+            if direct or not related_field.one_to_one or \
+                    not isinstance(data, Mapping) or \
+                    self._get_related_pk(data, field.Meta.model):
+                continue
+
+            field_names.append(field_name)
+
+        return field_names
+
+    def prefetch_reverse_one_to_one(self, instances, field_names=None):
+        """
+        Looks up existing objects of nested reverse one-to-one fields for all
+        `instances` with one query per related model and stores them in the
+        related object caches of the instances.
+        """
+        if field_names is None:
+            field_names = self._get_reverse_one_to_one_fields()
+
+        by_model = defaultdict(list)
+        for field_name in field_names:
+            related_field, direct = self._get_related_field(
+                self.fields[field_name])
+            by_model[related_field.model].append(related_field)
+
+        for model_class, related_fields in by_model.items():
+            lookups = Q()
+            pending = []
+            for related_field in related_fields:
+                parents = OrderedDict(
+                    (instance.pk, instance) for instance in instances
+                    if instance.pk is not None and
+                    not compat.is_cached(
+                        related_field.remote_field, instance)
+                )
+                if parents:
+                    lookups |= Q(**{
+                        '{}__in'.format(related_field.attname): list(parents)
+                    })
+                    pending.append((related_field, parents))
+            if not pending:
+                continue
+
+            related_instances = model_class._default_manager.filter(lookups)
+            for related_instance in related_instances:
+                for related_field, parents in pending:
+                    parent = parents.get(
+                        getattr(related_instance, related_field.attname))
+                    if parent is not None:
+                        compat.set_cached_value(
+                            related_field.remote_field, parent,
+                            related_instance)
+                        compat.set_cached_value(
+                            related_field, related_instance, parent)
+
+            for related_field, parents in pending:
+                for parent in parents.values():
+                    if not compat.is_cached(
+                            related_field.remote_field, parent):
+                        compat.set_cached_value(
+                            related_field.remote_field, parent, None)
+
+    def _get_reverse_one_to_one_instance(self, instance, related_field):
+        if instance is None or instance.pk is None:
+            return None
+
+        if not compat.is_cached(related_field.remote_field, instance):
+            self.prefetch_reverse_one_to_one([instance])
+        if not compat.is_cached(related_field.remote_field, instance):
+            # The field has data with a primary key
+            return None
+
+        return compat.get_cached_value(related_field.remote_field, instance)
+
+    def _get_reverse_related_data(self, instance, field_name, related_field,
+                                  field, field_source):
+        # Skip processing for empty data or not-specified field.
+        # The field can be defined in validated_data but isn't defined
+        # in initial_data (for example, if multipart form data used)
+        related_data = self.get_initial().get(field_name, None)
+        if related_data is None:
+            return None
+
+        operations = self._get_list_operations(field_name)
+        if operations is not None:
+            # Only touched items are processed
+            related_data = operations['add'] + operations['update']
+
+        if related_field.one_to_one:
+            # If an object already exists, fill in the pk so
+            # we don't try to duplicate it
+            pk_name = field.Meta.model._meta.pk.attname
+            if pk_name not in related_data and 'pk' in related_data:
+                pk_name = 'pk'
+            if pk_name not in related_data:
+                related_instance = self._get_reverse_one_to_one_instance(
+                    instance, related_field)
+                if related_instance:
+                    related_data[pk_name] = related_instance.pk
+
+            # Expand to array of one item for one-to-one for uniformity
+            related_data = [related_data]
+
+        return related_data
+
+    def _check_list_operation_items(self, instance, field_name, field,
+                                    field_source):
+        """
+        Raises `ValidationError` if items to update or remove aren't
+        objects of the relation of the instance. Their primary keys are
+        checked with one query.
+        """
+        operations = self._get_list_operations(field_name)
+        if operations is None or \
+                not operations['update'] and not operations['remove']:
+            return
+
+        model_class = field.Meta.model
+        pk_field = model_class._meta.pk
+        pk_list = []
+        for data in operations['update'] + operations['remove']:
+            try:
+                pk_list.append(pk_field.to_python(
+                    self._get_related_pk(data, model_class)))
+            except DjangoValidationError:
+                pass
+
+        own_pks = set()
+        if instance is not None and instance.pk is not None:
+            own_pks = {
+                str(pk) for pk in getattr(instance, field_source).filter(
+                    pk__in=pk_list).values_list('pk', flat=True)
+            }
+
+        errors = OrderedDict()
+        for operation in ('update', 'remove'):
+            errors[operation] = []
+            for data in operations[operation]:
+                pk = self._get_related_pk(data, model_class)
+                if str(pk) in own_pks:
+                    errors[operation].append({})
+                else:
+                    errors[operation].append({
+                        api_settings.NON_FIELD_ERRORS_KEY: [
+                            self.error_messages['reference_does_not_exist']
+                            .format(pk_value=pk)
+                        ]})
+        if any(any(item_errors) for item_errors in errors.values()):
+            raise ValidationError({field_name: OrderedDict(
+                (operation, format_item_errors(
+                    item_errors, self._is_sparse_errors()))
+                for operation, item_errors in errors.items())})
+
+    def _get_reverse_related_serializers(self, instance, field_name,
+                                         related_field, field, field_source):
+        prepared = self._prepared_serializers or {}
+        if field_name in prepared:
+            return prepared.pop(field_name)
+
+        related_data = self._get_reverse_related_data(
+            instance, field_name, related_field, field, field_source)
+        if related_data is None:
+            return None, []
+        self._check_list_operation_items(
+            instance, field_name, field, field_source)
+
+        known = {}
+        referenced = (self._referenced_instances or {}).pop(field_name, None)
+        if referenced and not self._is_row_locking():
+            # References were found by the validation; locked rows are
+            # read again with the lock
+            known.update(referenced)
+        if related_field.one_to_one:
+            related_instance = self._get_reverse_one_to_one_instance(
+                instance, related_field)
+            if related_instance is not None:
+                known[str(related_instance.pk)] = related_instance
+
+        instances = self._prefetch_related_instances(
+            field, related_data, known)
+        references = field_name in self._get_reference_fields()
+        related_serializers = []
+        for data in related_data:
+            obj = instances.get(self._get_related_pk(data, field.Meta.model))
+            if references and self._is_reference(data, field.Meta.model):
+                related_serializers.append(Reference(obj))
+            else:
+                related_serializers.append(self._get_serializer_for_field(
+                    field,
+                    instance=obj,
+                    data=data,
+                ))
+
+        return related_data, related_serializers
+
+    def _get_direct_related_serializer(self, field_name, field):
+        prepared = self._prepared_serializers or {}
+        if field_name in prepared:
+            return prepared.pop(field_name)
+
+        data = self.get_initial()[field_name]
+        obj = self._prefetch_related_instances(field, [data]).get(
+            self._get_related_pk(data, field.Meta.model))
+
+        return self._get_serializer_for_field(
+            field,
+            instance=obj,
+            data=data,
+        )
+
+    def _raise_relation_errors(self, field_name, related_field, errors):
+        if any(errors):
+            if related_field.one_to_one:
+                raise ValidationError({field_name: errors[0]})
+            else:
+                raise ValidationError({field_name: format_item_errors(
+                    errors, self._is_sparse_errors())})
+
     def update_or_create_reverse_relations(self, instance, reverse_relations):
         # Update or create reverse relations:
         # many-to-one, many-to-many, reversed one-to-one
         for field_name, (related_field, field, field_source) in \
                 reverse_relations.items():
-
-            # Skip processing for empty data or not-specified field.
-            # The field can be defined in validated_data but isn't defined
-            # in initial_data (for example, if multipart form data used)
-            related_data = self.get_initial().get(field_name, None)
+            related_data, related_serializers = \
+                self._get_reverse_related_serializers(
+                    instance, field_name, related_field, field, field_source)
             if related_data is None:
                 continue
 
-            if related_field.one_to_one:
-                # If an object already exists, fill in the pk so
-                # we don't try to duplicate it
-                pk_name = field.Meta.model._meta.pk.attname
-                if pk_name not in related_data and 'pk' in related_data:
-                    pk_name = 'pk'
-                if pk_name not in related_data:
-                    related_instance = getattr(instance, field_source, None)
-                    if related_instance:
-                        related_data[pk_name] = related_instance.pk
-
-                # Expand to array of one item for one-to-one for uniformity
-                related_data = [related_data]
-
-            instances = self._prefetch_related_instances(field, related_data)
-
             save_kwargs = self._get_save_kwargs(field_name)
-            if isinstance(related_field, GenericRelation):
+            if is_generic_relation(related_field):
                 save_kwargs.update(
                     self._get_generic_lookup(instance, related_field),
                 )
             elif not related_field.many_to_many:
                 save_kwargs[related_field.name] = instance
+            policy = self._get_deferred_orphan_fields().get(field_name)
+            if policy is not None:
+                # Orphans marked by earlier saves are kept if passed again
+                save_kwargs.update(get_orphan_clear_values(
+                    field.Meta.model, policy))
+
+            if related_field.many_to_one:
+                self._reparent_references(
+                    instance, field_name, related_field, related_serializers)
+            if field_name in self._get_order_fields() and \
+                    not related_field.many_to_many and \
+                    self._get_list_operations(field_name) is None:
+                # Saved items get their positions with the save. Items with
+                # no other changes aren't saved but linked as references,
+                # so moved ones are updated afterwards with one query
+                for index, serializer in enumerate(related_serializers):
+                    if isinstance(serializer, Reference):
+                        continue
+                    if self._is_unchanged(serializer, save_kwargs):
+                        related_serializers[index] = Reference(
+                            serializer.instance)
+                    else:
+                        serializer._nested_position = \
+                            self._position_offset + index
 
-            new_related_instances = []
-            errors = []
-            for data in related_data:
-                obj = instances.get(
-                    self._get_related_pk(data, field.Meta.model)
-                )
-                serializer = self._get_serializer_for_field(
-                    field,
-                    instance=obj,
-                    data=data,
-                )
-                try:
-                    serializer.is_valid(raise_exception=True)
-                    related_instance = serializer.save(**save_kwargs)
-                    data['pk'] = related_instance.pk
-                    new_related_instances.append(related_instance)
-                    errors.append({})
-                except ValidationError as exc:
-                    errors.append(exc.detail)
-
-            if any(errors):
-                if related_field.one_to_one:
-                    raise ValidationError({field_name: errors[0]})
-                else:
-                    raise ValidationError({field_name: errors})
+            if related_field.many_to_many and \
+                    field_name in self._get_get_or_create_fields():
+                new_related_instances, errors = \
+                    self._get_or_create_related_instances(
+                        field_name, field, related_data, related_serializers,
+                        save_kwargs)
+            elif is_generic_relation(related_field):
+                new_related_instances, errors = \
+                    self._save_generic_related_serializers(
+                        instance, field_name, related_field, field,
+                        related_data, related_serializers, save_kwargs)
+            elif field_name in self._get_through_fields() and \
+                    self._get_list_operations(field_name) is None and \
+                    self._can_bulk_write(related_serializers):
+                new_related_instances, errors = \
+                    self._save_through_serializers(
+                        instance, field_name, related_field, field,
+                        related_data, related_serializers, save_kwargs)
+                if self._synced_fields is not None:
+                    # Missing rows are already deleted
+                    self._synced_fields.add(field_name)
+            else:
+                new_related_instances, errors = \
+                    self._save_related_serializers(
+                        field_name, related_data, related_serializers,
+                        save_kwargs)
+
+            self._raise_relation_errors(field_name, related_field, errors)
+            if field_name in self._get_order_fields() and \
+                    not related_field.many_to_many and \
+                    self._get_list_operations(field_name) is None:
+                self._update_positions(
+                    field_name, field, new_related_instances)
+            if self._related_instances is not None:
+                self._related_instances[field_name] = new_related_instances
 
             if related_field.many_to_many:
                 # Add m2m instances to through model via add
-                m2m_manager = getattr(instance, field_source)
-                m2m_manager.add(*new_related_instances)
+                self._add_links(instance, field_source, new_related_instances)
+
+    def _reparent_references(self, instance, field_name, related_field,
+                             related_serializers):
+        """
+        Moves existing children referenced by primary key from other parents
+        to `instance` with one query. Marks of orphans are cleared too.
+        """
+        parent_id = getattr(instance, related_field.target_field.attname)
+        policy = self._get_deferred_orphan_fields().get(field_name)
+        clear_values = {} if policy is None else \
+            get_orphan_clear_values(related_field.model, policy)
+        moved = [
+            serializer.instance for serializer in related_serializers
+            if isinstance(serializer, Reference) and
+            serializer.instance is not None and (
+                getattr(serializer.instance, related_field.attname) !=
+                parent_id or
+                # Marked orphans referenced again are unmarked
+                any(getattr(serializer.instance, name) != value
+                    for name, value in clear_values.items()))
+        ]
+        if not moved:
+            return
+
+        self._update_rows(
+            related_field.model, [obj.pk for obj in moved],
+            dict(clear_values, **{related_field.name: instance}))
+        for obj in moved:
+            setattr(obj, related_field.attname, parent_id)
+            compat.set_cached_value(related_field, obj, instance)
+            for name, value in clear_values.items():
+                setattr(obj, name, value)
+        self._track_write(field_name, 'updated', [obj.pk for obj in moved])
+
+    def _get_order_fields(self):
+        return getattr(self.Meta, 'order_fields', {})
+
+    def _is_unchanged(self, serializer, save_kwargs):
+        """
+        Returns whether saving the existing object of a plain nested
+        serializer with `save_kwargs` wouldn't change any of its fields.
+        """
+        if serializer.instance is None or not serializer.is_valid() or \
+                not is_bulk_writable(serializer, serializer.validated_data):
+            return False
+
+        instance = serializer.instance
+        values = dict(serializer.validated_data, **save_kwargs)
+        for name, value in values.items():
+            try:
+                field = instance._meta.get_field(name)
+            except FieldDoesNotExist:
+                return False
+            if not field.concrete:
+                return False
+            if field.is_relation and isinstance(value, Model):
+                value = value.pk
+            if getattr(instance, field.attname) != value:
+                return False
+
+        return True
+
+    def _get_item_save_kwargs(self, field_name, serializer, save_kwargs):
+        position = getattr(serializer, '_nested_position', None)
+        if position is None:
+            return save_kwargs
+
+        return dict(save_kwargs, **{
+            self._get_order_fields()[field_name]: position})
+
+    def _update_positions(self, field_name, field, related_instances):
+        """
+        Sets positions of nested objects from the order of the data. Only
+        changed positions are written, with one query.
+        """
+        model_class = field.Meta.model
+        order_field = model_class._meta.get_field(
+            self._get_order_fields()[field_name])
+
+        moved = []
+        for position, related_instance in enumerate(
+                related_instances, self._position_offset):
+            if getattr(related_instance, order_field.attname) != position:
+                setattr(related_instance, order_field.attname, position)
+                moved.append(related_instance)
+        if not moved:
+            return
+
+        updated = set((self._write_result or {}).get(
+            field_name, {}).get('updated', []))
+        self._track_write(field_name, 'updated', [
+            obj.pk for obj in moved if obj.pk not in updated])
+
+        change_set = self._get_change_set()
+        if change_set is not None:
+            for related_instance in moved:
+                # New objects are told apart by their temporary keys
+                change_set.add_update(
+                    model_class, change_set.get_key(related_instance),
+                    {order_field.attname: getattr(
+                        related_instance, order_field.attname)})
+            return
+
+        positions = OrderedDict(
+            (obj.pk, getattr(obj, order_field.attname)) for obj in moved)
+
+        model_class._default_manager.filter(pk__in=list(positions)).update(**{
+            order_field.attname: Case(
+                *[When(pk=pk, then=Value(position))
+                  for pk, position in positions.items()],
+                output_field=order_field
+            ),
+        })
 
-    def update_or_create_direct_relations(self, attrs, relations):
-        for field_name, (field, field_source) in relations.items():
-            obj = None
-            data = self.get_initial()[field_name]
-            model_class = field.Meta.model
+    def _prefetch_related_serializers(self, related_serializers):
+        # Existing reverse one-to-one objects of all updated items are
+        # looked up at once instead of one query per item
+        by_class = OrderedDict()
+        for serializer in related_serializers:
+            if isinstance(serializer, BaseNestedModelSerializer) and \
+                    serializer.instance is not None:
+                by_class.setdefault(type(serializer), []).append(serializer)
+
+        for nested in by_class.values():
+            if len(nested) < 2:
+                continue
+
+            field_names = []
+            for serializer in nested:
+                for field_name in serializer._get_reverse_one_to_one_fields():
+                    if field_name not in field_names:
+                        field_names.append(field_name)
+            if field_names:
+                nested[0].prefetch_reverse_one_to_one(
+                    [serializer.instance for serializer in nested],
+                    field_names)
+
+    def _get_write_order(self, related_serializers):
+        indexes = list(range(len(related_serializers)))
+        if not self._is_row_locking():
+            return indexes
+
+        # Existing objects are updated in the order of primary keys,
+        # the same order they are locked in
+        def get_key(index):
+            obj = related_serializers[index].instance
+            if obj is None or obj.pk is None:
+                return 1, index, None
+            return 0, 0, obj.pk
+
+        return sorted(indexes, key=get_key)
+
+    def _save_related_serializers(self, field_name, related_data,
+                                  related_serializers, save_kwargs):
+        related_instances = [None for _ in related_data]
+        errors = [{} for _ in related_data]
+        error_count = 0
+        self._prefetch_related_serializers(related_serializers)
+        for index in self._get_write_order(related_serializers):
+            if self._is_max_errors_reached(error_count):
+                # Fail fast: the rest of the list isn't processed
+                break
+
+            data = related_data[index]
+            serializer = related_serializers[index]
+            if isinstance(serializer, Reference):
+                # Existing objects are linked without saving
+                if serializer.instance is None:
+                    errors[index] = {api_settings.NON_FIELD_ERRORS_KEY: [
+                        self.error_messages['reference_does_not_exist']
+                        .format(pk_value=data.get('pk'))
+                    ]}
+                    error_count += 1
+                else:
+                    related_instances[index] = serializer.instance
+                continue
+
+            try:
+                serializer.is_valid(raise_exception=True)
+                created = serializer.instance is None
+                related_instance = self._save_related_serializer(
+                    serializer, self._get_item_save_kwargs(
+                        field_name, serializer, save_kwargs))
+                data['pk'] = related_instance.pk
+                related_instances[index] = related_instance
+                self._track_write(
+                    field_name, 'created' if created else 'updated',
+                    [related_instance.pk])
+            except ValidationError as exc:
+                errors[index] = exc.detail
+                error_count += 1
+
+        new_related_instances = [
+            related_instance for related_instance in related_instances
+            if related_instance is not None
+        ]
+        return new_related_instances, errors
+
+    def _get_existing_related_pks(self, instance, field_name, related_field,
+                                  model_class):
+        if self._existing_related_pks is None:
+            self._existing_related_pks = {}
+        if field_name not in self._existing_related_pks:
+            self._existing_related_pks[field_name] = set(
+                model_class._default_manager.filter(
+                    **self._get_generic_lookup(instance, related_field)
+                ).values_list('pk', flat=True))
+
+        return self._existing_related_pks[field_name]
+
+    def _save_generic_related_serializers(self, instance, field_name,
+                                          related_field, field, related_data,
+                                          related_serializers, save_kwargs):
+        """
+        Saves items of a generic relation. New items of fields listed in
+        `bulk_create_fields` are inserted with one query with the content
+        type and the object id already set.
+        """
+        model_class = field.Meta.model
+        read_back = not returns_bulk_pks(model_class)
+        bulk = field_name in self._get_bulk_create_fields() and (
+            # Inserted rows are told apart from rows inserted concurrently
+            # only inside a transaction
+            not read_back or
+            connections[router.db_for_write(model_class)].in_atomic_block)
+        if self.instance is not None or bulk and read_back:
+            # Existing items are known before new ones are inserted, so
+            # inserted rows and orphans can be told apart
+            existing_pks = self._get_existing_related_pks(
+                instance, field_name, related_field, model_class)
+
+        bulk_indexes = [
+            index for index, serializer in enumerate(related_serializers)
+            if bulk and not isinstance(serializer, Reference) and
+            serializer.instance is None and serializer.is_valid() and
+            self._can_bulk_create(serializer)
+        ]
+        if len(bulk_indexes) < 2:
+            bulk_indexes = []
+
+        indexes = [index for index in range(len(related_data))
+                   if index not in bulk_indexes]
+        saved_instances, saved_errors = self._save_related_serializers(
+            field_name,
+            [related_data[index] for index in indexes],
+            [related_serializers[index] for index in indexes],
+            save_kwargs)
+
+        related_instances = [None for _ in related_data]
+        errors = [{} for _ in related_data]
+        saved_instances = iter(saved_instances)
+        for index, error in zip(indexes, saved_errors):
+            errors[index] = error
+            if not error:
+                related_instances[index] = next(saved_instances)
+
+        if bulk_indexes:
+            bulk_instances = [
+                model_class(**dict(
+                    related_serializers[index].validated_data,
+                    **self._get_item_save_kwargs(
+                        field_name, related_serializers[index], save_kwargs)))
+                for index in bulk_indexes
+            ]
+            self._bulk_create(model_class, bulk_instances)
+            if any(obj.pk is None for obj in bulk_instances):
+                # The database doesn't return primary keys of inserted rows,
+                # they are read back in the order of insertion
+                queryset = model_class._default_manager.filter(
+                    **self._get_generic_lookup(instance, related_field)
+                ).exclude(
+                    pk__in=existing_pks,
+                ).exclude(
+                    pk__in=[obj.pk for obj in related_instances if obj],
+                ).order_by('pk')
+                for obj, pk in zip(bulk_instances,
+                                   queryset.values_list('pk', flat=True)):
+                    obj.pk = pk
+                self._add_to_identity_map(bulk_instances)
+
+            for index, obj in zip(bulk_indexes, bulk_instances):
+                related_data[index]['pk'] = obj.pk
+                related_instances[index] = obj
+            self._track_write(
+                field_name, 'created', [obj.pk for obj in bulk_instances])
+
+        return [obj for obj in related_instances if obj is not None], errors
+
+    def _get_bulk_create_fields(self):
+        return getattr(self.Meta, 'bulk_create_fields', ())
+
+    def _get_through_fields(self):
+        return getattr(self.Meta, 'through_fields', {})
+
+    def _can_bulk_write(self, related_serializers):
+        return all(
+            not isinstance(serializer, Reference) and
+            serializer.is_valid() and
+            is_bulk_writable(serializer, serializer.validated_data)
+            for serializer in related_serializers
+        )
+
+    def _save_through_serializers(self, instance, field_name, related_field,
+                                  field, related_data, related_serializers,
+                                  save_kwargs):
+        """
+        Writes rows of a many-to-many through model identified by the target
+        foreign key in bulk: current rows are read with one query, then new
+        rows are inserted, changed rows are updated and missing rows are
+        deleted with one query each.
+        """
+        model_class = field.Meta.model
+        manager = model_class._default_manager
+        key_field = model_class._meta.get_field(
+            self._get_through_fields()[field_name])
+        parent_lookup = {related_field.name: instance}
+
+        current = OrderedDict()
+        if self.instance is not None:
+            for row in manager.filter(**parent_lookup):
+                current.setdefault(getattr(row, key_field.attname), row)
+
+        items = []
+        errors = [{} for _ in related_serializers]
+        keys = set()
+        for index, serializer in enumerate(related_serializers):
+            values = dict(
+                serializer.validated_data, **self._get_item_save_kwargs(
+                    field_name, serializer, save_kwargs))
+            key = values.get(key_field.attname)
+            if isinstance(values.get(key_field.name), Model):
+                key = values[key_field.name].pk
+            if key in keys:
+                # A second row of the same target can't be told apart
+                errors[index] = {key_field.name: [
+                    self.error_messages['duplicate_through_key']]}
+            keys.add(key)
+            items.append((key, values))
+        if any(errors):
+            return [], errors
+
+        rows = []
+        new_rows = []
+        changed_rows = []
+        changed_fields = set()
+        for key, values in items:
+            row = current.pop(key, None)
+            if row is None:
+                row = model_class(**values)
+                new_rows.append(row)
+            else:
+                changed = []
+                for name, value in values.items():
+                    model_field = model_class._meta.get_field(name)
+                    if model_field.is_relation and model_field.concrete:
+                        # Related objects of rows aren't loaded
+                        current_value = getattr(row, model_field.attname)
+                        if isinstance(value, Model):
+                            value = value.pk
+                    else:
+                        current_value = getattr(row, name)
+                    if current_value != value:
+                        changed.append(model_field.name)
+                if changed:
+                    for name, value in values.items():
+                        setattr(row, name, value)
+                    changed_rows.append(row)
+                    changed_fields.update(changed)
+            rows.append(row)
+
+        if current:
+            # Rows of targets missing in the data
+            deleted_pks = [row.pk for row in current.values()]
+            try:
+                self._delete_rows(model_class, deleted_pks)
+            except ProtectedError as e:
+                self.fail('cannot_delete_protected', instances=', '.join([
+                    str(obj) for obj in e.args[1]]))
+            self._track_write(field_name, 'deleted', deleted_pks)
+
+        if changed_rows:
+            if self._is_row_locking():
+                changed_rows.sort(key=lambda row: row.pk)
+            self._bulk_update(
+                model_class, changed_rows, sorted(changed_fields))
+            self._track_write(
+                field_name, 'updated', [row.pk for row in changed_rows])
+
+        if new_rows:
+            self._bulk_create(model_class, new_rows)
+            if any(row.pk is None for row in new_rows):
+                # The database doesn't return primary keys of inserted rows
+                pks = dict(manager.filter(**dict(parent_lookup, **{
+                    '{}__in'.format(key_field.attname): [
+                        getattr(row, key_field.attname) for row in new_rows
+                    ],
+                })).values_list(key_field.attname, 'pk'))
+                for row in new_rows:
+                    row.pk = pks.get(getattr(row, key_field.attname))
+                self._add_to_identity_map(new_rows)
+            self._track_write(
+                field_name, 'created', [row.pk for row in new_rows])
+
+        for data, row in zip(related_data, rows):
+            data['pk'] = row.pk
+
+        return rows, errors
+
+    def _get_get_or_create_fields(self):
+        return getattr(self.Meta, 'get_or_create_fields', {})
+
+    def _can_bulk_create(self, serializer):
+        return is_bulk_creatable(serializer, serializer.validated_data)
+
+    def _bulk_create(self, model_class, related_instances):
+        change_set = self._get_change_set()
+        if change_set is not None:
+            for obj in related_instances:
+                change_set.add_insert(obj)
+            return
+
+        model_class.objects.bulk_create(related_instances)
+        self._add_to_identity_map(related_instances)
+
+    def _bulk_update(self, model_class, related_instances, field_names):
+        change_set = self._get_change_set()
+        if change_set is not None:
+            for obj in related_instances:
+                change_set.add_update(model_class, obj.pk, OrderedDict(
+                    (model_class._meta.get_field(name).attname,
+                     getattr(obj, model_class._meta.get_field(name).attname))
+                    for name in field_names))
+            return
+
+        manager = model_class._default_manager
+        if hasattr(manager, 'bulk_update'):
+            manager.bulk_update(related_instances, field_names)
+        else:
+            # Django < 2.2
+            for obj in related_instances:
+                obj.save(update_fields=field_names)
+
+    def _update_rows(self, model_class, pks, values):
+        change_set = self._get_change_set()
+        if change_set is not None:
+            for pk in pks:
+                change_set.add_update(model_class, pk, values)
+            return
+
+        model_class._default_manager.filter(pk__in=pks).update(**values)
+
+    def _delete_rows(self, model_class, pks):
+        change_set = self._get_change_set()
+        if change_set is not None:
+            # Cascades aren't collected
+            change_set.add_delete(model_class, pks)
+            return
+
+        model_class._default_manager.filter(pk__in=pks).delete()
+        self._add_deleted_signal(model_class, pks)
+
+    def _add_links(self, instance, field_source, related_instances):
+        change_set = self._get_change_set()
+        if change_set is not None:
+            change_set.add_links(instance, field_source, related_instances)
+            return
+
+        getattr(instance, field_source).add(*related_instances)
+
+    def _remove_links(self, instance, field_source, pks):
+        change_set = self._get_change_set()
+        if change_set is not None:
+            change_set.remove_links(instance, field_source, pks)
+            return
+
+        getattr(instance, field_source).remove(*pks)
+
+    def _add_to_identity_map(self, related_instances):
+        identity_map = self._get_identity_map()
+        if identity_map is not None:
+            for related_instance in related_instances:
+                if related_instance.pk is not None:
+                    identity_map.add(related_instance, saved=True)
+
+    def _get_instances_by_keys(self, model_class, key_sources, keys):
+        if not keys:
+            return {}
+
+        lookup = Q()
+        for key in keys:
+            lookup |= Q(**dict(zip(key_sources, key)))
+
+        instances = {}
+        for related_instance in model_class.objects.filter(lookup):
+            key = tuple(
+                getattr(related_instance, source) for source in key_sources)
+            instances.setdefault(key, related_instance)
+
+        return instances
+
+    def _get_or_create_related_instances(self, field_name, field,
+                                         related_data, related_serializers,
+                                         save_kwargs):
+        """
+        Collapses identical items of a many-to-many field by primary key or
+        by key fields, links existing objects found by key fields in one
+        query and creates missing ones once.
+        """
+        model_class = field.Meta.model
+        key_fields = self._get_get_or_create_fields()[field_name]
+        key_sources = [field.fields[name].source for name in key_fields]
+
+        errors = [{} for _ in related_data]
+        # Indexes of occurrences of every distinct item
+        groups = OrderedDict()
+        for index, data in enumerate(related_data):
             pk = self._get_related_pk(data, model_class)
             if pk:
-                obj = model_class.objects.filter(
-                    pk=pk,
-                ).first()
-            serializer = self._get_serializer_for_field(
-                field,
-                instance=obj,
-                data=data,
-            )
+                group_key = ('pk', pk)
+            else:
+                group_key = ('key', tuple(
+                    data.get(name) for name in key_fields))
+            groups.setdefault(group_key, []).append(index)
+
+        group_instances = {}
+        keyed_groups = OrderedDict()
+        for group_key, indexes in groups.items():
+            serializer = related_serializers[indexes[0]]
+            if group_key[0] == 'pk':
+                instances, group_errors = self._save_related_serializers(
+                    field_name, [related_data[indexes[0]]], [serializer],
+                    save_kwargs)
+                if instances:
+                    group_instances[group_key] = instances[0]
+                errors[indexes[0]] = group_errors[0]
+            elif not serializer.is_valid():
+                errors[indexes[0]] = serializer.errors
+            else:
+                key = tuple(
+                    serializer.validated_data.get(source)
+                    for source in key_sources)
+                keyed_groups[group_key] = (key, serializer)
+
+        instances = self._get_instances_by_keys(
+            model_class, key_sources,
+            [key for key, serializer in keyed_groups.values()])
+
+        bulk_keys = []
+        for key, serializer in keyed_groups.values():
+            if key in instances:
+                continue
+            if self._can_bulk_create(serializer):
+                instances[key] = model_class(
+                    **dict(serializer.validated_data, **save_kwargs))
+                bulk_keys.append(key)
+            else:
+                instances[key] = self._save_related_serializer(
+                    serializer, save_kwargs)
+                self._track_write(field_name, 'created', [instances[key].pk])
+
+        if bulk_keys:
+            bulk_instances = [instances[key] for key in bulk_keys]
+            self._bulk_create(model_class, bulk_instances)
+            if any(obj.pk is None for obj in bulk_instances):
+                # The database doesn't return primary keys of inserted rows
+                instances.update(self._get_instances_by_keys(
+                    model_class, key_sources, bulk_keys))
+            self._track_write(field_name, 'created', [
+                instances[key].pk for key in bulk_keys])
+
+        for group_key, (key, serializer) in keyed_groups.items():
+            group_instances[group_key] = instances[key]
+
+        new_related_instances = []
+        for group_key, indexes in groups.items():
+            related_instance = group_instances.get(group_key)
+            if related_instance is None:
+                continue
+            for index in indexes:
+                related_data[index]['pk'] = related_instance.pk
+            new_related_instances.append(related_instance)
+
+        return new_related_instances, errors
+
+    def update_or_create_direct_relations(self, attrs, relations):
+        for field_name, (field, field_source) in relations.items():
+            serializer = self._get_direct_related_serializer(field_name, field)
 
             try:
                 serializer.is_valid(raise_exception=True)
-                attrs[field_source] = serializer.save(
-                    **self._get_save_kwargs(field_name)
-                )
+                created = serializer.instance is None
+                attrs[field_source] = self._save_related_serializer(
+                    serializer, self._get_save_kwargs(field_name))
             except ValidationError as exc:
                 raise ValidationError({field_name: exc.detail})
 
+            self._track_write(
+                field_name, 'created' if created else 'updated',
+                [attrs[field_source].pk])
+
+    def _get_identity_map(self):
+        return (self._nested_root or self)._identity_map
+
+    def _save_related_serializer(self, serializer, save_kwargs):
+        change_set = self._get_change_set()
+        if change_set is not None and \
+                not isinstance(serializer, BaseNestedModelSerializer):
+            # Plain model serializers are replaced by their default
+            # create and update
+            return change_set.save(
+                serializer.Meta.model, serializer.instance,
+                dict(serializer.validated_data, **save_kwargs))
+
+        identity_map = self._get_identity_map()
+        if identity_map is None:
+            return serializer.save(**save_kwargs)
+
+        # Objects met in several branches of the payload are written once
+        data = dict(serializer.validated_data)
+        if serializer.instance is not None and \
+                identity_map.is_saved(serializer.instance):
+            conflicts = identity_map.get_conflicts(serializer.instance, data)
+            if conflicts:
+                raise ValidationError(dict(
+                    (name, [self.error_messages['conflicting_data']])
+                    for name in conflicts))
+            return serializer.instance
+
+        related_instance = serializer.save(**save_kwargs)
+        identity_map.add(related_instance, saved=True, data=data)
+
+        return related_instance
+
+    def _track_write(self, field_name, operation, pks):
+        if self._write_result is None:
+            self._write_result = OrderedDict()
+        _add_write(self._write_result, field_name, operation, pks)
+
+        root = self._nested_root or self
+        if operation != 'deleted' and root._claimed_pks is not None:
+            # Saved objects can't be orphans of other parents of the tree
+            field = self.fields[field_name]
+            model_class = getattr(field, 'child', field).Meta.model
+            root._claimed_pks.update(
+                (model_class._meta.concrete_model, str(pk)) for pk in pks)
+
+    def _get_prefetch_cache_name(self, instance, field_source):
+        manager = getattr(instance, field_source)
+        # Many-to-many and generic relation managers
+        cache_name = getattr(manager, 'prefetch_cache_name', None)
+        if cache_name is None:
+            # Reverse foreign key managers
+            cache_name = manager.field.remote_field.get_cache_name()
+
+        return cache_name
+
+    def populate_prefetch_cache(self, instance, reverse_relations):
+        """
+        Fills prefetch caches of `instance` with saved nested objects,
+        so rendering of the saved instance doesn't query them again.
+        """
+        if not hasattr(instance, '_prefetched_objects_cache'):
+            instance._prefetched_objects_cache = {}
+
+        for field_name, (related_field, field, field_source) in \
+                reverse_relations.items():
+            if related_field.one_to_one:
+                # Reverse one-to-one caches are filled on save,
+                # only the removed object should be forgotten
+                if field_name not in self._related_instances:
+                    compat.set_cached_value(
+                        related_field.remote_field, instance, None)
+                continue
+
+            if field_name not in self._related_instances:
+                continue
+
+            cache_name = self._get_prefetch_cache_name(instance, field_source)
+            instance._prefetched_objects_cache.pop(cache_name, None)
+            if self._get_list_operations(field_name) is not None:
+                # Only touched objects are known, so the cache is dropped
+                continue
+
+            related_instances = OrderedDict(
+                (related_instance.pk, related_instance)
+                for related_instance in self._related_instances[field_name]
+            )
+            queryset = getattr(instance, field_source).get_queryset()
+            queryset._result_cache = list(related_instances.values())
+            queryset._prefetch_done = True
+            instance._prefetched_objects_cache[cache_name] = queryset
+
+    def _start_write(self):
+        self._write_result = OrderedDict()
+        self._related_instances = OrderedDict()
+        self._existing_related_pks = {}
+        self._synced_fields = set()
+
+    def _finish_write(self, instance, reverse_relations):
+        if getattr(self.Meta, 'populate_prefetch_cache', True) and \
+                self._get_change_set() is None:
+            self.populate_prefetch_cache(instance, reverse_relations)
+        self._related_instances = None
+        self._existing_related_pks = None
+        self._synced_fields = None
+
+        batch = self._get_signal_batch()
+        for field_name, result in (self._write_result or {}).items():
+            field = self.fields[field_name]
+            batch.add_saved(getattr(field, 'child', field).Meta.model,
+                            result['created'], result['updated'])
+        if batch is not (self._nested_root or self)._signal_batch:
+            batch.send_on_commit(router.db_for_write(self.Meta.model))
+
+        # Keep the result on the instance, so it can be rendered
+        # for every instance saved by `many=True` serializers
+        instance._nested_write_result = self._write_result or OrderedDict()
+        self._write_result = None
+
+    def _get_change_set(self):
+        return (self._nested_root or self)._change_set
+
+    def _get_signal_batch(self):
+        # Signals are sent once when the whole tree is saved
+        return (self._nested_root or self)._signal_batch or \
+            signals.SignalBatch()
+
+    def to_compact_representation(self, instance, write_result):
+        """
+        Returns the primary key of the saved instance and primary keys of
+        nested objects created, updated and deleted (or unlinked for
+        many-to-many relations) by the save.
+        """
+        ret = OrderedDict([('pk', instance.pk)])
+        ret.update(write_result)
+
+        return ret
+
+    def to_representation(self, instance):
+        if getattr(self.Meta, 'compact_response', False):
+            write_result = getattr(instance, '_nested_write_result', None)
+            if write_result is not None:
+                return self.to_compact_representation(instance, write_result)
+
+        return super(BaseNestedModelSerializer, self).to_representation(
+            instance)
+
+    def _is_preflight_enabled(self):
+        return getattr(self.Meta, 'preflight_validation', False) and \
+            self._prepared_serializers is None
+
+    def _preflight_validate(self, related_serializers, unique_values):
+        errors = []
+        error_count = 0
+        for serializer in related_serializers:
+            if self._is_max_errors_reached(error_count):
+                # Fail fast: the rest of the list isn't validated
+                errors.extend({} for _ in range(
+                    len(related_serializers) - len(errors)))
+                return errors
+
+            if isinstance(serializer, Reference):
+                errors.append({})
+                continue
+
+            try:
+                serializer.is_valid(raise_exception=True)
+                if isinstance(serializer, BaseNestedModelSerializer):
+                    relations, reverse_relations = \
+                        serializer._extract_relations(
+                            dict(serializer.validated_data))
+                    serializer.preflight_relations(
+                        serializer.instance, relations, reverse_relations,
+                        unique_values=unique_values)
+                errors.append({})
+            except ValidationError as exc:
+                errors.append(exc.detail)
+                error_count += 1
+
+        self._validate_unique_fields_in_bulk(
+            related_serializers, errors, unique_values)
+
+        return errors
+
+    def _validate_unique_fields_in_bulk(self, related_serializers, errors,
+                                        unique_values):
+        # Runs checks of `UniqueFieldsMixin` with one query per field
+        # instead of one query per serializer. `unique_values` collects
+        # values of the whole tree to find duplicates between branches
+        unique_errors = defaultdict(dict)
+        candidates = defaultdict(list)
+        for index, serializer in enumerate(related_serializers):
+            if not errors[index] and \
+                    isinstance(serializer, UniqueFieldsMixin):
+                candidates[serializer.Meta.model].append((index, serializer))
+
+        for model_class, items in candidates.items():
+            field_names = OrderedDict()
+            for index, serializer in items:
+                for field_name in serializer._unique_fields:
+                    field_names[field_name] = \
+                        serializer.fields[field_name].source
+
+            for field_name, source in field_names.items():
+                values = OrderedDict()
+                for index, serializer in items:
+                    if field_name in serializer._unique_fields and \
+                            source in serializer.validated_data:
+                        values[index] = serializer.validated_data[source]
+
+                existing = defaultdict(set)
+                for value, pk in model_class.objects.filter(**{
+                    '{}__in'.format(source): set(values.values()),
+                }).values_list(source, 'pk'):
+                    existing[value].add(pk)
+
+                for index, value in values.items():
+                    instance = related_serializers[index].instance
+                    own_pk = instance.pk if instance is not None else None
+                    key = (model_class, source, value)
+                    if existing[value] - {own_pk} or key in unique_values:
+                        unique_errors[index][field_name] = [
+                            UniqueValidator.message]
+                    unique_values.add(key)
+
+        for index, serializer in enumerate(related_serializers):
+            if index in unique_errors:
+                errors[index] = unique_errors[index]
+            elif not errors[index] and \
+                    isinstance(serializer, UniqueFieldsMixin):
+                serializer._unique_fields_validated = True
+
+    def preflight_relations(self, instance, relations, reverse_relations,
+                            unique_values=None):
+        """
+        Validates all nested objects of the whole tree before any write.
+        Raises `ValidationError` with errors of all nested fields.
+        Validated serializers are reused by the write phase.
+        """
+        if unique_values is None:
+            unique_values = set()
+        prepared = {}
+        errors = OrderedDict()
+
+        for field_name, (field, field_source) in relations.items():
+            serializer = self._get_direct_related_serializer(field_name, field)
+            prepared[field_name] = serializer
+            field_errors = self._preflight_validate(
+                [serializer], unique_values)
+            if field_errors[0]:
+                errors[field_name] = field_errors[0]
+
+        for field_name, (related_field, field, field_source) in \
+                reverse_relations.items():
+            related_data, related_serializers = \
+                self._get_reverse_related_serializers(
+                    instance, field_name, related_field, field, field_source)
+            prepared[field_name] = (related_data, related_serializers)
+            field_errors = self._preflight_validate(
+                related_serializers, unique_values)
+            try:
+                self._raise_relation_errors(
+                    field_name, related_field, field_errors)
+            except ValidationError as exc:
+                errors.update(exc.detail)
+
+        if errors:
+            raise ValidationError(errors)
+
+        self._prepared_serializers = prepared
+
+    def _is_atomic_save(self):
+        if self._nested_root is not None and \
+                self._nested_root._is_atomic_save():
+            # Nested serializers are saved in the transaction of the root
+            return False
+
+        # Locks are held until the end of the transaction
+        return getattr(self.Meta, 'atomic', False) or \
+            getattr(self.Meta, 'lock_rows', False)
+
+    def _is_row_locking(self):
+        root = self._nested_root or self
+        return getattr(root.Meta, 'lock_rows', False) and \
+            root._change_set is None
+
     def save(self, **kwargs):
+        if self._nested_root is None:
+            key = idempotency.get_key(self, kwargs)
+            if key is not None:
+                return idempotency.run(
+                    self, key, lambda: self._save_with_retries(kwargs))
+
+        return self._save_with_retries(kwargs)
+
+    def dry_run(self, **kwargs):
+        """
+        Runs the save of the nested tree without writes and returns
+        a `changes.ChangeSet` with rows to insert, update and delete and
+        many-to-many links to add and remove. Existing objects are read as
+        by a real save. Nested serializers which aren't nested model
+        serializers are replaced by the default `create` and `update`, and
+        cascades of deletes aren't collected. Custom `create` and `update`
+        of nested model serializers are run in a transaction which is
+        always rolled back.
+        """
+        assert hasattr(self, '_errors'), (
+            'You must call `.is_valid()` before calling `.dry_run()`.'
+        )
+        kwargs.pop('idempotency_key', None)
+        kwargs.pop('idempotency_scope', None)
+        initial_data = copy.deepcopy(getattr(self, 'initial_data', None))
+        validated_data = dict(self._validated_data)
+        instance = self.instance
+
+        self._change_set = changes.ChangeSet()
+        using = router.db_for_write(self.Meta.model)
+        try:
+            with transaction.atomic(using=using):
+                try:
+                    self._save_attempt(kwargs)
+                    return self._change_set
+                finally:
+                    transaction.set_rollback(True, using=using)
+        finally:
+            self._change_set = None
+            # The serializer can be saved after the dry run
+            self.instance = instance
+            if initial_data is not None:
+                self.initial_data = initial_data
+            self._validated_data = validated_data
+
+    def _save_with_retries(self, kwargs):
+        if not self._is_atomic_save():
+            return self._save_attempt(kwargs)
+
+        using = router.db_for_write(self.Meta.model)
+        attempts = 1
+        if self._nested_root is None and \
+                not connections[using].in_atomic_block:
+            # Only a transaction which isn't a part of an outer one can be
+            # run again
+            attempts += getattr(self.Meta, 'save_retries', 0)
+        if attempts > 1:
+            initial_data = copy.deepcopy(getattr(self, 'initial_data', None))
+            validated_data = dict(self._validated_data)
+
+        for attempt in range(attempts):
+            try:
+                with transaction.atomic(
+                        using=using,
+                        savepoint=getattr(self.Meta, 'atomic_savepoint',
+                                          True)):
+                    instance = self._save_attempt(kwargs)
+            except DatabaseError as exc:
+                if attempt + 1 == attempts or \
+                        not retry.is_retryable_error(exc):
+                    if attempt:
+                        retry.increment('exhausted', self.Meta.model)
+                    raise
+
+                retry.increment('retried', self.Meta.model)
+                # Data changed by the failed attempt are restored
+                self.initial_data = copy.deepcopy(initial_data)
+                self._validated_data = dict(validated_data)
+                if self.instance is not None:
+                    # Objects cached by the failed attempt may not exist
+                    self.instance.refresh_from_db()
+                    compat.clear_cached_values(self.instance)
+                time.sleep(
+                    getattr(self.Meta, 'save_retry_backoff', 0.05) *
+                    2 ** attempt)
+                continue
+
+            if attempt:
+                retry.increment('recovered', self.Meta.model)
+            return instance
+
+    def _save_attempt(self, kwargs):
+        # Nested `save` arguments are changed while saving
+        kwargs = dict(
+            (key, dict(value) if isinstance(value, dict) else value)
+            for key, value in kwargs.items())
         self._save_kwargs = defaultdict(dict, kwargs)
+        if self._nested_root is None:
+            self._identity_map = IdentityMap() \
+                if getattr(self.Meta, 'identity_map', False) else None
+
+        return self._save_tree(**kwargs)
+
+    def _save_tree(self, **kwargs):
+        if self._nested_root is not None:
+            return super(BaseNestedModelSerializer, self).save(**kwargs)
+
+        # Orphans are deleted when the whole tree is saved, so children
+        # moved to another parent of the tree aren't deleted
+        self._deferred_deletes = []
+        self._claimed_pks = set()
+        self._signal_batch = signals.SignalBatch()
+        try:
+            if getattr(self.Meta, 'suppress_row_signals', False):
+                with signals.suppress_row_signals():
+                    instance = super(BaseNestedModelSerializer, self).save(
+                        **kwargs)
+                    self._run_deferred_deletes()
+            else:
+                instance = super(BaseNestedModelSerializer, self).save(
+                    **kwargs)
+                self._run_deferred_deletes()
+            if self._change_set is None:
+                self._signal_batch.send_on_commit(
+                    router.db_for_write(self.Meta.model))
+        finally:
+            self._deferred_deletes = None
+            self._claimed_pks = None
+            self._signal_batch = None
+
+        return instance
+
+    def _get_background_fields(self):
+        return getattr(self.Meta, 'background_fields', {})
+
+    def _split_background_relations(self, reverse_relations):
+        """
+        Removes nested lists larger than their `background_fields` threshold
+        from `reverse_relations` and returns them.
+        """
+        background_relations = OrderedDict()
+        if self._get_change_set() is not None:
+            # Dry runs collect changes of all items
+            return background_relations
+
+        for field_name, threshold in self._get_background_fields().items():
+            if field_name not in reverse_relations:
+                continue
+
+            related_field = reverse_relations[field_name][0]
+            related_data = self.get_initial().get(field_name)
+            if related_field.one_to_one or \
+                    not isinstance(related_data, list) or \
+                    len(related_data) <= threshold:
+                continue
+
+            if self._save_kwargs.get(field_name):
+                raise TypeError(
+                    _("Arguments to nested serializer's `save` can't be "
+                      "passed to background saving of `{}`.").format(
+                        field_name))
+            background_relations[field_name] = reverse_relations.pop(
+                field_name)
+
+        return background_relations
+
+    def _schedule_background_relations(self, instance, background_relations):
+        tasks = {}
+        for field_name in background_relations:
+            tasks[field_name] = background.schedule(
+                self, instance, field_name, self.get_initial()[field_name],
+                getattr(self.Meta, 'background_batch_size', 500),
+                using=router.db_for_write(self.Meta.model))
+
+        if tasks:
+            instance._nested_background_tasks = tasks
+
+    def get_background_context(self):
+        """
+        Returns the context of serializers saving items in background
+        tasks. A queue-backed executor needs a serializable context.
+        """
+        return self.context
+
+    def save_batch(self, field_name, related_data, start=0):
+        """
+        Saves a batch of items of a reverse relation of the instance in one
+        transaction. `start` is the index of the first item in the whole
+        list, so items of ordered lists get their positions in it. It's
+        used by background tasks.
+        """
+        field = self.fields[field_name]
+        related_field, direct = self._get_related_field(field)
+        self.initial_data = {field_name: related_data}
+        self._position_offset = start
+        self._save_kwargs = defaultdict(dict)
+        self._start_write()
+        with transaction.atomic(using=router.db_for_write(self.Meta.model)):
+            self.update_or_create_reverse_relations(
+                self.instance,
+                OrderedDict([(field_name, (related_field,
+                                           getattr(field, 'child', field),
+                                           field.source))]),
+            )
+        self._finish_write(self.instance, OrderedDict())
+
+    def _get_deferred_orphan_fields(self):
+        return getattr(self.Meta, 'deferred_orphan_fields', {})
+
+    def _remove_orphans(self, field_name, related_field, model_class, pks):
+        """
+        Deletes orphans of a reverse relation. Orphans of fields listed in
+        `deferred_orphan_fields` are detached and marked with one query
+        instead, and are deleted later by `orphans.sweep`.
+        """
+        policy = self._get_deferred_orphan_fields().get(field_name)
+        if policy is None:
+            self._delete_rows(model_class, pks)
+        else:
+            self._update_rows(
+                model_class, pks,
+                get_orphan_values(related_field, model_class, policy))
+
+    def _add_deleted_signal(self, model_class, pks):
+        batch = self._get_signal_batch()
+        batch.add_deleted(model_class, pks)
+        if batch is not (self._nested_root or self)._signal_batch:
+            batch.send_on_commit(router.db_for_write(self.Meta.model))
+
+    def _run_deferred_deletes(self):
+        for serializer, instance, field_name, related_field, model_class, \
+                pks in self._deferred_deletes:
+            pks = [
+                pk for pk in pks
+                if (model_class._meta.concrete_model, str(pk))
+                not in self._claimed_pks
+            ]
+            if not pks:
+                continue
+
+            try:
+                serializer._remove_orphans(
+                    field_name, related_field, model_class, pks)
+            except ProtectedError as e:
+                serializer.fail('cannot_delete_protected', instances=", ".join(
+                    [str(obj) for obj in e.args[1]]))
 
-        return super(BaseNestedModelSerializer, self).save(**kwargs)
+            write_result = getattr(instance, '_nested_write_result', None)
+            if write_result is not None:
+                _add_write(write_result, field_name, 'deleted', pks)
 
     def _get_save_kwargs(self, field_name):
         save_kwargs = self._save_kwargs[field_name]
@@ -244,8 +2243,12 @@ class NestedCreateMixin(BaseNestedModelSerializer):
     Adds nested create feature
     """
     def create(self, validated_data):
+        self._start_write()
         relations, reverse_relations = self._extract_relations(validated_data)
 
+        if self._is_preflight_enabled():
+            self.preflight_relations(None, relations, reverse_relations)
+
         # Create or update direct relations (foreign key, one-to-one)
         self.update_or_create_direct_relations(
             validated_data,
@@ -253,9 +2256,18 @@ class NestedCreateMixin(BaseNestedModelSerializer):
         )
 
         # Create instance
-        instance = super(NestedCreateMixin, self).create(validated_data)
+        change_set = self._get_change_set()
+        if change_set is not None:
+            instance = change_set.save(
+                self.Meta.model, None, validated_data)
+        else:
+            instance = super(NestedCreateMixin, self).create(validated_data)
 
+        background_relations = self._split_background_relations(
+            reverse_relations)
         self.update_or_create_reverse_relations(instance, reverse_relations)
+        self._finish_write(instance, reverse_relations)
+        self._schedule_background_relations(instance, background_relations)
 
         return instance
 
@@ -271,8 +2283,12 @@ class NestedUpdateMixin(BaseNestedModelSerializer):
     }
 
     def update(self, instance, validated_data):
+        self._start_write()
         relations, reverse_relations = self._extract_relations(validated_data)
 
+        if self._is_preflight_enabled():
+            self.preflight_relations(instance, relations, reverse_relations)
+
         # Create or update direct relations (foreign key, one-to-one)
         self.update_or_create_direct_relations(
             validated_data,
@@ -280,12 +2296,18 @@ class NestedUpdateMixin(BaseNestedModelSerializer):
         )
 
         # Update instance
-        instance = super(NestedUpdateMixin, self).update(
-            instance,
-            validated_data,
-        )
+        change_set = self._get_change_set()
+        if change_set is not None:
+            instance = change_set.save(
+                self.Meta.model, instance, validated_data)
+        else:
+            instance = super(NestedUpdateMixin, self).update(
+                instance,
+                validated_data,
+            )
         self.update_or_create_reverse_relations(instance, reverse_relations)
         self.delete_reverse_relations_if_need(instance, reverse_relations)
+        self._finish_write(instance, reverse_relations)
         return instance
 
     def delete_reverse_relations_if_need(self, instance, reverse_relations):
@@ -296,9 +2318,13 @@ class NestedUpdateMixin(BaseNestedModelSerializer):
         # Delete instances which is missed in data
         for field_name, (related_field, field, field_source) in \
                 reverse_relations.items():
+            if field_name in (self._synced_fields or ()):
+                continue
+
             model_class = field.Meta.model
 
             related_data = self.get_initial()[field_name]
+            operations = self._get_list_operations(field_name)
             # Expand to array of one item for one-to-one for uniformity
             if related_field.one_to_one:
                 related_data = [related_data]
@@ -310,7 +2336,7 @@ class NestedUpdateMixin(BaseNestedModelSerializer):
                 related_field_lookup = {
                     related_field.remote_field.name: instance,
                 }
-            elif isinstance(related_field, GenericRelation):
+            elif is_generic_relation(related_field):
                 related_field_lookup = \
                     self._get_generic_lookup(instance, related_field)
             else:
@@ -318,23 +2344,51 @@ class NestedUpdateMixin(BaseNestedModelSerializer):
                     related_field.name: instance,
                 }
 
-            current_ids = self._extract_related_pks(field, related_data)
+            queryset = model_class.objects.filter(**related_field_lookup)
+            if operations is not None:
+                # Only explicitly removed items are deleted,
+                # the rest of the collection isn't scanned
+                queryset = queryset.filter(pk__in=self._extract_related_pks(
+                    field, operations['remove']))
+            else:
+                queryset = queryset.exclude(
+                    pk__in=self._extract_related_pks(field, related_data))
 
+            existing_pks = (self._existing_related_pks or {}).get(field_name)
             try:
-                pks_to_delete = list(
-                    model_class.objects.filter(
-                        **related_field_lookup
-                    ).exclude(
-                        pk__in=current_ids
-                    ).values_list('pk', flat=True)
-                )
+                if existing_pks is not None:
+                    # Existing items were read while saving, so orphans are
+                    # found without a query
+                    if operations is not None:
+                        removed = set(self._extract_related_pks(
+                            field, operations['remove']))
+                        pks_to_delete = [pk for pk in existing_pks
+                                         if str(pk) in removed]
+                    else:
+                        kept = set(self._extract_related_pks(
+                            field, related_data))
+                        pks_to_delete = [pk for pk in existing_pks
+                                         if str(pk) not in kept]
+                else:
+                    pks_to_delete = list(
+                        queryset.values_list('pk', flat=True))
+
+                root = self._nested_root or self
+                if not related_field.many_to_many and \
+                        not related_field.one_to_one and \
+                        root._deferred_deletes is not None:
+                    root._deferred_deletes.append(
+                        (self, instance, field_name, related_field,
+                         model_class, pks_to_delete))
+                    continue
 
+                self._track_write(field_name, 'deleted', pks_to_delete)
                 if related_field.many_to_many:
                     # Remove relations from m2m table
-                    m2m_manager = getattr(instance, field_source)
-                    m2m_manager.remove(*pks_to_delete)
-                else:
-                    model_class.objects.filter(pk__in=pks_to_delete).delete()
+                    self._remove_links(instance, field_source, pks_to_delete)
+                elif pks_to_delete:
+                    self._remove_orphans(
+                        field_name, related_field, model_class, pks_to_delete)
 
             except ProtectedError as e:
                 instances = e.args[1]
@@ -381,6 +2435,7 @@ class UniqueFieldsMixin(serializers.ModelSerializer):
     you should put `UniqueFieldsMixin` ahead.
     """
     _unique_fields = []
+    _unique_fields_validated = False
 
     def get_fields(self):
         self._unique_fields = []
@@ -411,9 +2466,11 @@ class UniqueFieldsMixin(serializers.ModelSerializer):
                 raise ValidationError({field_name: exc.detail})
 
     def create(self, validated_data):
-        self._validate_unique_fields(validated_data)
+        if not self._unique_fields_validated:
+            self._validate_unique_fields(validated_data)
         return super(UniqueFieldsMixin, self).create(validated_data)
 
     def update(self, instance, validated_data):
-        self._validate_unique_fields(validated_data)
+        if not self._unique_fields_validated:
+            self._validate_unique_fields(validated_data)
         return super(UniqueFieldsMixin, self).update(instance, validated_data)
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+from collections import OrderedDict
+
+from django.db import router, transaction
+from django.db.models import FieldDoesNotExist
+
+from .mixins import BaseNestedModelSerializer, get_orphan_lookup
+from .plans import iter_nested_fields, iter_serializers
+
+
+def get_orphan_querysets(serializer_classes=None):
+    """
+    Returns querysets of orphans marked by fields listed in
+    `deferred_orphan_fields` of the given serializer classes, the serializers
+    nested in them or registered ones if `serializer_classes` is not passed.
+    """
+    querysets = OrderedDict()
+    for serializer in iter_serializers(serializer_classes):
+        if not isinstance(serializer, BaseNestedModelSerializer):
+            continue
+
+        policies = serializer._get_deferred_orphan_fields()
+        for field_name, field, nested in iter_nested_fields(serializer):
+            if field_name not in policies:
+                continue
+            try:
+                related_field, direct = serializer._get_related_field(field)
+            except FieldDoesNotExist:
+                continue
+
+            model_class = nested.Meta.model
+            lookup = get_orphan_lookup(
+                related_field, model_class, policies[field_name])
+            key = (model_class, tuple(sorted(lookup.items())))
+            querysets.setdefault(
+                key, model_class._default_manager.filter(**lookup))
+
+    return list(querysets.values())
+
+
+def sweep_queryset(queryset, chunk_size=500, max_chunks=None):
+    """
+    Deletes objects of the queryset in chunks of `chunk_size` objects, each
+    chunk (with its cascades) in its own transaction. Returns the number of
+    deleted objects of the queryset model.
+    """
+    model_class = queryset.model
+    deleted = 0
+    chunks = 0
+    while max_chunks is None or chunks < max_chunks:
+        pks = list(queryset.values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            break
+
+        with transaction.atomic(using=router.db_for_write(model_class)):
+            # Objects which stopped being orphans meanwhile are kept
+            counts = queryset.filter(pk__in=pks).delete()[1]
+        deleted += counts.get(model_class._meta.label, 0)
+        chunks += 1
+
+    return deleted
+
+
+def sweep(serializer_classes=None, chunk_size=500, max_chunks=None):
+    """
+    Deletes orphans left by `deferred_orphan_fields` in bounded chunks.
+    Returns a dict of numbers of deleted orphans keyed by model label.
+    It can be run by a periodic task or with the `sweep_nested_orphans`
+    management command.
+    """
+    result = OrderedDict()
+    for queryset in get_orphan_querysets(serializer_classes):
+        label = queryset.model._meta.label
+        result[label] = result.get(label, 0) + sweep_queryset(
+            queryset, chunk_size=chunk_size, max_chunks=max_chunks)
+
+    return result
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+from django.db import DatabaseError
+from django.db.models import FieldDoesNotExist, Prefetch
+from rest_framework import serializers
+
+from .mixins import (
+    BaseNestedModelSerializer, get_content_type_model, get_related_field,
+    is_generic_relation,
+)
+
+
+_registry = []
+
+# Cache of prefetch plans keyed by serializer class
+_prefetch_plans = {}
+
+
+def register(serializer_class):
+    """
+    Registers a nested serializer class for `warm_up`.
+    Can be used as a class decorator.
+    """
+    if serializer_class not in _registry:
+        _registry.append(serializer_class)
+
+    return serializer_class
+
+
+def iter_nested_fields(serializer):
+    """
+    Yields `(field_name, field, nested_serializer)` for every field of
+    `serializer` which is a nested model serializer (or a list of them).
+    """
+    for field_name, field in serializer.fields.items():
+        nested = field
+        if isinstance(field, serializers.ListSerializer):
+            nested = field.child
+
+        if isinstance(nested, serializers.ModelSerializer):
+            yield field_name, field, nested
+
+
+def _get_serializer_classes(nested):
+    # Polymorphic serializers keep the real serializers in a mapping
+    mapping = getattr(nested, 'model_serializer_mapping', None)
+    if mapping:
+        return [serializer.__class__ for serializer in mapping.values()]
+
+    return [nested.__class__]
+
+
+def iter_serializers(serializer_classes=None):
+    """
+    Yields an instance of every serializer class in the trees of the given
+    serializer classes (or registered ones), each class once.
+    """
+    if serializer_classes is None:
+        serializer_classes = _registry
+
+    seen = set()
+    pending = list(serializer_classes)
+    while pending:
+        serializer_class = pending.pop()
+        if serializer_class in seen:
+            continue
+        seen.add(serializer_class)
+
+        serializer = serializer_class()
+        for field_name, field, nested in iter_nested_fields(serializer):
+            pending.extend(_get_serializer_classes(nested))
+
+        yield serializer
+
+
+def warm_up(serializer_classes=None):
+    """
+    Resolves the model fields behind nested fields, the content types of
+    generic relations and the prefetch plans of the given serializer
+    classes and all serializers nested in them, so the first real request
+    doesn't pay for it. Other metadata, like the fields of serializers,
+    is still built per serializer instance. Uses registered classes if
+    `serializer_classes` is not passed.
+
+    It's safe to call it from `AppConfig.ready()`: content types which
+    can't be fetched yet (e.g. before `migrate`) are skipped.
+    """
+    warmed = []
+    for serializer in iter_serializers(serializer_classes):
+        warmed.append(serializer.__class__)
+        if not isinstance(serializer, BaseNestedModelSerializer):
+            continue
+
+        get_prefetch_plan(serializer.__class__)
+        for field_name, field, nested in iter_nested_fields(serializer):
+            try:
+                related_field, direct = serializer._get_related_field(field)
+            except FieldDoesNotExist:
+                continue
+
+            if is_generic_relation(related_field):
+                try:
+                    get_content_type_model().objects.get_for_model(
+                        serializer.Meta.model,
+                        for_concrete_model=related_field.for_concrete_model,
+                    )
+                except DatabaseError:
+                    pass
+
+    return warmed
+
+
+def _prefix_lookup(prefix, lookup):
+    if isinstance(lookup, Prefetch):
+        return Prefetch(
+            '{}__{}'.format(prefix, lookup.prefetch_through),
+            queryset=lookup.queryset,
+            to_attr=lookup.to_attr,
+        )
+
+    return '{}__{}'.format(prefix, lookup)
+
+
+def _build_prefetch_plan(serializer):
+    select_related = []
+    prefetch_related = []
+
+    for field_name, field, nested in iter_nested_fields(serializer):
+        try:
+            related_field, direct = get_related_field(
+                serializer.Meta.model, field.source)
+        except FieldDoesNotExist:
+            continue
+
+        nested_select, nested_prefetch = _build_prefetch_plan(nested)
+        if isinstance(field, serializers.ListSerializer):
+            # Many-to-one, many-to-many and generic relations
+            if nested_select or nested_prefetch:
+                queryset = apply_lookups(
+                    nested.Meta.model._default_manager.all(),
+                    nested_select, nested_prefetch,
+                )
+                prefetch_related.append(
+                    Prefetch(field.source, queryset=queryset))
+            else:
+                prefetch_related.append(field.source)
+        else:
+            # Forward and reverse one-to-one and foreign keys
+            select_related.append(field.source)
+            select_related.extend(
+                _prefix_lookup(field.source, lookup)
+                for lookup in nested_select)
+            prefetch_related.extend(
+                _prefix_lookup(field.source, lookup)
+                for lookup in nested_prefetch)
+
+    return select_related, prefetch_related
+
+
+def get_prefetch_plan(serializer_class):
+    """
+    Returns `(select_related, prefetch_related)` lookups which load all
+    nested relations of the serializer class tree with minimal queries.
+    Nested lists which have nested relations themselves are prefetched
+    with `Prefetch` objects.
+    """
+    if serializer_class not in _prefetch_plans:
+        _prefetch_plans[serializer_class] = _build_prefetch_plan(
+            serializer_class())
+
+    return _prefetch_plans[serializer_class]
+
+
+def apply_lookups(queryset, select_related, prefetch_related):
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetch_related:
+        queryset = queryset.prefetch_related(*prefetch_related)
+
+    return queryset
+
+
+def prefetch_queryset(queryset, serializer_class):
+    """
+    Applies the prefetch plan of the serializer class to the queryset,
+    e.g. in `get_queryset` of a viewset.
+    """
+    return apply_lookups(queryset, *get_prefetch_plan(serializer_class))
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import threading
+from collections import Counter
+
+# SQLSTATE codes of PostgreSQL: serialization failure and deadlock
+RETRYABLE_SQLSTATES = ('40001', '40P01')
+# Error codes of MySQL: lock wait timeout and deadlock
+RETRYABLE_MYSQL_CODES = (1205, 1213)
+RETRYABLE_MESSAGES = (
+    'deadlock', 'could not serialize access', 'database is locked',
+)
+
+_lock = threading.Lock()
+_counters = Counter()
+
+
+def is_retryable_error(exc):
+    """
+    Returns `True` for database errors caused by deadlocks or serialization
+    failures, which can succeed when the transaction is run again.
+    """
+    cause = getattr(exc, '__cause__', None) or exc
+    if getattr(cause, 'pgcode', None) in RETRYABLE_SQLSTATES:
+        return True
+    args = getattr(cause, 'args', ())
+    if args and args[0] in RETRYABLE_MYSQL_CODES:
+        return True
+
+    message = str(exc).lower()
+    return any(text in message for text in RETRYABLE_MESSAGES)
+
+
+def increment(name, model_class=None):
+    with _lock:
+        _counters[name] += 1
+        if model_class is not None:
+            _counters['{}:{}'.format(name, model_class._meta.label)] += 1
+
+
+def get_counters():
+    """
+    Returns counters of retried saves: `retried` (attempts repeated),
+    `recovered` (saves succeeded after a retry) and `exhausted` (saves
+    failed after all attempts), also per model as `<name>:<model label>`.
+    """
+    with _lock:
+        return dict(_counters)
+
+
+def reset_counters():
+    with _lock:
+        _counters.clear()
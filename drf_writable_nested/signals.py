@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from django.db import transaction
+from django.dispatch import Signal
+
+
+# Sent once per model when the transaction of a nested save is committed.
+# Arguments: `sender` (model class), `created`, `updated` (primary keys).
+nested_bulk_saved = Signal()
+
+# Sent once per model when the transaction of a nested save is committed.
+# Arguments: `sender` (model class), `pks` (primary keys of deleted objects).
+nested_bulk_deleted = Signal()
+
+_state = threading.local()
+
+
+def row_signals_suppressed():
+    """
+    Returns `True` while a nested save with `suppress_row_signals` is
+    running in the current thread.
+    """
+    return getattr(_state, 'depth', 0) > 0
+
+
+@contextmanager
+def suppress_row_signals():
+    _state.depth = getattr(_state, 'depth', 0) + 1
+    try:
+        yield
+    finally:
+        _state.depth -= 1
+
+
+def skip_when_suppressed(receiver):
+    """
+    Decorates per-row receivers (e.g. of `post_save` or `post_delete`), so
+    they aren't called for objects written by nested saves with
+    `suppress_row_signals`. Batched signals are handled instead.
+    """
+    @wraps(receiver)
+    def wrapper(*args, **kwargs):
+        if row_signals_suppressed():
+            return None
+        return receiver(*args, **kwargs)
+
+    return wrapper
+
+
+class SignalBatch(object):
+    """
+    Collects primary keys of written objects by model to send batched
+    signals once.
+    """
+    def __init__(self):
+        self.saved = {}
+        self.deleted = {}
+        self.models = []
+
+    def _add_model(self, model_class):
+        if model_class not in self.models:
+            self.models.append(model_class)
+
+    def add_saved(self, model_class, created, updated):
+        self._add_model(model_class)
+        saved = self.saved.setdefault(
+            model_class, {'created': [], 'updated': []})
+        saved['created'].extend(created)
+        saved['updated'].extend(updated)
+
+    def add_deleted(self, model_class, pks):
+        self._add_model(model_class)
+        self.deleted.setdefault(model_class, []).extend(pks)
+
+    def send(self):
+        for model_class in self.models:
+            saved = self.saved.get(model_class)
+            if saved and (saved['created'] or saved['updated']):
+                nested_bulk_saved.send(
+                    sender=model_class,
+                    created=saved['created'],
+                    updated=saved['updated'],
+                )
+            if self.deleted.get(model_class):
+                nested_bulk_deleted.send(
+                    sender=model_class, pks=self.deleted[model_class])
+
+    def send_on_commit(self, using):
+        """
+        Sends the signals when the current transaction is committed, so
+        receivers don't act on writes which are rolled back.
+        """
+        transaction.on_commit(self.send, using=using)
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import DatabaseError, router, transaction
+from django.utils.translation import ugettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import (
+    NotAuthenticated, PermissionDenied, ValidationError,
+)
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from . import idempotency
+
+try:
+    from rest_framework.decorators import action
+    bulk_route = action(detail=False, methods=['post'])
+except ImportError:  # DRF < 3.8
+    from rest_framework.decorators import list_route
+    bulk_route = list_route(methods=['post'])
+
+
+CREATED = 'created'
+UPDATED = 'updated'
+INVALID = 'invalid'
+FORBIDDEN = 'forbidden'
+FAILED = 'failed'
+
+
+class NestedBulkSaveMixin(object):
+    """
+    Adds a `bulk` action to a `GenericViewSet` which saves a list of
+    nested records with the serializer of the viewset.
+
+    Records are saved in chunks of `bulk_chunk_size`, each chunk in its
+    own transaction, and every record in a savepoint, so an invalid record
+    doesn't roll back others. Records with a primary key update objects of
+    `get_queryset()`, found with one query per chunk, which pass
+    `check_object_permissions`. The response has a status of every record.
+    """
+    bulk_chunk_size = 500
+    # Maximum number of records in a request, `None` for no limit
+    bulk_max_records = None
+
+    bulk_error_messages = {
+        'not_a_list': _('Expected a list of records but got '
+                        '"{input_type}".'),
+        'max_records': _('Ensure there are no more than {max_records} '
+                         'records.'),
+        'does_not_exist': _('Invalid pk "{pk_value}" - object does not '
+                            'exist.'),
+        'incorrect_type': _('Incorrect type. Expected pk value, received '
+                            '{data_type}.'),
+        'database_error': _('The record could not be saved.'),
+    }
+
+    def get_bulk_chunk_size(self):
+        return self.bulk_chunk_size
+
+    def _get_bulk_records(self, request):
+        records = request.data
+        if not isinstance(records, list):
+            raise ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [
+                self.bulk_error_messages['not_a_list'].format(
+                    input_type=type(records).__name__)
+            ]})
+        if self.bulk_max_records is not None and \
+                len(records) > self.bulk_max_records:
+            raise ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [
+                self.bulk_error_messages['max_records'].format(
+                    max_records=self.bulk_max_records)
+            ]})
+
+        return records
+
+    def _get_record_pk(self, record, model_class):
+        if not isinstance(record, dict):
+            return None
+
+        return record.get('pk') or record.get(model_class._meta.pk.attname)
+
+    def _get_bulk_instances(self, chunk, model_class):
+        pk_field = model_class._meta.pk
+        pks = []
+        for record in chunk:
+            pk = self._get_record_pk(record, model_class)
+            if not pk:
+                continue
+            try:
+                pks.append(pk_field.to_python(pk))
+            except DjangoValidationError:
+                # Reported as invalid records
+                pass
+        if not pks:
+            return {}
+
+        return {
+            str(pk): instance for pk, instance in
+            self.get_queryset().in_bulk(pks).items()
+        }
+
+    def _get_error_result(self, index, record_status, message):
+        return OrderedDict([
+            ('index', index),
+            ('status', record_status),
+            ('errors', {api_settings.NON_FIELD_ERRORS_KEY: [message]}),
+        ])
+
+    def perform_bulk_save(self, serializer, **kwargs):
+        serializer.save(**kwargs)
+
+    def _get_save_kwargs(self, serializer, index):
+        key = self.request.META.get(idempotency.HEADER)
+        if key and getattr(serializer.Meta, 'idempotency_header', False):
+            # Records of a repeated request are saved once
+            return {'idempotency_key': '{}:{}'.format(key, index)}
+
+        return {}
+
+    def _save_record(self, index, record, instances, model_class):
+        pk = self._get_record_pk(record, model_class)
+        instance = None
+        if pk:
+            try:
+                pk = model_class._meta.pk.to_python(pk)
+            except DjangoValidationError:
+                return self._get_error_result(
+                    index, INVALID,
+                    self.bulk_error_messages['incorrect_type'].format(
+                        data_type=type(pk).__name__))
+            instance = instances.get(str(pk))
+            if instance is None:
+                return self._get_error_result(
+                    index, INVALID,
+                    self.bulk_error_messages['does_not_exist'].format(
+                        pk_value=pk))
+            try:
+                self.check_object_permissions(self.request, instance)
+            except (NotAuthenticated, PermissionDenied) as exc:
+                return self._get_error_result(index, FORBIDDEN, exc.detail)
+
+        serializer = self.get_serializer(instance=instance, data=record)
+        try:
+            serializer.is_valid(raise_exception=True)
+            with transaction.atomic(using=router.db_for_write(model_class)):
+                self.perform_bulk_save(
+                    serializer, **self._get_save_kwargs(serializer, index))
+        except ValidationError as exc:
+            return OrderedDict([
+                ('index', index),
+                ('status', INVALID),
+                ('errors', exc.detail),
+            ])
+        except DatabaseError:
+            return self._get_error_result(
+                index, FAILED, self.bulk_error_messages['database_error'])
+
+        return OrderedDict([
+            ('index', index),
+            ('status', CREATED if instance is None else UPDATED),
+            ('pk', serializer.instance.pk),
+        ])
+
+    def save_bulk_chunk(self, offset, chunk):
+        """
+        Saves records of a chunk in one transaction and returns their
+        statuses.
+        """
+        model_class = self.get_queryset().model
+        with transaction.atomic(using=router.db_for_write(model_class)):
+            instances = self._get_bulk_instances(chunk, model_class)
+            return [
+                self._save_record(offset + index, record, instances,
+                                  model_class)
+                for index, record in enumerate(chunk)
+            ]
+
+    @bulk_route
+    def bulk(self, request, *args, **kwargs):
+        records = self._get_bulk_records(request)
+        chunk_size = self.get_bulk_chunk_size()
+
+        results = []
+        for offset in range(0, len(records), chunk_size):
+            results.extend(self.save_bulk_chunk(
+                offset, records[offset:offset + chunk_size]))
+
+        counts = OrderedDict(
+            (name, 0)
+            for name in (CREATED, UPDATED, INVALID, FORBIDDEN, FAILED))
+        for result in results:
+            counts[result['status']] += 1
+
+        return Response(
+            OrderedDict([('counts', counts), ('results', results)]),
+            status=status.HTTP_200_OK)
@@ -33,7 +33,11 @@ setup(
               ' serializers drf_writable_nested'),
     author='beda.software',
     author_email='drfwritablenested@beda.software',
-    packages=['drf_writable_nested'],
+    packages=[
+        'drf_writable_nested',
+        'drf_writable_nested.management',
+        'drf_writable_nested.management.commands',
+    ],
     zip_safe=False,
     classifiers=[
         'Development Status :: 4 - Beta',
@@ -147,3 +147,44 @@ class I86Name(models.Model):
 class I86Genre(models.Model):
     pass
 
+
+class Project(models.Model):
+    name = models.CharField(max_length=100)
+    members = models.ManyToManyField(
+        User, through='Membership', related_name='projects')
+    tags = GenericRelation(Tag)
+
+
+class Membership(models.Model):
+    project = models.ForeignKey(Project, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    role = models.CharField(max_length=100)
+    ordering = models.PositiveIntegerField(default=0)
+
+
+class Playlist(models.Model):
+    name = models.CharField(max_length=100)
+
+
+class Track(models.Model):
+    playlist = models.ForeignKey(
+        Playlist, on_delete=models.CASCADE, related_name='tracks')
+    title = models.CharField(max_length=100)
+    position = models.PositiveIntegerField(default=0)
+
+
+class Folder(models.Model):
+    name = models.CharField(max_length=100)
+
+
+class Note(models.Model):
+    folder = models.ForeignKey(
+        Folder, on_delete=models.CASCADE, related_name='notes',
+        null=True, blank=True)
+    text = models.CharField(max_length=100)
+    orphaned_at = models.DateTimeField(null=True, blank=True)
+
+
+class NoteAttachment(models.Model):
+    note = models.ForeignKey(
+        Note, on_delete=models.CASCADE, related_name='attachments')
@@ -1,3 +1,4 @@
+from django.db import OperationalError
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from drf_writable_nested.serializers import WritableNestedModelSerializer
@@ -98,6 +99,11 @@ class TaggedItemSerializer(WritableNestedModelSerializer):
         )
 
 
+class BulkTaggedItemSerializer(TaggedItemSerializer):
+    class Meta(TaggedItemSerializer.Meta):
+        bulk_create_fields = ('tags',)
+
+
 class TeamSerializer(WritableNestedModelSerializer):
     members = UserSerializer(many=True, required=False)
 
@@ -311,3 +317,245 @@ class I86GenreSerializer(WritableNestedModelSerializer):
     class Meta:
         model = models.I86Genre
         fields = ('id', 'names',)
+
+
+# Preflight validation
+
+class PreflightUserWithCustomPKSerializer(UserWithCustomPKSerializer):
+    class Meta(UserWithCustomPKSerializer.Meta):
+        preflight_validation = True
+
+
+class PreflightTeamSerializer(WritableNestedModelSerializer):
+    members = UserWithCustomPKSerializer(many=True)
+
+    class Meta:
+        model = models.Team
+        fields = ('members', 'name',)
+        preflight_validation = True
+
+
+# Atomic save
+
+class AtomicReverseForeignKeyChildSerializer(
+        ReverseForeignKeyChildSerializer):
+    class Meta(ReverseForeignKeyChildSerializer.Meta):
+        atomic = True
+
+
+class AtomicNoSavepointReverseForeignKeyChildSerializer(
+        ReverseForeignKeyChildSerializer):
+    class Meta(ReverseForeignKeyChildSerializer.Meta):
+        atomic = True
+        atomic_savepoint = False
+
+
+# Operation-based nested lists
+
+class ListOperationsProfileSerializer(ProfileSerializer):
+    class Meta(ProfileSerializer.Meta):
+        list_operation_fields = ('sites', 'avatars',)
+
+
+# Compact response
+
+class CompactResponseUserSerializer(UserSerializer):
+    class Meta(UserSerializer.Meta):
+        compact_response = True
+
+
+class CompactResponseProfileSerializer(ProfileSerializer):
+    class Meta(ProfileSerializer.Meta):
+        compact_response = True
+
+
+# Identity map
+
+class IdentityMapTeamSerializer(TeamSerializer):
+    class Meta(TeamSerializer.Meta):
+        identity_map = True
+
+
+# Get or create of many-to-many items
+
+class GetOrCreateProfileSerializer(ProfileSerializer):
+    class Meta(ProfileSerializer.Meta):
+        get_or_create_fields = {'sites': ('url',)}
+
+
+# Reference-only fast path
+
+class ReferenceProfileSerializer(ProfileSerializer):
+    class Meta(ProfileSerializer.Meta):
+        reference_fast_path = True
+
+
+# Many-to-many through model rows
+
+class MembershipSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.Membership
+        fields = ('pk', 'user', 'role', 'ordering',)
+
+
+class ProjectSerializer(WritableNestedModelSerializer):
+    memberships = MembershipSerializer(many=True, source='membership_set')
+
+    class Meta:
+        model = models.Project
+        fields = ('pk', 'name', 'memberships',)
+        through_fields = {'memberships': 'user'}
+
+
+class TaggedProjectSerializer(ProjectSerializer):
+    tags = TagSerializer(many=True)
+
+    class Meta(ProjectSerializer.Meta):
+        fields = ('pk', 'name', 'memberships', 'tags',)
+
+
+# Ordered nested lists
+
+class TrackSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.Track
+        fields = ('pk', 'title',)
+
+
+class PlaylistSerializer(WritableNestedModelSerializer):
+    tracks = TrackSerializer(many=True)
+
+    class Meta:
+        model = models.Playlist
+        fields = ('pk', 'name', 'tracks',)
+        order_fields = {'tracks': 'position'}
+
+
+class ReferencePlaylistSerializer(PlaylistSerializer):
+    class Meta(PlaylistSerializer.Meta):
+        reference_fast_path = True
+
+
+# Deferred orphans
+
+class NoteSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.Note
+        fields = ('pk', 'text',)
+
+
+class DetachingFolderSerializer(WritableNestedModelSerializer):
+    notes = NoteSerializer(many=True)
+
+    class Meta:
+        model = models.Folder
+        fields = ('pk', 'name', 'notes',)
+        deferred_orphan_fields = {'notes': ('detach', 'orphaned_at')}
+
+
+# Orphans are always detached and marked, so these are rejected
+class MarkingFolderSerializer(DetachingFolderSerializer):
+    class Meta(DetachingFolderSerializer.Meta):
+        deferred_orphan_fields = {'notes': 'orphaned_at'}
+
+
+class DetachOnlyFolderSerializer(DetachingFolderSerializer):
+    class Meta(DetachingFolderSerializer.Meta):
+        deferred_orphan_fields = {'notes': 'detach'}
+
+
+# Background nested lists
+
+class BackgroundPlaylistSerializer(PlaylistSerializer):
+    class Meta(PlaylistSerializer.Meta):
+        background_fields = {'tracks': 3}
+        background_batch_size = 2
+
+
+class BackgroundTrackSerializer(TrackSerializer):
+    def create(self, validated_data):
+        if validated_data['title'] == 'rejected':
+            raise ValidationError({'title': ['Rejected on save.']})
+        validated_data['title'] += self.context.get('suffix', '')
+        return super(BackgroundTrackSerializer, self).create(validated_data)
+
+
+class BackgroundContextPlaylistSerializer(BackgroundPlaylistSerializer):
+    tracks = BackgroundTrackSerializer(many=True)
+
+
+# Batched signals
+
+class SuppressedSignalsTeamSerializer(TeamSerializer):
+    class Meta(TeamSerializer.Meta):
+        suppress_row_signals = True
+
+
+# Row locking
+
+class LockingProfileSerializer(ProfileSerializer):
+    class Meta(ProfileSerializer.Meta):
+        lock_rows = True
+
+
+# Retries of saves
+
+class FlakyAvatarSerializer(AvatarSerializer):
+    # Number of following creates failing with a deadlock
+    failures = 0
+    error = OperationalError('deadlock detected')
+
+    def create(self, validated_data):
+        if FlakyAvatarSerializer.failures:
+            FlakyAvatarSerializer.failures -= 1
+            raise self.error
+
+        return super(FlakyAvatarSerializer, self).create(validated_data)
+
+
+class RetryingProfileSerializer(ProfileSerializer):
+    avatars = FlakyAvatarSerializer(many=True)
+
+    class Meta(ProfileSerializer.Meta):
+        atomic = True
+        save_retries = 2
+        save_retry_backoff = 0
+
+
+# Sparse errors and fail-fast validation
+
+class SparseErrorsProfileSerializer(ProfileSerializer):
+    class Meta(ProfileSerializer.Meta):
+        sparse_errors = True
+
+
+class FailFastProfileSerializer(ProfileSerializer):
+    class Meta(ProfileSerializer.Meta):
+        sparse_errors = True
+        max_errors = 2
+
+
+class FailFastReverseForeignKeyChildSerializer(
+        ReverseForeignKeyChildSerializer):
+    class Meta(ReverseForeignKeyChildSerializer.Meta):
+        max_errors = 1
+
+
+# Idempotency keys
+
+class IdempotentUserSerializer(UserSerializer):
+    class Meta(UserSerializer.Meta):
+        compact_response = True
+        idempotency_header = True
+
+
+# Dry run
+
+class SideEffectProfileSerializer(ProfileSerializer):
+    def create(self, validated_data):
+        models.Site.objects.create(url='http://side-effect.com')
+        return super(SideEffectProfileSerializer, self).create(validated_data)
+
+
+class SideEffectUserSerializer(UserSerializer):
+    profile = SideEffectProfileSerializer(required=False, allow_null=True)
@@ -0,0 +1,107 @@
+from django.test import TestCase, TransactionTestCase
+
+from drf_writable_nested import background
+
+from . import serializers
+
+
+class BackgroundRelationsTest(TransactionTestCase):
+    def setUp(self):
+        background.set_executor(background.ImmediateExecutor())
+        self.addCleanup(background.set_executor, None)
+
+    def create(self, size, titles=None,
+               serializer_class=serializers.BackgroundPlaylistSerializer,
+               context=None, **kwargs):
+        if titles is None:
+            titles = [str(index) for index in range(size)]
+        serializer = serializer_class(data={
+            'name': 'playlist',
+            'tracks': [{'title': title} for title in titles],
+        }, context=context or {})
+        serializer.is_valid(raise_exception=True)
+        return serializer.save(**kwargs)
+
+    def test_large_list_is_saved_in_background(self):
+        playlist = self.create(5)
+
+        tasks = background.get_tasks(playlist)
+        self.assertListEqual(list(tasks), ['tracks'])
+        self.assertDictEqual(background.get_status(tasks['tracks']), {
+            'status': background.DONE,
+            'total': 5,
+            'processed': 5,
+            'errors': {},
+        })
+        self.assertListEqual(
+            sorted(playlist.tracks.values_list('title', flat=True)),
+            [str(index) for index in range(5)])
+
+    def test_positions_continue_across_batches(self):
+        playlist = self.create(5)
+
+        self.assertListEqual(
+            list(playlist.tracks.order_by('title').values_list(
+                'position', flat=True)),
+            [0, 1, 2, 3, 4])
+
+    def test_valid_items_of_failed_batch_are_saved(self):
+        playlist = self.create(
+            None, titles=['a', 'rejected', 'c', 'd'],
+            serializer_class=serializers.BackgroundContextPlaylistSerializer)
+
+        status = background.get_status(
+            background.get_tasks(playlist)['tracks'])
+        self.assertEqual(status['status'], background.FAILED)
+        self.assertEqual(status['processed'], 4)
+        self.assertListEqual(list(status['errors']), [1])
+        self.assertDictEqual(
+            status['errors'][1], {'title': ['Rejected on save.']})
+        self.assertListEqual(
+            list(playlist.tracks.order_by('title').values_list(
+                'title', 'position')),
+            [('a', 0), ('c', 2), ('d', 3)])
+
+    def test_context_is_passed_to_task(self):
+        playlist = self.create(
+            4, context={'suffix': '!'},
+            serializer_class=serializers.BackgroundContextPlaylistSerializer)
+
+        self.assertListEqual(
+            sorted(playlist.tracks.values_list('title', flat=True)),
+            ['0!', '1!', '2!', '3!'])
+
+    def test_save_kwargs_are_refused(self):
+        with self.assertRaises(TypeError):
+            self.create(4, tracks={'position': 1})
+
+    def test_small_list_is_saved_synchronously(self):
+        playlist = self.create(3)
+
+        self.assertDictEqual(background.get_tasks(playlist), {})
+        self.assertEqual(playlist.tracks.count(), 3)
+
+
+class BackgroundScheduleTest(TestCase):
+    def setUp(self):
+        background.set_executor(background.ImmediateExecutor())
+        self.addCleanup(background.set_executor, None)
+
+    def test_task_is_pending_until_commit(self):
+        serializer = serializers.BackgroundPlaylistSerializer(data={
+            'name': 'playlist',
+            'tracks': [{'title': str(index)} for index in range(5)],
+        })
+        serializer.is_valid(raise_exception=True)
+        playlist = serializer.save()
+
+        task_id = background.get_tasks(playlist)['tracks']
+        self.assertEqual(
+            background.get_status(task_id)['status'], background.PENDING)
+        self.assertEqual(playlist.tracks.count(), 0)
+
+    def test_default_executor(self):
+        background.set_executor(None)
+
+        self.assertIsInstance(
+            background.get_executor(), background.ThreadExecutor)
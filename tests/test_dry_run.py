@@ -0,0 +1,198 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from . import (
+    models,
+    serializers,
+)
+
+
+class DryRunTest(TestCase):
+    def get_user_data(self):
+        return {
+            'username': 'test',
+            'profile': {
+                'access_key': {'key': 'key'},
+                'sites': [{'url': 'http://google.com'}],
+                'avatars': [
+                    {'image': 'image-1.png'},
+                    {'image': 'image-2.png'},
+                ],
+                'message_set': [],
+            },
+        }
+
+    def get_statements(self, queries):
+        # The dry run is wrapped in a savepoint which is rolled back
+        return [
+            query['sql'] for query in queries
+            if not query['sql'].startswith(
+                ('SAVEPOINT', 'ROLLBACK', 'RELEASE'))
+        ]
+
+    def assertNoWrites(self, queries):
+        self.assertListEqual(
+            [sql for sql in self.get_statements(queries)
+             if not sql.startswith('SELECT')], [])
+
+    def test_create(self):
+        serializer = serializers.UserSerializer(data=self.get_user_data())
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as ctx:
+            change_set = serializer.dry_run()
+
+        self.assertListEqual(self.get_statements(ctx.captured_queries), [])
+
+        changes = change_set.as_dict()
+        self.assertListEqual(
+            list(changes['models']),
+            ['tests.User', 'tests.AccessKey', 'tests.Profile', 'tests.Site',
+             'tests.Avatar'])
+        profile = changes['models']['tests.Profile']['insert'][0]
+        self.assertEqual(
+            profile['user_id'],
+            changes['models']['tests.User']['insert'][0]['pk'])
+        self.assertListEqual(
+            [(row['image'], row['profile_id']) for row in
+             changes['models']['tests.Avatar']['insert']],
+            [('image-1.png', profile['pk']), ('image-2.png', profile['pk'])])
+        self.assertListEqual(
+            changes['links']['tests.Profile.sites']['add'],
+            [[profile['pk'],
+              changes['models']['tests.Site']['insert'][0]['pk']]])
+        self.assertEqual(change_set.count(), 7)
+        self.assertEqual(models.User.objects.count(), 0)
+
+        # The serializer can be saved after the dry run
+        user = serializer.save()
+        self.assertEqual(user.profile.avatars.count(), 2)
+
+    def test_update(self):
+        serializer = serializers.UserSerializer(data=self.get_user_data())
+        serializer.is_valid(raise_exception=True)
+        user = serializer.save()
+        avatar = user.profile.avatars.get(image='image-1.png')
+        site = user.profile.sites.get()
+
+        serializer = serializers.UserSerializer(instance=user, data={
+            'username': 'test',
+            'profile': {
+                'pk': user.profile.pk,
+                'access_key': None,
+                'sites': [],
+                'avatars': [
+                    {'pk': avatar.pk, 'image': 'new.png'},
+                    {'image': 'image-3.png'},
+                ],
+                'message_set': [],
+            },
+        })
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as ctx:
+            changes = serializer.dry_run().as_dict()
+
+        self.assertNoWrites(ctx.captured_queries)
+        self.assertNotIn('tests.User', changes['models'])
+        self.assertListEqual(
+            changes['models']['tests.Profile']['update'],
+            [{'pk': user.profile.pk, 'fields': {'access_key_id': None}}])
+        avatars = changes['models']['tests.Avatar']
+        self.assertListEqual(
+            avatars['update'],
+            [{'pk': avatar.pk, 'fields': {'image': 'new.png'}}])
+        self.assertListEqual(
+            [row['image'] for row in avatars['insert']], ['image-3.png'])
+        self.assertListEqual(
+            avatars['delete'],
+            [user.profile.avatars.get(image='image-2.png').pk])
+        self.assertListEqual(
+            changes['links']['tests.Profile.sites']['remove'],
+            [[user.profile.pk, site.pk]])
+        self.assertSetEqual(
+            set(user.profile.avatars.values_list('image', flat=True)),
+            {'image-1.png', 'image-2.png'})
+
+    def test_bulk_writes(self):
+        first = models.User.objects.create(username='first')
+        second = models.User.objects.create(username='second')
+        project = models.Project.objects.create(name='project')
+        membership = models.Membership.objects.create(
+            project=project, user=first, role='member')
+
+        serializer = serializers.ProjectSerializer(instance=project, data={
+            'name': 'project',
+            'memberships': [
+                {'user': second.pk, 'role': 'member'},
+            ],
+        })
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as ctx:
+            changes = serializer.dry_run().as_dict()
+
+        self.assertNoWrites(ctx.captured_queries)
+        memberships = changes['models']['tests.Membership']
+        self.assertListEqual(memberships['delete'], [membership.pk])
+        self.assertListEqual(
+            [(row['user_id'], row['project_id'])
+             for row in memberships['insert']],
+            [(second.pk, project.pk)])
+        self.assertEqual(models.Membership.objects.get(), membership)
+
+    def test_positions(self):
+        playlist = models.Playlist.objects.create(name='playlist')
+        tracks = [
+            models.Track.objects.create(
+                playlist=playlist, title=str(index), position=index)
+            for index in range(2)
+        ]
+
+        serializer = serializers.PlaylistSerializer(instance=playlist, data={
+            'name': 'playlist',
+            'tracks': [{'pk': track.pk, 'title': track.title}
+                       for track in reversed(tracks)],
+        })
+        serializer.is_valid(raise_exception=True)
+        changes = serializer.dry_run().as_dict()
+
+        self.assertListEqual(changes['models']['tests.Track']['update'], [
+            {'pk': tracks[1].pk, 'fields': {'position': 0}},
+            {'pk': tracks[0].pk, 'fields': {'position': 1}},
+        ])
+        self.assertListEqual(
+            list(playlist.tracks.order_by('position')), tracks)
+
+    def test_positions_of_new_items(self):
+        playlist = models.Playlist.objects.create(name='playlist')
+        track = models.Track.objects.create(
+            playlist=playlist, title='0', position=0)
+
+        serializer = serializers.PlaylistSerializer(instance=playlist, data={
+            'name': 'playlist',
+            'tracks': [
+                {'title': 'new-1'},
+                {'title': 'new-2'},
+                {'pk': track.pk, 'title': '0'},
+            ],
+        })
+        serializer.is_valid(raise_exception=True)
+        tracks = serializer.dry_run().as_dict()['models']['tests.Track']
+
+        positions = dict(
+            (row['pk'], row['position']) for row in tracks['insert'])
+        for update in tracks['update']:
+            positions.update({update['pk']: update['fields']['position']})
+        self.assertDictEqual(positions, {
+            tracks['insert'][0]['pk']: 0,
+            tracks['insert'][1]['pk']: 1,
+            track.pk: 2,
+        })
+
+    def test_custom_create_is_rolled_back(self):
+        serializer = serializers.SideEffectUserSerializer(
+            data=self.get_user_data())
+        serializer.is_valid(raise_exception=True)
+        serializer.dry_run()
+
+        self.assertFalse(models.Site.objects.exists())
+        self.assertFalse(models.User.objects.exists())
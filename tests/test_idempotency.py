@@ -0,0 +1,133 @@
+from django.contrib.auth.models import User as AuthUser
+from django.core.cache import cache
+from django.test import TransactionTestCase
+from rest_framework.test import APIRequestFactory
+
+from drf_writable_nested import idempotency
+
+from . import (
+    models,
+    serializers,
+)
+
+
+class IdempotencyTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def get_data(self, username='test'):
+        return {
+            'username': username,
+            'profile': {
+                'access_key': None,
+                'sites': [{'url': 'http://google.com'}],
+                'avatars': [
+                    {'image': 'image-1.png'},
+                    {'image': 'image-2.png'},
+                ],
+                'message_set': [],
+            },
+        }
+
+    def save(self, data=None, context=None, **kwargs):
+        serializer = serializers.IdempotentUserSerializer(
+            data=data or self.get_data(), context=context or {})
+        serializer.is_valid(raise_exception=True)
+        return serializer, serializer.save(**kwargs)
+
+    def test_repeated_save_returns_saved_instance(self):
+        serializer, user = self.save(idempotency_key='key')
+        first = serializer.data
+
+        with self.assertNumQueries(1):
+            serializer, repeated = self.save(idempotency_key='key')
+
+        self.assertEqual(repeated.pk, user.pk)
+        self.assertTrue(idempotency.is_replayed(repeated))
+        self.assertFalse(idempotency.is_replayed(user))
+        self.assertEqual(serializer.data, first)
+        self.assertEqual(models.User.objects.count(), 1)
+        self.assertEqual(models.Avatar.objects.count(), 2)
+
+    def test_different_keys_are_saved(self):
+        self.save(idempotency_key='first')
+        self.save(self.get_data('second'), idempotency_key='second')
+
+        self.assertEqual(models.User.objects.count(), 2)
+
+    def test_key_from_request_header(self):
+        request = APIRequestFactory().post('/', HTTP_IDEMPOTENCY_KEY='key')
+        serializer, user = self.save(context={'request': request})
+        serializer, repeated = self.save(context={'request': request})
+
+        self.assertEqual(repeated.pk, user.pk)
+        self.assertEqual(models.User.objects.count(), 1)
+
+    def test_key_is_scoped_by_user(self):
+        factory = APIRequestFactory()
+        first = factory.post('/', HTTP_IDEMPOTENCY_KEY='key')
+        first.user = AuthUser.objects.create(username='first')
+        second = factory.post('/', HTTP_IDEMPOTENCY_KEY='key')
+        second.user = AuthUser.objects.create(username='second')
+
+        serializer, user = self.save(context={'request': first})
+        serializer, other = self.save(context={'request': second})
+
+        self.assertNotEqual(other.pk, user.pk)
+        self.assertFalse(idempotency.is_replayed(other))
+
+    def test_key_is_scoped_by_argument(self):
+        serializer, user = self.save(
+            idempotency_key='key', idempotency_scope='first')
+        serializer, other = self.save(
+            idempotency_key='key', idempotency_scope='second')
+
+        self.assertFalse(idempotency.is_replayed(other))
+        self.assertEqual(models.User.objects.count(), 2)
+
+    def test_key_reused_with_other_data(self):
+        self.save(idempotency_key='key')
+
+        with self.assertRaises(idempotency.KeyReused):
+            self.save(self.get_data('other'), idempotency_key='key')
+        self.assertEqual(models.User.objects.count(), 1)
+
+    def test_save_in_progress(self):
+        idempotency.get_store().add(
+            'tests.user:anonymous:key', idempotency.IN_PROGRESS)
+
+        with self.assertRaises(idempotency.SaveInProgress):
+            self.save(idempotency_key='key')
+        self.assertEqual(models.User.objects.count(), 0)
+
+    def test_failed_save_releases_key(self):
+        serializer = serializers.IdempotentUserSerializer(
+            data=self.get_data())
+        serializer.is_valid(raise_exception=True)
+        with self.assertRaises(TypeError):
+            # Invalid arguments of nested saves
+            serializer.save(idempotency_key='key', profile=1)
+
+        self.assertIsNone(
+            idempotency.get_store().get('tests.user:anonymous:key'))
+        serializer, user = self.save(idempotency_key='key')
+        self.assertFalse(idempotency.is_replayed(user))
+
+    def test_key_of_deleted_instance_is_marked_as_first_save(self):
+        markers = []
+
+        class Store(idempotency.CacheIdempotencyStore):
+            def set(self, key, value):
+                markers.append(value)
+                super(Store, self).set(key, value)
+
+        idempotency.set_store(Store())
+        self.addCleanup(idempotency.set_store, None)
+        serializer, user = self.save(idempotency_key='key')
+        user.delete()
+
+        serializer, saved = self.save(idempotency_key='key')
+
+        self.assertFalse(idempotency.is_replayed(saved))
+        # The in-progress marker expires with `in_progress_timeout`
+        self.assertNotIn(idempotency.IN_PROGRESS, markers)
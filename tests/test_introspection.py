@@ -0,0 +1,168 @@
+from io import StringIO
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from drf_writable_nested import introspection
+
+from . import (
+    models,
+    serializers,
+)
+
+
+class DescribeTest(TestCase):
+    def get_nodes(self, serializer_class):
+        return {node.path: node
+                for node in introspection.describe(serializer_class)}
+
+    def test_relations_are_classified(self):
+        nodes = self.get_nodes(serializers.UserSerializer)
+
+        self.assertListEqual(list(nodes), [
+            'profile', 'profile.sites', 'profile.avatars',
+            'profile.access_key', 'profile.message_set', 'user_avatar',
+        ])
+        self.assertEqual(nodes['profile'].kind, 'reverse one-to-one')
+        self.assertEqual(nodes['profile.sites'].kind, 'direct many-to-many')
+        self.assertEqual(nodes['profile.avatars'].kind, 'reverse foreign key')
+        self.assertEqual(nodes['profile.access_key'].kind,
+                         'direct foreign key')
+        self.assertEqual(nodes['profile.avatars'].model, models.Avatar)
+        self.assertTrue(nodes['profile.avatars'].many)
+        self.assertFalse(nodes['profile'].many)
+
+    def test_generic_relation(self):
+        node = introspection.describe(serializers.TaggedItemSerializer)[0]
+
+        self.assertEqual(node.kind, 'generic relation')
+        self.assertTrue(any(step.per_item for step in node.create))
+        # New items are inserted with one query
+        node = introspection.describe(
+            serializers.BulkTaggedItemSerializer)[0]
+        self.assertFalse(any(step.per_item for step in node.create))
+        self.assertTrue(any(step.per_item for step in node.update))
+
+    def test_per_item_relations(self):
+        self.assertListEqual(
+            [node.path for node in
+             introspection.get_per_item_relations(serializers.UserSerializer)],
+            ['profile.sites', 'profile.avatars', 'profile.message_set'])
+        self.assertListEqual(
+            introspection.get_per_item_relations(
+                serializers.ProjectSerializer), [])
+
+    def test_relations_inside_lists_are_per_item(self):
+        nodes = self.get_nodes(serializers.TeamSerializer)
+
+        self.assertEqual(nodes['members.profile'].multipliers, ('members',))
+        self.assertTrue(nodes['members.profile'].has_per_item_queries)
+        self.assertEqual(
+            introspection._format_cost(
+                nodes['members.profile.avatars'],
+                nodes['members.profile.avatars'].create),
+            'n(members) * n(members.profile.avatars)')
+
+    def test_options_are_reflected(self):
+        node = introspection.describe(serializers.ProjectSerializer)[0]
+
+        self.assertIn('rows are synced by user', node.notes)
+        self.assertFalse(node.has_per_item_queries)
+        self.assertIn(
+            'positions are saved with the items',
+            introspection.describe(serializers.PlaylistSerializer)[0].notes)
+
+    def test_format_description(self):
+        text = introspection.format_description(serializers.UserSerializer)
+
+        self.assertTrue(text.startswith(
+            'tests.serializers.UserSerializer (tests.User)'))
+        self.assertIn(
+            '    avatars: reverse foreign key -> tests.Avatar [list]  '
+            'PER-ITEM QUERIES', text)
+        self.assertIn('      create: n(profile.avatars) (', text)
+
+
+class QueryCountTest(TestCase):
+    """
+    Predicted queries match queries of saves, plus one for the root object.
+    """
+    def assertPredicted(self, serializer_class, data, items, **kwargs):
+        serializer = serializer_class(data=data)
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as ctx:
+            instance = serializer.save(**kwargs)
+        self.assertEqual(
+            len(ctx), 1 + introspection.get_query_count(
+                serializer_class, 'create', items))
+
+        # A fresh instance, so no relations are cached
+        serializer = serializer_class(
+            instance=instance.__class__.objects.get(pk=instance.pk),
+            data=serializer_class(instance=instance).data)
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as ctx:
+            serializer.save()
+        self.assertEqual(
+            len(ctx), 1 + introspection.get_query_count(
+                serializer_class, 'update', items))
+
+    def test_reverse_foreign_key(self):
+        self.assertPredicted(
+            serializers.PlaylistSerializer,
+            {'name': 'Mix', 'tracks': [{'title': 'A'}, {'title': 'B'},
+                                       {'title': 'C'}]},
+            {'tracks': 3})
+
+    def test_deferred_orphans(self):
+        self.assertPredicted(
+            serializers.DetachingFolderSerializer,
+            {'name': 'Inbox', 'notes': [{'text': 'A'}, {'text': 'B'}]},
+            {'notes': 2})
+
+    def test_generic_relation(self):
+        # Content types are cached by the first save
+        ContentType.objects.get_for_model(models.TaggedItem)
+
+        for serializer_class in (serializers.TaggedItemSerializer,
+                                 serializers.BulkTaggedItemSerializer):
+            self.assertPredicted(
+                serializer_class,
+                {'tags': [{'tag': 'a'}, {'tag': 'b'}, {'tag': 'c'},
+                          {'tag': 'd'}]},
+                {'tags': 4})
+
+    def test_tree(self):
+        self.assertPredicted(
+            serializers.ProfileSerializer,
+            {
+                'access_key': {'key': 'key'},
+                'sites': [{'url': 'http://a.com'}, {'url': 'http://b.com'}],
+                'avatars': [{'image': 'a'}, {'image': 'b'}],
+                'message_set': [{'message': 'a'}, {'message': 'b'}],
+            },
+            {'sites': 2, 'avatars': 2, 'message_set': 2},
+            user=models.User.objects.create(username='test'))
+
+
+class DescribeCommandTest(TestCase):
+    def test_command(self):
+        out = StringIO()
+        call_command('describe_nested_serializer',
+                     'tests.serializers.ProjectSerializer', stdout=out)
+
+        self.assertIn('memberships: reverse foreign key', out.getvalue())
+
+    def test_command_fails_on_per_item_queries(self):
+        call_command('describe_nested_serializer',
+                     'tests.serializers.ProjectSerializer',
+                     '--fail-on-per-item', stdout=StringIO())
+
+        with self.assertRaises(CommandError) as ctx:
+            call_command('describe_nested_serializer',
+                         'tests.serializers.UserSerializer',
+                         '--fail-on-per-item', stdout=StringIO())
+        self.assertIn('UserSerializer.profile.avatars', str(ctx.exception))
@@ -1,7 +1,10 @@
 from django.test import TestCase
 from rest_framework.exceptions import ValidationError
 
-from . import serializers
+from . import (
+    models,
+    serializers,
+)
 
 
 class NestedValidationTestCase(TestCase):
@@ -106,3 +109,138 @@ class NestedValidationTestCase(TestCase):
         self.assertEqual(
             ctx.exception.detail,
             {'parents': [{}, {'raise_error': ['should be False']}, {}]})
+
+
+class PreflightValidationTestCase(TestCase):
+    def test_duplicates_in_payload_are_found_before_write(self):
+        serializer = serializers.PreflightUserWithCustomPKSerializer(
+            data={
+                'username': 'test',
+                'custompks': [
+                    {'slug': 'a'},
+                    {'slug': 'b'},
+                    {'slug': 'a'},
+                ],
+            })
+        serializer.is_valid(raise_exception=True)
+        with self.assertRaises(ValidationError) as ctx:
+            serializer.save()
+
+        self.assertEqual(
+            ctx.exception.detail,
+            {'custompks': [
+                {}, {}, {'slug': ['This field must be unique.']}]})
+        self.assertEqual(models.User.objects.count(), 0)
+        self.assertEqual(models.CustomPK.objects.count(), 0)
+
+    def test_unique_fields_are_checked_in_one_query(self):
+        user = models.User.objects.create(username='existing')
+        models.CustomPK.objects.create(slug='b', user=user)
+
+        serializer = serializers.PreflightUserWithCustomPKSerializer(
+            data={
+                'username': 'test',
+                'custompks': [{'slug': 'a'}, {'slug': 'b'}, {'slug': 'c'}],
+            })
+        serializer.is_valid(raise_exception=True)
+        # Only the bulk unique check, nothing is written
+        with self.assertNumQueries(1):
+            with self.assertRaises(ValidationError) as ctx:
+                serializer.save()
+
+        self.assertEqual(
+            ctx.exception.detail,
+            {'custompks': [{}, {'slug': ['This field must be unique.']}, {}]})
+
+    def test_whole_tree_is_validated_before_write(self):
+        serializer = serializers.PreflightTeamSerializer(
+            data={
+                'name': 'team',
+                'members': [
+                    {'username': 'first', 'custompks': [{'slug': 'a'}]},
+                    {'username': 'second', 'custompks': [{'slug': 'a'}]},
+                ],
+            })
+        serializer.is_valid(raise_exception=True)
+        with self.assertRaises(ValidationError) as ctx:
+            serializer.save()
+
+        self.assertEqual(
+            ctx.exception.detail,
+            {'members': [
+                {},
+                {'custompks': [{'slug': ['This field must be unique.']}]},
+            ]})
+        self.assertEqual(models.Team.objects.count(), 0)
+        self.assertEqual(models.User.objects.count(), 0)
+
+    def test_valid_tree_is_saved(self):
+        serializer = serializers.PreflightTeamSerializer(
+            data={
+                'name': 'team',
+                'members': [
+                    {'username': 'first', 'custompks': [{'slug': 'a'}]},
+                    {'username': 'second', 'custompks': [{'slug': 'b'}]},
+                ],
+            })
+        serializer.is_valid(raise_exception=True)
+        team = serializer.save()
+
+        self.assertEqual(team.members.count(), 2)
+        self.assertSetEqual(
+            set(models.CustomPK.objects.values_list('slug', flat=True)),
+            {'a', 'b'})
+
+
+class SparseErrorsTestCase(TestCase):
+    def get_data(self, invalid_indexes, count=1000):
+        return {
+            'sites': [],
+            'access_key': None,
+            'message_set': [],
+            'avatars': [
+                {} if index in invalid_indexes
+                else {'image': '{}.png'.format(index)}
+                for index in range(count)
+            ],
+        }
+
+    def test_errors_are_keyed_by_index(self):
+        serializer = serializers.SparseErrorsProfileSerializer(
+            data=self.get_data({3, 700}))
+
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(serializer.errors, {'avatars': {
+            3: {'image': ['This field is required.']},
+            700: {'image': ['This field is required.']},
+        }})
+
+    def test_validation_stops_after_max_errors(self):
+        serializer = serializers.FailFastProfileSerializer(
+            data=self.get_data({1, 2, 5}))
+
+        self.assertFalse(serializer.is_valid())
+        self.assertListEqual(list(serializer.errors['avatars']), [1, 2])
+
+    def test_lists_of_errors_by_default(self):
+        serializer = serializers.ProfileSerializer(
+            data=self.get_data({1}, count=3))
+
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(serializer.errors, {'avatars': [
+            {}, {'image': ['This field is required.']}, {}]})
+
+    def test_save_stops_after_max_errors(self):
+        serializer = serializers.FailFastReverseForeignKeyChildSerializer(
+            data={'parents': [
+                {}, {'raise_error': True}, {}, {'raise_error': True},
+            ]})
+        serializer.is_valid(raise_exception=True)
+        with self.assertRaises(ValidationError) as ctx:
+            serializer.save()
+
+        self.assertEqual(
+            ctx.exception.detail,
+            {'parents': [{}, {'raise_error': ['should be False']}, {}, {}]})
+        # Items after the first error aren't saved
+        self.assertEqual(models.ForeignKeyParent.objects.count(), 1)
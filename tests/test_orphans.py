@@ -0,0 +1,121 @@
+from io import StringIO
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test import TestCase
+
+from drf_writable_nested import orphans
+
+from . import (
+    models,
+    serializers,
+)
+
+
+class DeferredOrphansTest(TestCase):
+    def setUp(self):
+        self.folder = models.Folder.objects.create(name='folder')
+        self.kept = models.Note.objects.create(folder=self.folder, text='kept')
+        self.orphans = [
+            models.Note.objects.create(folder=self.folder, text=str(index))
+            for index in range(3)
+        ]
+        for note in self.orphans:
+            models.NoteAttachment.objects.create(note=note)
+
+    def update(self, serializer_class, notes=()):
+        serializer = serializer_class(instance=self.folder, data={
+            'name': 'folder',
+            'notes': [{'pk': self.kept.pk, 'text': 'kept'}] + list(notes),
+        })
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+    def test_orphans_are_detached(self):
+        self.update(serializers.DetachingFolderSerializer)
+
+        self.assertListEqual(
+            list(self.folder.notes.all()), [self.kept])
+        self.assertEqual(
+            models.Note.objects.filter(folder__isnull=True).count(), 3)
+        self.assertEqual(models.NoteAttachment.objects.count(), 3)
+
+    def test_orphans_are_marked(self):
+        self.update(serializers.DetachingFolderSerializer)
+
+        self.assertEqual(
+            models.Note.objects.filter(orphaned_at__isnull=False).count(), 3)
+        self.assertIsNone(
+            models.Note.objects.get(pk=self.kept.pk).orphaned_at)
+
+    def test_orphans_are_not_marked_again(self):
+        self.update(serializers.DetachingFolderSerializer)
+        marks = dict(models.Note.objects.values_list('pk', 'orphaned_at'))
+
+        self.update(serializers.DetachingFolderSerializer)
+
+        self.assertDictEqual(
+            dict(models.Note.objects.values_list('pk', 'orphaned_at')),
+            marks)
+
+    def test_detach_without_mark_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.update(serializers.DetachOnlyFolderSerializer)
+
+        self.assertEqual(self.folder.notes.count(), 4)
+
+    def test_mark_without_detach_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.update(serializers.MarkingFolderSerializer)
+
+        self.assertEqual(self.folder.notes.count(), 4)
+
+    def test_sweep_in_chunks(self):
+        self.update(serializers.DetachingFolderSerializer)
+
+        result = orphans.sweep(
+            [serializers.DetachingFolderSerializer],
+            chunk_size=2, max_chunks=1)
+        self.assertDictEqual(dict(result), {'tests.Note': 2})
+        self.assertEqual(models.Note.objects.count(), 2)
+
+        result = orphans.sweep(
+            [serializers.DetachingFolderSerializer], chunk_size=2)
+        self.assertDictEqual(dict(result), {'tests.Note': 1})
+        self.assertListEqual(list(models.Note.objects.all()), [self.kept])
+        self.assertEqual(models.NoteAttachment.objects.count(), 0)
+
+    def test_sweep_keeps_notes_created_without_folder(self):
+        note = models.Note.objects.create(text='no folder')
+        self.update(serializers.DetachingFolderSerializer)
+
+        result = orphans.sweep([serializers.DetachingFolderSerializer])
+
+        self.assertDictEqual(dict(result), {'tests.Note': 3})
+        self.assertSetEqual(
+            set(models.Note.objects.all()), {self.kept, note})
+
+    def test_detached_orphans_passed_again_are_kept(self):
+        self.update(serializers.DetachingFolderSerializer)
+        self.update(serializers.DetachingFolderSerializer, notes=[
+            {'pk': self.orphans[0].pk, 'text': '0'},
+        ])
+
+        self.assertIsNone(
+            models.Note.objects.get(pk=self.orphans[0].pk).orphaned_at)
+        orphans.sweep([serializers.DetachingFolderSerializer])
+        self.assertSetEqual(
+            set(self.folder.notes.all()), {self.kept, self.orphans[0]})
+        self.assertEqual(models.Note.objects.count(), 2)
+
+    def test_command(self):
+        self.update(serializers.DetachingFolderSerializer)
+
+        out = StringIO()
+        call_command(
+            'sweep_nested_orphans',
+            'tests.serializers.DetachingFolderSerializer',
+            '--chunk-size=2', stdout=out)
+
+        self.assertIn('tests.Note: 3 deleted', out.getvalue())
+        self.assertListEqual(list(models.Note.objects.all()), [self.kept])
@@ -0,0 +1,104 @@
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase
+
+from drf_writable_nested import mixins, plans
+
+from . import (
+    models,
+    serializers,
+)
+
+
+class WarmUpTest(TestCase):
+    def setUp(self):
+        mixins._related_fields_cache.clear()
+        plans._prefetch_plans.clear()
+        ContentType.objects.clear_cache()
+
+    def test_warm_up_walks_nested_serializers(self):
+        warmed = plans.warm_up([serializers.UserSerializer])
+
+        self.assertSetEqual(set(warmed), {
+            serializers.UserSerializer,
+            serializers.ProfileSerializer,
+            serializers.AvatarSerializer,
+            serializers.SiteSerializer,
+            serializers.AccessKeySerializer,
+            serializers.MessageSerializer,
+        })
+        self.assertIn(
+            (models.Profile, 'message_set'), mixins._related_fields_cache)
+        self.assertIn((models.User, 'profile'), mixins._related_fields_cache)
+        self.assertIn(serializers.ProfileSerializer, plans._prefetch_plans)
+
+    def test_warm_up_caches_content_types(self):
+        plans.warm_up([serializers.TaggedItemSerializer])
+
+        with self.assertNumQueries(0):
+            ContentType.objects.get_for_model(models.TaggedItem)
+
+    def test_warm_up_registered(self):
+        plans.register(serializers.TaggedItemSerializer)
+        self.addCleanup(
+            plans._registry.remove, serializers.TaggedItemSerializer)
+
+        self.assertSetEqual(set(plans.warm_up()), {
+            serializers.TaggedItemSerializer,
+            serializers.TagSerializer,
+        })
+
+
+class PrefetchPlanTest(TestCase):
+    def create_user(self, username):
+        serializer = serializers.UserSerializer(data={
+            'username': username,
+            'profile': {
+                'access_key': {'key': 'key'},
+                'sites': [{'url': 'http://google.com'}],
+                'avatars': [
+                    {'image': 'image-1.png'}, {'image': 'image-2.png'}],
+                'message_set': [{'message': 'Message 1'}],
+            },
+        })
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    def test_plan(self):
+        select_related, prefetch_related = plans.get_prefetch_plan(
+            serializers.UserSerializer)
+
+        self.assertListEqual(
+            select_related,
+            ['profile', 'profile__access_key', 'user_avatar'])
+        self.assertListEqual(
+            prefetch_related,
+            ['profile__sites', 'profile__avatars', 'profile__message_set'])
+
+    def test_plan_with_nested_lists(self):
+        select_related, prefetch_related = plans.get_prefetch_plan(
+            serializers.TeamSerializer)
+
+        self.assertListEqual(select_related, [])
+        self.assertEqual(len(prefetch_related), 1)
+        self.assertEqual(prefetch_related[0].prefetch_to, 'members')
+
+    def test_serialization_queries(self):
+        self.create_user('first')
+        self.create_user('second')
+        queryset = plans.prefetch_queryset(
+            models.User.objects.all(), serializers.UserSerializer)
+
+        with self.assertNumQueries(4):
+            data = serializers.UserSerializer(queryset, many=True).data
+        self.assertEqual(len(data), 2)
+        self.assertEqual(len(data[1]['profile']['avatars']), 2)
+
+    def test_serialization_queries_with_nested_lists(self):
+        team = models.Team.objects.create(name='team')
+        team.members.add(self.create_user('first'), self.create_user('second'))
+        queryset = plans.prefetch_queryset(
+            models.Team.objects.all(), serializers.TeamSerializer)
+
+        with self.assertNumQueries(5):
+            data = serializers.TeamSerializer(queryset, many=True).data
+        self.assertEqual(len(data[0]['members']), 2)
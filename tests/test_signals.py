@@ -0,0 +1,102 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.test import TransactionTestCase
+
+from drf_writable_nested import signals
+
+from . import (
+    models,
+    serializers,
+)
+
+
+class BatchedSignalsTest(TransactionTestCase):
+    def setUp(self):
+        self.saved = []
+        self.deleted = []
+        self.rows = []
+        signals.nested_bulk_saved.connect(self.on_saved)
+        signals.nested_bulk_deleted.connect(self.on_deleted)
+        self.addCleanup(signals.nested_bulk_saved.disconnect, self.on_saved)
+        self.addCleanup(
+            signals.nested_bulk_deleted.disconnect, self.on_deleted)
+
+        self.team = models.Team.objects.create(name='team')
+        self.users = [
+            models.User.objects.create(username=str(index))
+            for index in range(2)
+        ]
+        self.profiles = [
+            models.Profile.objects.create(user=user) for user in self.users
+        ]
+        self.team.members.add(*self.users)
+        self.avatar = models.Avatar.objects.create(
+            profile=self.profiles[0], image='old.png')
+
+    def on_saved(self, sender, created, updated, **kwargs):
+        self.saved.append((sender, sorted(created), sorted(updated)))
+
+    def on_deleted(self, sender, pks, **kwargs):
+        self.deleted.append((sender, sorted(pks)))
+
+    def on_row_saved(self, sender, instance, **kwargs):
+        self.rows.append(instance)
+
+    def get_data(self):
+        return {'members': [
+            {'pk': user.pk, 'profile': {
+                'pk': profile.pk,
+                'avatars': [{'image': '{}.png'.format(user.pk)}],
+            }}
+            for user, profile in zip(self.users, self.profiles)
+        ]}
+
+    def save(self, serializer_class):
+        serializer = serializer_class(
+            instance=self.team, partial=True, data=self.get_data())
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+    def test_signals_are_sent_once_per_model(self):
+        self.save(serializers.TeamSerializer)
+
+        avatars = [avatar for avatar in self.saved
+                   if avatar[0] is models.Avatar]
+        self.assertListEqual(avatars, [(
+            models.Avatar,
+            sorted(models.Avatar.objects.values_list('pk', flat=True)),
+            [],
+        )])
+        self.assertIn(
+            (models.User, [], sorted(user.pk for user in self.users)),
+            self.saved)
+        self.assertListEqual(
+            self.deleted, [(models.Avatar, [self.avatar.pk])])
+
+    def test_signals_are_sent_on_commit(self):
+        with transaction.atomic():
+            self.save(serializers.TeamSerializer)
+            self.assertListEqual(self.saved, [])
+
+        self.assertTrue(self.saved)
+
+    def test_signals_are_not_sent_on_rollback(self):
+        with transaction.atomic():
+            self.save(serializers.TeamSerializer)
+            transaction.set_rollback(True)
+
+        self.assertListEqual(self.saved, [])
+        self.assertListEqual(self.deleted, [])
+
+    def test_row_signals_are_suppressed(self):
+        receiver = signals.skip_when_suppressed(self.on_row_saved)
+        post_save.connect(receiver, sender=models.Avatar)
+        self.addCleanup(
+            post_save.disconnect, receiver, sender=models.Avatar)
+
+        self.save(serializers.SuppressedSignalsTeamSerializer)
+        self.assertListEqual(self.rows, [])
+        self.assertTrue(self.saved)
+
+        self.save(serializers.TeamSerializer)
+        self.assertEqual(len(self.rows), 2)
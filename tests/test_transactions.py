@@ -0,0 +1,183 @@
+from django.db import IntegrityError, OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import ValidationError
+
+from drf_writable_nested import retry
+
+from . import (
+    models,
+    serializers,
+)
+
+
+class AtomicSaveTest(TestCase):
+    def get_data(self, raise_error=False):
+        return {
+            'parents': [
+                {},
+                {'raise_error': raise_error},
+            ],
+        }
+
+    def test_failed_save_is_rolled_back(self):
+        serializer = serializers.AtomicReverseForeignKeyChildSerializer(
+            data=self.get_data(raise_error=True))
+        serializer.is_valid(raise_exception=True)
+        with self.assertRaises(ValidationError):
+            serializer.save()
+
+        self.assertEqual(models.ForeignKeyChild.objects.count(), 0)
+        self.assertEqual(models.ForeignKeyParent.objects.count(), 0)
+
+    def test_not_atomic_save_keeps_partial_writes(self):
+        serializer = serializers.ReverseForeignKeyChildSerializer(
+            data=self.get_data(raise_error=True))
+        serializer.is_valid(raise_exception=True)
+        with self.assertRaises(ValidationError):
+            serializer.save()
+
+        self.assertEqual(models.ForeignKeyChild.objects.count(), 1)
+        self.assertEqual(models.ForeignKeyParent.objects.count(), 1)
+
+    def test_savepoint_is_created_inside_outer_transaction(self):
+        serializer = serializers.AtomicReverseForeignKeyChildSerializer(
+            data=self.get_data())
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as ctx:
+            serializer.save()
+
+        savepoints = [query for query in ctx.captured_queries
+                      if query['sql'].startswith('SAVEPOINT')]
+        self.assertEqual(len(savepoints), 1)
+
+    def test_savepoints_can_be_disabled(self):
+        serializer = \
+            serializers.AtomicNoSavepointReverseForeignKeyChildSerializer(
+                data=self.get_data())
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as ctx:
+            child = serializer.save()
+
+        self.assertFalse([query for query in ctx.captured_queries
+                          if 'SAVEPOINT' in query['sql']])
+        self.assertEqual(child.parents.count(), 2)
+
+
+class RowLockingTest(TestCase):
+    def setUp(self):
+        user = models.User.objects.create(username='test')
+        self.profile = models.Profile.objects.create(user=user)
+        self.avatars = [
+            models.Avatar.objects.create(
+                profile=self.profile, image='{}.png'.format(index))
+            for index in range(3)
+        ]
+
+    def save(self, serializer_class):
+        serializer = serializer_class(
+            instance=self.profile, partial=True, data={'avatars': [
+                {'pk': avatar.pk, 'image': 'new.png'}
+                for avatar in reversed(self.avatars)
+            ] + [{'image': 'created.png'}]})
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as ctx:
+            serializer.save()
+        return ctx.captured_queries
+
+    def get_updated_pks(self, queries):
+        return [
+            int(query['sql'].rsplit('=', 1)[1].strip())
+            for query in queries
+            if query['sql'].startswith('UPDATE "tests_avatar"')
+        ]
+
+    def test_rows_are_written_in_order_of_primary_keys(self):
+        queries = self.save(serializers.LockingProfileSerializer)
+
+        self.assertListEqual(
+            self.get_updated_pks(queries),
+            [avatar.pk for avatar in self.avatars])
+        inserts = [index for index, query in enumerate(queries)
+                   if query['sql'].startswith('INSERT INTO "tests_avatar"')]
+        updates = [index for index, query in enumerate(queries)
+                   if query['sql'].startswith('UPDATE "tests_avatar"')]
+        self.assertGreater(inserts[0], updates[-1])
+
+    def test_rows_are_loaded_in_order_in_transaction(self):
+        queries = self.save(serializers.LockingProfileSerializer)
+
+        self.assertTrue([query for query in queries
+                         if query['sql'].startswith('SAVEPOINT')])
+        selects = [query['sql'] for query in queries
+                   if query['sql'].startswith('SELECT') and
+                   'FROM "tests_avatar"' in query['sql'] and
+                   ' IN (' in query['sql']]
+        self.assertTrue(selects[0].endswith(
+            'ORDER BY "tests_avatar"."id" ASC'))
+
+    def test_payload_order_without_locking(self):
+        queries = self.save(serializers.ProfileSerializer)
+
+        self.assertListEqual(
+            self.get_updated_pks(queries),
+            [avatar.pk for avatar in reversed(self.avatars)])
+
+
+class RetryTest(TransactionTestCase):
+    def setUp(self):
+        retry.reset_counters()
+        self.addCleanup(setattr, serializers.FlakyAvatarSerializer,
+                        'failures', 0)
+        self.profile = models.Profile.objects.create(
+            user=models.User.objects.create(username='test'))
+        self.existing = models.Avatar.objects.create(
+            profile=self.profile, image='existing.png')
+
+    def save(self):
+        serializer = serializers.RetryingProfileSerializer(
+            instance=self.profile, partial=True, data={'avatars': [
+                {'pk': self.existing.pk, 'image': 'updated.png'},
+                {'image': 'first.png'},
+                {'image': 'second.png'},
+            ]})
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    def test_save_is_retried(self):
+        serializers.FlakyAvatarSerializer.failures = 2
+
+        profile = self.save()
+
+        self.assertListEqual(
+            sorted(profile.avatars.values_list('image', flat=True)),
+            ['first.png', 'second.png', 'updated.png'])
+        self.assertEqual(models.Avatar.objects.count(), 3)
+        counters = retry.get_counters()
+        self.assertEqual(counters['retried'], 2)
+        self.assertEqual(counters['recovered'], 1)
+        self.assertEqual(counters['retried:tests.Profile'], 2)
+
+    def test_attempts_are_limited(self):
+        serializers.FlakyAvatarSerializer.failures = 3
+
+        with self.assertRaises(OperationalError):
+            self.save()
+
+        self.assertListEqual(
+            list(models.Avatar.objects.values_list('image', flat=True)),
+            ['existing.png'])
+        self.assertEqual(retry.get_counters()['exhausted'], 1)
+
+    def test_other_errors_are_not_retried(self):
+        serializers.FlakyAvatarSerializer.failures = 1
+        self.addCleanup(
+            setattr, serializers.FlakyAvatarSerializer, 'error',
+            serializers.FlakyAvatarSerializer.error)
+        serializers.FlakyAvatarSerializer.error = IntegrityError(
+            'UNIQUE constraint failed')
+
+        with self.assertRaises(IntegrityError):
+            self.save()
+
+        self.assertDictEqual(retry.get_counters(), {})
@@ -0,0 +1,179 @@
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.test import TestCase, TransactionTestCase
+from rest_framework import permissions, viewsets
+from rest_framework.test import APIRequestFactory
+
+from drf_writable_nested.viewsets import NestedBulkSaveMixin
+
+from . import (
+    models,
+    serializers,
+)
+
+
+class UserBulkViewSet(NestedBulkSaveMixin, viewsets.GenericViewSet):
+    queryset = models.User.objects.all()
+    serializer_class = serializers.UserSerializer
+    bulk_chunk_size = 2
+    bulk_max_records = 10
+
+    def save_bulk_chunk(self, offset, chunk):
+        self.chunks.append(len(chunk))
+        return super(UserBulkViewSet, self).save_bulk_chunk(offset, chunk)
+
+    def perform_bulk_save(self, serializer, **kwargs):
+        user = serializer.save(**kwargs)
+        if user.username == 'broken':
+            raise DatabaseError('broken')
+
+
+class IsNotLocked(permissions.BasePermission):
+    def has_object_permission(self, request, view, obj):
+        return obj.username != 'locked'
+
+
+class PermissionUserBulkViewSet(UserBulkViewSet):
+    permission_classes = (IsNotLocked,)
+
+
+class IdempotentUserBulkViewSet(UserBulkViewSet):
+    serializer_class = serializers.IdempotentUserSerializer
+
+
+class BulkRequestMixin(object):
+    def post(self, records, viewset_class=UserBulkViewSet, **extra):
+        viewset_class.chunks = []
+        view = viewset_class.as_view({'post': 'bulk'})
+        request = APIRequestFactory().post(
+            '/users/bulk/', records, format='json', **extra)
+        return view(request)
+
+    def get_record(self, username):
+        return {
+            'username': username,
+            'profile': {
+                'access_key': None,
+                'sites': [],
+                'avatars': [{'image': '{}.png'.format(username)}],
+                'message_set': [],
+            },
+        }
+
+
+class NestedBulkSaveTest(BulkRequestMixin, TestCase):
+    def test_records_are_saved_in_chunks(self):
+        response = self.post(
+            [self.get_record(str(index)) for index in range(5)])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertListEqual(UserBulkViewSet.chunks, [2, 2, 1])
+        self.assertDictEqual(dict(response.data['counts']), {
+            'created': 5, 'updated': 0, 'invalid': 0, 'forbidden': 0,
+            'failed': 0})
+        self.assertListEqual(
+            [result['pk'] for result in response.data['results']],
+            list(models.User.objects.order_by('pk').values_list(
+                'pk', flat=True)))
+        self.assertEqual(models.Avatar.objects.count(), 5)
+
+    def test_failed_records_dont_roll_back_others(self):
+        invalid = self.get_record('invalid')
+        del invalid['username']
+        response = self.post([
+            self.get_record('first'),
+            invalid,
+            self.get_record('broken'),
+            self.get_record('last'),
+        ])
+
+        self.assertListEqual(
+            [result['status'] for result in response.data['results']],
+            ['created', 'invalid', 'failed', 'created'])
+        self.assertEqual(
+            response.data['results'][1]['errors'],
+            {'username': ['This field is required.']})
+        self.assertSetEqual(
+            set(models.User.objects.values_list('username', flat=True)),
+            {'first', 'last'})
+        self.assertEqual(models.Avatar.objects.count(), 2)
+
+    def test_records_with_pk_are_updated(self):
+        self.post([self.get_record('first'), self.get_record('second')])
+        users = list(models.User.objects.order_by('pk'))
+
+        records = []
+        for user in users:
+            record = self.get_record(user.username + '-updated')
+            record['pk'] = user.pk
+            record['profile']['pk'] = user.profile.pk
+            records.append(record)
+        records.append(dict(self.get_record('missing'), pk=999))
+        response = self.post(records)
+
+        self.assertListEqual(
+            [result['status'] for result in response.data['results']],
+            ['updated', 'updated', 'invalid'])
+        self.assertListEqual(
+            list(models.User.objects.order_by('pk').values_list(
+                'username', flat=True)),
+            ['first-updated', 'second-updated'])
+
+    def test_malformed_pk(self):
+        response = self.post([
+            dict(self.get_record('malformed'), pk='abc'),
+            self.get_record('second'),
+            self.get_record('third'),
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertListEqual(
+            [result['status'] for result in response.data['results']],
+            ['invalid', 'created', 'created'])
+        self.assertEqual(models.User.objects.count(), 2)
+
+    def test_object_permissions_are_checked(self):
+        locked = models.User.objects.create(username='locked')
+        allowed = models.User.objects.create(username='allowed')
+        records = [
+            dict(self.get_record('changed'), pk=user.pk)
+            for user in (locked, allowed)
+        ]
+        response = self.post(records, PermissionUserBulkViewSet)
+
+        self.assertListEqual(
+            [result['status'] for result in response.data['results']],
+            ['forbidden', 'updated'])
+        self.assertListEqual(
+            list(models.User.objects.order_by('pk').values_list(
+                'username', flat=True)),
+            ['locked', 'changed'])
+
+    def test_invalid_payload(self):
+        self.assertEqual(self.post({'username': 'test'}).status_code, 400)
+        self.assertEqual(
+            self.post([self.get_record(str(index))
+                       for index in range(11)]).status_code, 400)
+        self.assertEqual(models.User.objects.count(), 0)
+
+
+class NestedBulkSaveIdempotencyTest(BulkRequestMixin, TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_repeated_request_is_saved_once(self):
+        records = [
+            self.get_record(username)
+            for username in ('first', 'second', 'third')
+        ]
+        first = self.post(
+            records, IdempotentUserBulkViewSet,
+            HTTP_IDEMPOTENCY_KEY='key')
+        repeated = self.post(
+            records, IdempotentUserBulkViewSet,
+            HTTP_IDEMPOTENCY_KEY='key')
+
+        self.assertListEqual(
+            [result['pk'] for result in repeated.data['results']],
+            [result['pk'] for result in first.data['results']])
+        self.assertEqual(models.User.objects.count(), 3)
@@ -1,8 +1,12 @@
 import uuid
 from rest_framework.exceptions import ValidationError
-from django.test import TestCase
+from rest_framework.settings import api_settings
+from django.test import TestCase, TransactionTestCase
 from django.http.request import QueryDict
-from django.db import transaction
+from django.db import connection, transaction
+from django.db.models.signals import post_save
+from django.test.utils import CaptureQueriesContext
+from drf_writable_nested.mixins import returns_bulk_pks
 
 from .utils import get_sample_file
 
@@ -927,3 +931,988 @@ class WritableNestedModelSerializerIssuesTest(TestCase):
             serializer.data['names'][0]['id'], 
             update_serializer.data['names'][0]['id'])
 
+
+class ListOperationsTest(TestCase):
+    def setUp(self):
+        user = models.User.objects.create(username='test')
+        self.profile = models.Profile.objects.create(user=user)
+        self.avatars = [
+            models.Avatar.objects.create(
+                profile=self.profile, image='image-{}.png'.format(index))
+            for index in range(3)
+        ]
+        self.sites = [
+            models.Site.objects.create(url='http://{}.com'.format(index))
+            for index in range(2)
+        ]
+        self.profile.sites.add(*self.sites)
+
+    def test_update_with_list_operations(self):
+        serializer = serializers.ListOperationsProfileSerializer(
+            instance=self.profile,
+            partial=True,
+            data={
+                'avatars': {
+                    'add': [{'image': 'new.png'}],
+                    'update': [
+                        {'pk': self.avatars[0].pk, 'image': 'changed.png'},
+                    ],
+                    'remove': [self.avatars[1].pk],
+                },
+                'sites': {
+                    'remove': [{'pk': self.sites[0].pk}],
+                },
+            })
+        serializer.is_valid(raise_exception=True)
+        profile = serializer.save()
+
+        self.assertSetEqual(
+            set(profile.avatars.values_list('image', flat=True)),
+            {'changed.png', 'image-2.png', 'new.png'})
+        self.assertListEqual(
+            list(profile.sites.all()), [self.sites[1]])
+        self.assertEqual(models.Site.objects.count(), 2)
+
+    def test_remove_only_touches_own_children(self):
+        other_user = models.User.objects.create(username='other')
+        other_profile = models.Profile.objects.create(user=other_user)
+        other_avatar = models.Avatar.objects.create(
+            profile=other_profile, image='other.png')
+
+        serializer = serializers.ListOperationsProfileSerializer(
+            instance=self.profile,
+            partial=True,
+            data={'avatars': {'remove': [other_avatar.pk]}})
+        serializer.is_valid(raise_exception=True)
+        with self.assertRaises(ValidationError) as ctx:
+            serializer.save()
+
+        self.assertEqual(
+            ctx.exception.detail['avatars']['remove'][0][
+                api_settings.NON_FIELD_ERRORS_KEY][0],
+            'Invalid pk "{}" - object does not exist.'.format(
+                other_avatar.pk))
+        self.assertTrue(
+            models.Avatar.objects.filter(pk=other_avatar.pk).exists())
+        self.assertEqual(self.profile.avatars.count(), 3)
+
+    def test_update_of_unknown_item_is_rejected(self):
+        other_user = models.User.objects.create(username='other')
+        other_profile = models.Profile.objects.create(user=other_user)
+        other_avatar = models.Avatar.objects.create(
+            profile=other_profile, image='other.png')
+
+        serializer = serializers.ListOperationsProfileSerializer(
+            instance=self.profile,
+            partial=True,
+            data={'avatars': {'update': [
+                {'pk': self.avatars[0].pk, 'image': 'changed.png'},
+                {'pk': 99999, 'image': 'missing.png'},
+                {'pk': other_avatar.pk, 'image': 'stolen.png'},
+            ]}})
+        serializer.is_valid(raise_exception=True)
+        with self.assertRaises(ValidationError) as ctx:
+            serializer.save()
+
+        errors = ctx.exception.detail['avatars']
+        self.assertEqual(errors['update'][0], {})
+        self.assertListEqual(
+            [errors['update'][index][api_settings.NON_FIELD_ERRORS_KEY][0]
+             for index in (1, 2)],
+            ['Invalid pk "99999" - object does not exist.',
+             'Invalid pk "{}" - object does not exist.'.format(
+                 other_avatar.pk)])
+        self.assertEqual(models.Avatar.objects.count(), 4)
+        other_avatar.refresh_from_db()
+        self.assertEqual(other_avatar.profile, other_profile)
+
+    def test_update_requires_pk(self):
+        serializer = serializers.ListOperationsProfileSerializer(
+            instance=self.profile,
+            partial=True,
+            data={'avatars': {'update': [{'image': 'changed.png'}]}})
+
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(
+            serializer.errors,
+            {'avatars': [
+                'Items to update or remove must contain a primary key.']})
+
+    def test_unknown_operation(self):
+        serializer = serializers.ListOperationsProfileSerializer(
+            instance=self.profile,
+            partial=True,
+            data={'avatars': {'replace': []}})
+
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(
+            serializer.errors,
+            {'avatars': [
+                'Expected a list of items or a dict with '
+                'add, update, remove keys.']})
+
+    def test_item_errors_are_reported_per_operation(self):
+        serializer = serializers.ListOperationsProfileSerializer(
+            instance=self.profile,
+            partial=True,
+            data={
+                'avatars': {
+                    'add': [{'image': 'new.png'}, {'image': None}],
+                    'update': [{'pk': self.avatars[0].pk, 'image': None}],
+                },
+            })
+
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(
+            serializer.errors,
+            {'avatars': {
+                'add': [{}, {'image': ['This field may not be null.']}],
+                'update': [{'image': ['This field may not be null.']}],
+            }})
+
+
+class CompactResponseTest(TestCase):
+    def test_create(self):
+        serializer = serializers.CompactResponseUserSerializer(data={
+            'username': 'test',
+            'profile': {
+                'access_key': None,
+                'sites': [{'url': 'http://google.com'}],
+                'avatars': [],
+                'message_set': [],
+            },
+        })
+        serializer.is_valid(raise_exception=True)
+        user = serializer.save()
+
+        with self.assertNumQueries(0):
+            data = serializer.data
+        self.assertEqual(data, {
+            'pk': user.pk,
+            'profile': {
+                'created': [user.profile.pk],
+                'updated': [],
+                'deleted': [],
+            },
+        })
+
+    def test_update(self):
+        user = models.User.objects.create(username='test')
+        profile = models.Profile.objects.create(user=user)
+        first_avatar, second_avatar = [
+            models.Avatar.objects.create(profile=profile, image='image.png')
+            for _ in range(2)
+        ]
+
+        serializer = serializers.CompactResponseProfileSerializer(
+            instance=profile,
+            partial=True,
+            data={
+                'avatars': [
+                    {'pk': first_avatar.pk, 'image': 'changed.png'},
+                    {'image': 'new.png'},
+                ],
+            })
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        new_avatar = profile.avatars.get(image='new.png')
+        self.assertEqual(serializer.data, {
+            'pk': profile.pk,
+            'avatars': {
+                'created': [new_avatar.pk],
+                'updated': [first_avatar.pk],
+                'deleted': [second_avatar.pk],
+            },
+        })
+
+    def test_representation_of_not_saved_instance(self):
+        user = models.User.objects.create(username='test')
+
+        serializer = serializers.CompactResponseUserSerializer(instance=user)
+        self.assertEqual(serializer.data['username'], 'test')
+
+
+class PrefetchCacheTest(TestCase):
+    def test_representation_after_create_needs_no_queries(self):
+        serializer = serializers.UserSerializer(
+            data=WritableNestedModelSerializerTest().get_initial_data())
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        with self.assertNumQueries(0):
+            data = serializer.data
+        self.assertEqual(len(data['profile']['sites']), 2)
+        self.assertEqual(len(data['profile']['avatars']), 2)
+        self.assertEqual(len(data['profile']['message_set']), 3)
+
+    def test_stale_prefetched_objects_are_replaced(self):
+        user = models.User.objects.create(username='test')
+        profile = models.Profile.objects.create(user=user)
+        avatar = models.Avatar.objects.create(
+            profile=profile, image='old.png')
+        models.Avatar.objects.create(profile=profile, image='removed.png')
+        profile = models.Profile.objects.prefetch_related(
+            'avatars', 'sites').get(pk=profile.pk)
+
+        serializer = serializers.ProfileSerializer(
+            instance=profile,
+            partial=True,
+            data={
+                'avatars': [
+                    {'pk': avatar.pk, 'image': 'changed.png'},
+                    {'image': 'new.png'},
+                ],
+                'sites': [{'url': 'http://google.com'}],
+            })
+        serializer.is_valid(raise_exception=True)
+        profile = serializer.save()
+
+        with self.assertNumQueries(0):
+            self.assertListEqual(
+                [item.image for item in profile.avatars.all()],
+                ['changed.png', 'new.png'])
+            self.assertListEqual(
+                [site.url for site in profile.sites.all()],
+                ['http://google.com'])
+
+    def test_removed_reverse_one_to_one_is_not_cached(self):
+        user = models.User.objects.create(username='test')
+        models.Profile.objects.create(user=user)
+        user = models.User.objects.select_related('profile').get(pk=user.pk)
+
+        serializer = serializers.UserSerializer(
+            instance=user, partial=True, data={'profile': None})
+        serializer.is_valid(raise_exception=True)
+        user = serializer.save()
+
+        self.assertFalse(models.Profile.objects.exists())
+        with self.assertNumQueries(0):
+            self.assertIsNone(serializer.data['profile'])
+
+
+class IdentityMapTest(TestCase):
+    def get_data(self, site):
+        return {
+            'name': 'team',
+            'members': [
+                {
+                    'username': username,
+                    'profile': {
+                        'access_key': None,
+                        'sites': [{'pk': site.pk, 'url': 'http://new.com'}],
+                        'avatars': [],
+                        'message_set': [],
+                    },
+                }
+                for username in ('first', 'second', 'third')
+            ],
+        }
+
+    def count_site_queries(self, serializer_class):
+        site = models.Site.objects.create(url='http://old.com')
+        serializer = serializer_class(data=self.get_data(site))
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as ctx:
+            team = serializer.save()
+
+        for member in team.members.all():
+            self.assertListEqual(list(member.profile.sites.all()), [site])
+        site.refresh_from_db()
+        self.assertEqual(site.url, 'http://new.com')
+
+        queries = [query['sql'] for query in ctx.captured_queries]
+        return (
+            len([sql for sql in queries
+                 if sql.startswith('SELECT') and
+                 sql.split(' FROM ')[1].startswith('"tests_site"')]),
+            len([sql for sql in queries
+                 if sql.startswith('UPDATE "tests_site"')]),
+        )
+
+    def test_shared_object_is_loaded_and_saved_once(self):
+        self.assertEqual(
+            self.count_site_queries(serializers.IdentityMapTeamSerializer),
+            (1, 1))
+
+    def test_shared_object_without_identity_map(self):
+        self.assertEqual(
+            self.count_site_queries(serializers.TeamSerializer),
+            (3, 3))
+
+    def test_conflicting_data_of_shared_object(self):
+        site = models.Site.objects.create(url='http://old.com')
+        data = self.get_data(site)
+        data['members'][2]['profile']['sites'][0]['url'] = 'http://other.com'
+        serializer = serializers.IdentityMapTeamSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+
+        with self.assertRaises(ValidationError) as ctx:
+            serializer.save()
+        self.assertIn('url', str(ctx.exception.detail))
+
+
+class GetOrCreateTest(TestCase):
+    def setUp(self):
+        user = models.User.objects.create(username='test')
+        self.profile = models.Profile.objects.create(user=user)
+
+    def save_sites(self, sites):
+        serializer = serializers.GetOrCreateProfileSerializer(
+            instance=self.profile, partial=True, data={'sites': sites})
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    def test_identical_items_are_collapsed(self):
+        existing = models.Site.objects.create(url='http://b.com')
+        linked = models.Site.objects.create(url='http://c.com')
+
+        sites = [
+            {'url': 'http://a.com'},
+            {'url': 'http://a.com'},
+            {'url': 'http://b.com'},
+            {'pk': linked.pk, 'url': 'http://c.com'},
+            {'url': 'http://a.com'},
+        ]
+        profile = self.save_sites(sites)
+
+        self.assertEqual(models.Site.objects.count(), 3)
+        created = models.Site.objects.get(url='http://a.com')
+        self.assertSetEqual(
+            set(profile.sites.values_list('pk', flat=True)),
+            {created.pk, existing.pk, linked.pk})
+        self.assertListEqual(
+            [site['pk'] for site in sites],
+            [created.pk, created.pk, existing.pk, linked.pk, created.pk])
+
+    def test_number_of_queries_does_not_depend_on_items(self):
+        def count_queries(size):
+            models.Site.objects.all().delete()
+            models.Site.objects.bulk_create([
+                models.Site(url='http://old-{}.com'.format(index))
+                for index in range(size)
+            ])
+            sites = [
+                {'url': 'http://{}-{}.com'.format(state, index % size)}
+                for state in ('old', 'new') for index in range(size * 3)
+            ]
+            with CaptureQueriesContext(connection) as ctx:
+                self.save_sites(sites)
+            self.assertEqual(self.profile.sites.count(), size * 2)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(count_queries(2), count_queries(20))
+
+
+class ReferenceFastPathTest(TestCase):
+    def setUp(self):
+        user = models.User.objects.create(username='test')
+        self.profile = models.Profile.objects.create(user=user)
+
+    def get_serializer(self, data):
+        return serializers.ReferenceProfileSerializer(
+            instance=self.profile, partial=True, data=data)
+
+    def save(self, data):
+        serializer = self.get_serializer(data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    def test_references_are_linked(self):
+        sites = [models.Site.objects.create(url='http://{}.com'.format(i))
+                 for i in range(2)]
+
+        profile = self.save({'sites': [
+            {'pk': sites[0].pk},
+            {'url': 'http://new.com'},
+            {'pk': sites[1].pk},
+        ]})
+
+        self.assertEqual(models.Site.objects.count(), 3)
+        self.assertSetEqual(
+            set(profile.sites.values_list('url', flat=True)),
+            {'http://0.com', 'http://1.com', 'http://new.com'})
+
+    def test_references_are_not_changed(self):
+        site = models.Site.objects.create(url='http://old.com')
+
+        self.save({'sites': [{'pk': site.pk}]})
+
+        site.refresh_from_db()
+        self.assertEqual(site.url, 'http://old.com')
+
+    def test_number_of_queries_does_not_depend_on_references(self):
+        def count_queries(size):
+            models.Site.objects.all().delete()
+            models.Site.objects.bulk_create([
+                models.Site(url='http://{}.com'.format(index))
+                for index in range(size)
+            ])
+            serializer = self.get_serializer({'sites': [
+                {'pk': pk}
+                for pk in models.Site.objects.values_list('pk', flat=True)
+            ]})
+            with CaptureQueriesContext(connection) as ctx:
+                serializer.is_valid(raise_exception=True)
+                serializer.save()
+            self.assertEqual(self.profile.sites.count(), size)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(count_queries(2), count_queries(10))
+
+    def test_references_are_fetched_once(self):
+        sites = [models.Site.objects.create(url='http://{}.com'.format(i))
+                 for i in range(2)]
+
+        serializer = self.get_serializer({'sites': [
+            {'pk': site.pk} for site in sites
+        ]})
+        with CaptureQueriesContext(connection) as ctx:
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+
+        self.assertEqual(
+            len([query for query in ctx.captured_queries
+                 if query['sql'].startswith('SELECT "tests_site"') and
+                 'WHERE "tests_site"."id" IN' in query['sql']]),
+            1)
+
+    def test_invalid_reference(self):
+        site = models.Site.objects.create(url='http://old.com')
+
+        serializer = self.get_serializer({'sites': [
+            {'url': 'http://new.com'},
+            {'pk': site.pk},
+            {'pk': site.pk + 100},
+        ]})
+
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(serializer.errors['sites'][0], {})
+        self.assertEqual(serializer.errors['sites'][1], {})
+        self.assertIn('non_field_errors', serializer.errors['sites'][2])
+
+    def test_errors_of_other_items_keep_positions(self):
+        site = models.Site.objects.create(url='http://old.com')
+
+        serializer = self.get_serializer({'sites': [
+            {'pk': site.pk},
+            {'url': None},
+        ]})
+
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(len(serializer.errors['sites']), 2)
+        self.assertEqual(serializer.errors['sites'][0], {})
+        self.assertIn('url', serializer.errors['sites'][1])
+
+    def test_direct_reference(self):
+        access_key = models.AccessKey.objects.create(key='old')
+
+        profile = self.save({'access_key': {'pk': access_key.pk}})
+
+        self.assertEqual(profile.access_key, access_key)
+        access_key.refresh_from_db()
+        self.assertEqual(access_key.key, 'old')
+
+    def test_invalid_direct_reference(self):
+        serializer = self.get_serializer({'access_key': {'pk': 100}})
+
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('non_field_errors', serializer.errors['access_key'])
+
+
+class ReverseOneToOneLookupTest(TestCase):
+    def get_profile_data(self):
+        return {
+            'sites': [], 'avatars': [], 'access_key': None, 'message_set': [],
+        }
+
+    def create_member(self, username, profile=True):
+        user = models.User.objects.create(username=username)
+        if profile:
+            models.Profile.objects.create(user=user)
+        return user
+
+    def get_profile_lookups(self, ctx):
+        return [
+            query for query in ctx.captured_queries
+            if query['sql'].startswith('SELECT') and
+            '"tests_profile"."user_id" IN' in query['sql']
+        ]
+
+    def test_existing_objects_of_items_are_looked_up_at_once(self):
+        team = models.Team.objects.create(name='team')
+        members = [self.create_member('first'),
+                   self.create_member('second'),
+                   self.create_member('third', profile=False)]
+        team.members.add(*members)
+
+        serializer = serializers.TeamSerializer(
+            instance=team, partial=True, data={'members': [
+                {'pk': member.pk, 'profile': self.get_profile_data()}
+                for member in members
+            ]})
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as ctx:
+            serializer.save()
+
+        self.assertEqual(len(self.get_profile_lookups(ctx)), 1)
+        self.assertEqual(models.Profile.objects.count(), 3)
+        for member in members:
+            self.assertTrue(
+                models.Profile.objects.filter(user=member).exists())
+
+    def test_cached_object_is_not_looked_up(self):
+        user = self.create_member('first')
+        user = models.User.objects.select_related('profile').get(pk=user.pk)
+        profile_pk = user.profile.pk
+
+        serializer = serializers.UserSerializer(
+            instance=user, partial=True, data={'profile': {}})
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as ctx:
+            serializer.save()
+
+        self.assertFalse(self.get_profile_lookups(ctx))
+        self.assertListEqual(
+            list(models.Profile.objects.values_list('pk', flat=True)),
+            [profile_pk])
+
+    def test_missing_object_is_created(self):
+        user = self.create_member('first', profile=False)
+
+        serializer = serializers.UserSerializer(
+            instance=user, partial=True,
+            data={'profile': self.get_profile_data()})
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.assertTrue(models.Profile.objects.filter(user=user).exists())
+
+
+class GenericRelationBatchTest(TestCase):
+    def save(self, data, instance=None,
+             serializer_class=serializers.BulkTaggedItemSerializer):
+        serializer = serializer_class(instance=instance, data=data)
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as ctx:
+            item = serializer.save()
+        return item, ctx
+
+    def get_inserts(self, ctx):
+        return [query for query in ctx.captured_queries
+                if query['sql'].startswith('INSERT INTO "tests_tag"')]
+
+    def test_new_items_are_inserted_at_once(self):
+        data = {'tags': [{'tag': 'tag-{}'.format(i)} for i in range(5)]}
+        item, ctx = self.save(data)
+
+        self.assertEqual(len(self.get_inserts(ctx)), 1)
+        self.assertListEqual(
+            [tag.tag for tag in item.tags.order_by('pk')],
+            ['tag-{}'.format(i) for i in range(5)])
+        self.assertListEqual(
+            [tag['pk'] for tag in data['tags']],
+            [tag.pk for tag in item.tags.order_by('pk')])
+
+    def test_update_keeps_existing_and_deletes_orphans(self):
+        item = models.TaggedItem.objects.create()
+        kept = models.Tag.objects.create(content_object=item, tag='kept')
+        models.Tag.objects.create(content_object=item, tag='orphan')
+        other = models.Tag.objects.create(
+            content_object=models.TaggedItem.objects.create(), tag='other')
+
+        data = {'tags': [
+            {'tag': 'new-1'},
+            {'pk': kept.pk, 'tag': 'updated'},
+            {'tag': 'new-2'},
+        ]}
+        item, ctx = self.save(data, instance=item)
+
+        self.assertEqual(len(self.get_inserts(ctx)), 1)
+        deletes = [query for query in ctx.captured_queries
+                   if query['sql'].startswith('DELETE')]
+        self.assertEqual(len(deletes), 1)
+        self.assertSetEqual(
+            set(item.tags.values_list('tag', flat=True)),
+            {'new-1', 'updated', 'new-2'})
+        self.assertEqual(data['tags'][1]['pk'], kept.pk)
+        self.assertSetEqual(
+            {data['tags'][0]['pk'], data['tags'][2]['pk']},
+            set(item.tags.exclude(pk=kept.pk).values_list('pk', flat=True)))
+        self.assertTrue(models.Tag.objects.filter(pk=other.pk).exists())
+
+    def test_items_are_saved_one_by_one_by_default(self):
+        saved = []
+
+        def on_saved(sender, instance, **kwargs):
+            saved.append(instance.tag)
+
+        post_save.connect(on_saved, sender=models.Tag)
+        self.addCleanup(post_save.disconnect, on_saved, sender=models.Tag)
+        data = {'tags': [{'tag': 'tag-1'}, {'tag': 'tag-2'}]}
+        item, ctx = self.save(
+            data, serializer_class=serializers.TaggedItemSerializer)
+
+        self.assertEqual(len(self.get_inserts(ctx)), 2)
+        self.assertListEqual(saved, ['tag-1', 'tag-2'])
+
+    def test_receivers_of_the_model_disable_bulk_insert(self):
+        saved = []
+
+        def on_saved(sender, instance, **kwargs):
+            saved.append(instance.tag)
+
+        post_save.connect(on_saved, sender=models.Tag)
+        self.addCleanup(post_save.disconnect, on_saved, sender=models.Tag)
+        data = {'tags': [{'tag': 'tag-1'}, {'tag': 'tag-2'}]}
+        item, ctx = self.save(data)
+
+        self.assertEqual(len(self.get_inserts(ctx)), 2)
+        self.assertListEqual(saved, ['tag-1', 'tag-2'])
+
+
+class GenericRelationReadBackTest(TransactionTestCase):
+    def save(self):
+        serializer = serializers.BulkTaggedItemSerializer(data={
+            'tags': [{'tag': 'tag-{}'.format(i)} for i in range(3)]})
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as ctx:
+            serializer.save()
+        return [query for query in ctx.captured_queries
+                if query['sql'].startswith('INSERT INTO "tests_tag"')]
+
+    def test_primary_keys_are_read_back_only_in_transaction(self):
+        if returns_bulk_pks(models.Tag):
+            self.skipTest('Primary keys of inserted rows are returned')
+
+        self.assertEqual(len(self.save()), 3)
+        with transaction.atomic():
+            self.assertEqual(len(self.save()), 1)
+
+
+class ThroughModelTest(TestCase):
+    def setUp(self):
+        self.users = [
+            models.User.objects.create(username='user-{}'.format(i))
+            for i in range(4)
+        ]
+
+    def save(self, data, instance=None,
+             serializer_class=serializers.ProjectSerializer):
+        serializer = serializer_class(instance=instance, data=data)
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as ctx:
+            project = serializer.save()
+        return project, ctx
+
+    def get_writes(self, ctx):
+        return [query['sql'].split()[0] for query in ctx.captured_queries
+                if '"tests_membership"' in query['sql'].split('WHERE')[0] and
+                not query['sql'].startswith('SELECT')]
+
+    def test_create(self):
+        data = {'name': 'project', 'memberships': [
+            {'user': user.pk, 'role': 'dev', 'ordering': index}
+            for index, user in enumerate(self.users)
+        ]}
+        project, ctx = self.save(data)
+
+        self.assertListEqual(self.get_writes(ctx), ['INSERT'])
+        self.assertListEqual(
+            list(project.members.order_by('membership__ordering')),
+            self.users)
+        self.assertListEqual(
+            [item['pk'] for item in data['memberships']],
+            [models.Membership.objects.get(user=user).pk
+             for user in self.users])
+
+    def test_update_is_diffed_against_current_rows(self):
+        project = models.Project.objects.create(name='project')
+        kept, changed, removed = [
+            models.Membership.objects.create(
+                project=project, user=user, role='dev')
+            for user in self.users[:3]
+        ]
+
+        data = {'name': 'project', 'memberships': [
+            {'user': self.users[0].pk, 'role': 'dev'},
+            {'user': self.users[1].pk, 'role': 'lead', 'ordering': 1},
+            {'user': self.users[3].pk, 'role': 'qa'},
+        ]}
+        project, ctx = self.save(data, instance=project)
+
+        self.assertListEqual(
+            sorted(self.get_writes(ctx)), ['DELETE', 'INSERT', 'UPDATE'])
+        self.assertEqual(
+            len([query for query in ctx.captured_queries
+                 if query['sql'].startswith('SELECT') and
+                 'FROM "tests_membership"' in query['sql']]),
+            2)
+        self.assertDictEqual(
+            dict(models.Membership.objects.values_list('user', 'role')),
+            {self.users[0].pk: 'dev', self.users[1].pk: 'lead',
+             self.users[3].pk: 'qa'})
+        self.assertFalse(
+            models.Membership.objects.filter(pk=removed.pk).exists())
+        self.assertEqual(data['memberships'][0]['pk'], kept.pk)
+        self.assertEqual(data['memberships'][1]['pk'], changed.pk)
+        changed.refresh_from_db()
+        self.assertEqual(changed.ordering, 1)
+
+    def test_unchanged_rows_are_not_written(self):
+        project = models.Project.objects.create(name='project')
+        models.Membership.objects.create(
+            project=project, user=self.users[0], role='dev')
+
+        project, ctx = self.save({'name': 'project', 'memberships': [
+            {'user': self.users[0].pk, 'role': 'dev'},
+        ]}, instance=project)
+
+        self.assertListEqual(self.get_writes(ctx), [])
+
+    def test_targets_of_rows_are_not_loaded(self):
+        project = models.Project.objects.create(name='project')
+        for user in self.users:
+            models.Membership.objects.create(
+                project=project, user=user, role='dev')
+
+        project, ctx = self.save({'name': 'project', 'memberships': [
+            {'user': user.pk, 'role': 'lead'} for user in self.users
+        ]}, instance=project)
+
+        self.assertListEqual(self.get_writes(ctx), ['UPDATE'])
+        # Only lookups validating the user pks of the data
+        self.assertEqual(
+            len([query for query in ctx.captured_queries
+                 if 'FROM "tests_user"' in query['sql']]),
+            len(self.users))
+
+    def test_duplicate_targets_are_rejected(self):
+        serializer = serializers.ProjectSerializer(data={
+            'name': 'project', 'memberships': [
+                {'user': self.users[0].pk, 'role': 'dev'},
+                {'user': self.users[0].pk, 'role': 'qa'},
+            ]})
+        serializer.is_valid(raise_exception=True)
+
+        with self.assertRaises(ValidationError) as ctx:
+            serializer.save()
+        self.assertDictEqual(ctx.exception.detail['memberships'][1], {
+            'user': ['Only one item can be passed for this value.']})
+        self.assertFalse(models.Membership.objects.exists())
+
+    def test_rows_are_synced_once_with_generic_relation(self):
+        project = models.Project.objects.create(name='project')
+        models.Membership.objects.create(
+            project=project, user=self.users[0], role='dev')
+
+        project, ctx = self.save({
+            'name': 'project',
+            'memberships': [{'user': self.users[0].pk, 'role': 'dev'}],
+            'tags': [{'tag': 'first'}],
+        }, instance=project,
+            serializer_class=serializers.TaggedProjectSerializer)
+
+        # Missing rows aren't looked up again after the generic relation
+        self.assertListEqual(self.get_writes(ctx), [])
+        self.assertEqual(
+            len([query for query in ctx.captured_queries
+                 if query['sql'].startswith('SELECT') and
+                 'FROM "tests_membership"' in query['sql']]),
+            1)
+        self.assertListEqual(
+            list(project.tags.values_list('tag', flat=True)), ['first'])
+
+
+class OrderFieldsTest(TestCase):
+    def setUp(self):
+        self.playlist = models.Playlist.objects.create(name='playlist')
+        self.tracks = [
+            models.Track.objects.create(
+                playlist=self.playlist, title=str(i), position=i)
+            for i in range(4)
+        ]
+
+    def save(self, tracks,
+             serializer_class=serializers.PlaylistSerializer):
+        serializer = serializer_class(
+            instance=self.playlist, partial=True, data={'tracks': tracks})
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as ctx:
+            serializer.save()
+        return ctx
+
+    def get_position_updates(self, ctx):
+        return [query['sql'] for query in ctx.captured_queries
+                if query['sql'].startswith('UPDATE') and
+                'CASE' in query['sql']]
+
+    def get_titles(self):
+        return list(self.playlist.tracks.order_by(
+            'position').values_list('title', flat=True))
+
+    def get_updates(self, ctx):
+        return [query['sql'] for query in ctx.captured_queries
+                if query['sql'].startswith('UPDATE "tests_track"')]
+
+    def test_positions_are_assigned_from_list_order(self):
+        ctx = self.save([
+            {'pk': self.tracks[0].pk, 'title': '0'},
+            {'pk': self.tracks[2].pk, 'title': '2'},
+            {'pk': self.tracks[1].pk, 'title': '1'},
+            {'pk': self.tracks[3].pk, 'title': '3'},
+        ])
+
+        # Unchanged items aren't saved, only moved rows are updated
+        updates = self.get_updates(ctx)
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(updates[0].count('WHEN'), 2)
+        self.assertListEqual(self.get_titles(), ['0', '2', '1', '3'])
+
+    def test_reversed_list_is_written_with_one_update(self):
+        ctx = self.save([
+            {'pk': track.pk, 'title': track.title}
+            for track in reversed(self.tracks)
+        ])
+
+        self.assertEqual(len(self.get_updates(ctx)), 1)
+        self.assertListEqual(self.get_titles(), ['3', '2', '1', '0'])
+
+    def test_changed_items_are_saved_with_positions(self):
+        ctx = self.save([
+            {'pk': self.tracks[1].pk, 'title': 'changed'},
+            {'pk': self.tracks[0].pk, 'title': '0'},
+            {'pk': self.tracks[2].pk, 'title': '2'},
+            {'pk': self.tracks[3].pk, 'title': '3'},
+        ])
+
+        updates = self.get_updates(ctx)
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(updates[1].count('WHEN'), 1)
+        self.assertListEqual(self.get_titles(), ['changed', '0', '2', '3'])
+
+    def test_positions_of_references(self):
+        ctx = self.save([
+            {'pk': self.tracks[0].pk},
+            {'pk': self.tracks[2].pk},
+            {'pk': self.tracks[1].pk},
+            {'pk': self.tracks[3].pk},
+        ], serializer_class=serializers.ReferencePlaylistSerializer)
+
+        updates = self.get_position_updates(ctx)
+        self.assertEqual(len(updates), 1)
+        # Only rows which changed positions are updated
+        self.assertEqual(updates[0].count('WHEN'), 2)
+        self.assertListEqual(self.get_titles(), ['0', '2', '1', '3'])
+
+    def test_new_items_get_positions(self):
+        ctx = self.save([
+            {'title': 'new'},
+            {'pk': self.tracks[3].pk, 'title': '3'},
+            {'pk': self.tracks[0].pk, 'title': '0'},
+        ])
+
+        # The new item is inserted with its position
+        updates = self.get_position_updates(ctx)
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(updates[0].count('WHEN'), 2)
+        self.assertListEqual(self.get_titles(), ['new', '3', '0'])
+
+    def test_created_items_are_inserted_with_positions(self):
+        serializer = serializers.PlaylistSerializer(data={
+            'name': 'new',
+            'tracks': [{'title': str(index)} for index in range(3)],
+        })
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as ctx:
+            playlist = serializer.save()
+
+        self.assertFalse(self.get_position_updates(ctx))
+        self.assertListEqual(
+            list(playlist.tracks.order_by('pk').values_list(
+                'position', flat=True)),
+            [0, 1, 2])
+
+    def test_unchanged_order_is_not_written(self):
+        ctx = self.save([
+            {'pk': track.pk, 'title': track.title} for track in self.tracks
+        ])
+
+        self.assertFalse(self.get_updates(ctx))
+
+
+class ReparentTest(TestCase):
+    def setUp(self):
+        self.team = models.Team.objects.create(name='team')
+        self.users = []
+        self.profiles = []
+        for index in range(2):
+            user = models.User.objects.create(username=str(index))
+            self.users.append(user)
+            self.profiles.append(models.Profile.objects.create(user=user))
+        self.team.members.add(*self.users)
+        self.avatar = models.Avatar.objects.create(
+            profile=self.profiles[0], image='moved.png')
+
+    def test_moved_child_is_not_deleted(self):
+        serializer = serializers.TeamSerializer(
+            instance=self.team, partial=True, data={'members': [
+                {'pk': self.users[0].pk, 'profile': {
+                    'pk': self.profiles[0].pk, 'avatars': [],
+                }},
+                {'pk': self.users[1].pk, 'profile': {
+                    'pk': self.profiles[1].pk, 'avatars': [
+                        {'pk': self.avatar.pk, 'image': 'moved.png'},
+                    ],
+                }},
+            ]})
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.assertListEqual(
+            list(models.Avatar.objects.values_list('pk', 'profile')),
+            [(self.avatar.pk, self.profiles[1].pk)])
+
+    def test_orphans_are_deleted_at_the_end(self):
+        orphan = models.Avatar.objects.create(
+            profile=self.profiles[1], image='orphan.png')
+
+        serializer = serializers.TeamSerializer(
+            instance=self.team, partial=True, data={'members': [
+                {'pk': self.users[1].pk, 'profile': {
+                    'pk': self.profiles[1].pk, 'avatars': [],
+                }},
+            ]})
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.assertFalse(models.Avatar.objects.filter(pk=orphan.pk).exists())
+        self.assertTrue(
+            models.Avatar.objects.filter(pk=self.avatar.pk).exists())
+
+    def test_references_are_moved_with_one_query(self):
+        avatars = [self.avatar] + [
+            models.Avatar.objects.create(
+                profile=self.profiles[0], image='{}.png'.format(index))
+            for index in range(3)
+        ]
+        kept = models.Avatar.objects.create(
+            profile=self.profiles[1], image='kept.png')
+        orphan = models.Avatar.objects.create(
+            profile=self.profiles[1], image='orphan.png')
+
+        serializer = serializers.ReferenceProfileSerializer(
+            instance=self.profiles[1], partial=True, data={'avatars': [
+                {'pk': avatar.pk} for avatar in avatars + [kept]
+            ]})
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as ctx:
+            serializer.save()
+
+        updates = [query for query in ctx.captured_queries
+                   if query['sql'].startswith('UPDATE "tests_avatar"')]
+        self.assertEqual(len(updates), 1)
+        self.assertSetEqual(
+            set(self.profiles[1].avatars.values_list('pk', flat=True)),
+            {avatar.pk for avatar in avatars + [kept]})
+        self.assertFalse(models.Avatar.objects.filter(pk=orphan.pk).exists())